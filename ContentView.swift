@@ -489,7 +489,7 @@ struct ContentView: View {
             
             Task {
                 do {
-                    let cloudService = PadelCastCloudService(baseURL: cloudURL)
+                    let cloudService = PadelCastCloudService.shared(baseURL: cloudURL)
                     var matchData: [String: Any] = [
                         "team1_name": game.team1Name,
                         "team2_name": game.team2Name,
@@ -1346,11 +1346,42 @@ struct PlayerSetupView: View {
 // MARK: - Cloud Service
 class PadelCastCloudService: ObservableObject {
     private let baseURL: String
+    private var lastSeq: Int64 = 0
+    private let seqLock = NSLock()
+    // The server keeps a seq high-water mark per client ID, so another
+    // scorer's clock never makes this device's updates look stale
+    private let clientId = UUID().uuidString
+    static let maxUpdateAttempts = 5
+    
+    private static var services: [String: PadelCastCloudService] = [:]
+    private static let servicesLock = NSLock()
+    
+    // One service per server for the whole session, so seq keeps increasing
+    // across updates instead of restarting with every call
+    static func shared(baseURL: String) -> PadelCastCloudService {
+        servicesLock.lock()
+        defer { servicesLock.unlock() }
+        if let service = services[baseURL] {
+            return service
+        }
+        let service = PadelCastCloudService(baseURL: baseURL)
+        services[baseURL] = service
+        return service
+    }
     
     init(baseURL: String = "http://localhost:8080") {
         self.baseURL = baseURL
     }
     
+    // Strictly increasing and not reset by an app restart, so the server can
+    // drop retried or reordered updates instead of rolling the TV back
+    private func nextSeq() -> Int64 {
+        seqLock.lock()
+        defer { seqLock.unlock() }
+        lastSeq = max(lastSeq + 1, Int64(Date().timeIntervalSince1970 * 1_000_000))
+        return lastSeq
+    }
+    
     func linkToTV(tvId: String, team1: String, team2: String, bestOfSets: Int, courtNumber: String, championshipName: String, courtLogoData: Data?, game: PadelGame) async throws -> (matchId: String, tvId: String) {
         let url = URL(string: "\(baseURL)/api/link-tv")!
         var request = URLRequest(url: url)
@@ -1408,12 +1439,36 @@ class PadelCastCloudService: ObservableObject {
         
         var data = matchData
         data["tv_id"] = tvId
+        data["client_timestamp"] = Int(Date().timeIntervalSince1970 * 1000) // For end-to-end latency tracing
+        data["seq"] = nextSeq()
+        data["client_id"] = clientId
         request.httpBody = try JSONSerialization.data(withJSONObject: data)
         
-        let (_, _) = try await URLSession.shared.data(for: request)
+        // 429 (rate limited) and 503 (server restarting or handing this TV to
+        // another node) are resent after Retry-After. The seq stays the same,
+        // so a resend that lands after a newer update is dropped by the server
+        for attempt in 1...PadelCastCloudService.maxUpdateAttempts {
+            let (_, response) = try await URLSession.shared.data(for: request)
+            guard let httpResponse = response as? HTTPURLResponse else { return }
+            let status = httpResponse.statusCode
+            if status == 429 || status == 503, attempt < PadelCastCloudService.maxUpdateAttempts {
+                let retryAfter = Double(httpResponse.value(forHTTPHeaderField: "Retry-After") ?? "") ?? 1.0
+                print("⏳ Update deferred by server (\(status)), retrying in \(retryAfter)s")
+                try await Task.sleep(nanoseconds: UInt64(min(max(retryAfter, 0.1), 10.0) * 1_000_000_000))
+                continue
+            }
+            if !(200..<300).contains(status) {
+                throw CloudServiceError.httpStatus(status)
+            }
+            return
+        }
     }
 }
 
+enum CloudServiceError: Error {
+    case httpStatus(Int)
+}
+
 struct LinkTVResponse: Codable {
     let success: Bool
     let match_id: String
@@ -2026,7 +2081,7 @@ struct TVCodeInputView: View {
         Task {
             do {
                 print("🔗 Creating cloud service with URL: \(currentCloudURL)")
-                let cloudService = PadelCastCloudService(baseURL: currentCloudURL)
+                let cloudService = PadelCastCloudService.shared(baseURL: currentCloudURL)
                 
                 print("🔗 Calling linkToTV API...")
                 let result = try await cloudService.linkToTV(tvId: tvId, team1: game.team1Name, team2: game.team2Name, bestOfSets: game.bestOfSets, courtNumber: game.courtNumber, championshipName: game.championshipName, courtLogoData: game.courtLogoData, game: game)
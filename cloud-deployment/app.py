@@ -1,23 +1,145 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, g, Response, redirect, url_for
 from flask_socketio import SocketIO, emit, join_room, leave_room
+from werkzeug.middleware.proxy_fix import ProxyFix
+from eventlet import tpool
 import uuid
+import argparse
+import base64
+import hashlib
+import hmac
 import json
+import math
 import os
+import tempfile
+import zipfile
+from io import BytesIO
 from datetime import datetime
-import threading
 import time
-import qrcode
-import base64
-from io import BytesIO
+import requests
+from win_probability import win_probability
+from stats import StatsBook
+from latency import LatencyTracker, now_ms, parse_client_timestamp
+import metrics
+from profiler import SamplingProfiler, RequestProfiler
+from code_allocator import CodeAllocator
+from backpressure import FrameOutbox
+from ratelimit import TokenBucketLimiter, LoopLagMonitor
+from scheduler import Scheduler
+from snapshot_dict import SnapshotDict
+from sharding import HashRing, tv_key, venue_key
+from handover import HotRestart
+from qr_render import QRRenderPool, QRQueueFull, CONTENT_TYPES as QR_CONTENT_TYPES, RENDERERS as QR_RENDERERS
 
 app = Flask(__name__)
+started_at = time.time()
 app.config['SECRET_KEY'] = 'padel-cast-qr-system-2024'
 socketio = SocketIO(app, cors_allowed_origins="*")
+# X-Forwarded-For is only believed for the hops added by our own proxies (Railway's edge is one);
+# with none configured, anyone could put any address in it
+trusted_proxy_hops = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+if trusted_proxy_hops:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxy_hops)
+
+# Store active matches and their data. The containers are copy-on-write, so
+# readers (status pages, metrics, the expiry sweep) never lock and always see
+# a consistent snapshot.
+active_matches = SnapshotDict()
+match_codes = SnapshotDict()  # code -> match_id mapping
+# Each worker process owns a disjoint slice of the code space
+code_allocator = CodeAllocator(worker_id=int(os.environ.get('PADELCAST_WORKER_ID', 0)),
+                               worker_count=int(os.environ.get('PADELCAST_WORKER_COUNT', 1)))
+tv_sessions = SnapshotDict()  # tv_id -> session_data mapping
+provisioned_courts = SnapshotDict()  # (venue, court_number) -> tv_id of a bulk-provisioned TV
+# Sharding across nodes (sharding.py): this node's URL and the ring of all
+# nodes' URLs; an empty ring serves everything here
+node_url = os.environ.get('PADELCAST_NODE_URL', '').rstrip('/')
+hash_ring = HashRing(url.strip().rstrip('/') for url in os.environ.get('PADELCAST_CLUSTER', '').split(',') if url.strip())
+ring_version = 0
+moving_tvs = set()  # TVs being handed over to another node; their writes get 503 meanwhile
+handing_over = False  # state handed to a new process of this server (handover.py)
+match_stats = StatsBook()  # player/team records from finished matches
+latency_tracker = LatencyTracker()  # phone-to-TV latency histograms per venue
+sampling_profiler = SamplingProfiler()  # admin-triggered stack sampling
+request_profiler = RequestProfiler()  # admin-triggered cProfile of sampled requests
+qr_pool = None  # QR rendering off the event loop, created below with its metrics
+frame_outbox = None  # per-socket flow control for match updates, created below with its metrics
+# When False, TV pages always get a placeholder and the QR arrives over Socket.IO
+qr_wait_inline = True
+# 'png' embeds a base64 PNG in TV pages; 'svg' links a cached /qr/<tv_id>.svg instead
+qr_image_format = os.environ.get('QR_IMAGE_FORMAT', 'png')
+
+# Write endpoints are rate limited per client address and per TV, and shed
+# entirely while the event loop is lagging
+rate_limiting = os.environ.get('RATE_LIMITING', 'on') != 'off'
+ip_limiter = TokenBucketLimiter(rate=20, burst=100)  # a venue's phones may share one address
+tv_update_limiter = TokenBucketLimiter(rate=10, burst=20)
+tv_link_limiter = TokenBucketLimiter(rate=0.2, burst=3)  # each link creates a match and code
+session_limiter = TokenBucketLimiter(rate=1, burst=30)  # per client address; a venue's TVs may share one
+loop_lag = LoopLagMonitor()
+max_loop_lag = float(os.environ.get('MAX_LOOP_LAG', 0.5))  # seconds
+RATE_LIMITED_ENDPOINTS = frozenset({'link_tv', 'reset_tv', 'update_match', 'update_match_batch'})
+# Unauthenticated pages that create a TV session (and its QR code) on every view
+SESSION_ENDPOINTS = frozenset({'index', 'tv_setup'})
+# Endpoints served by the node owning their TV or venue
+ROUTED_ENDPOINTS = frozenset({'tv_display', 'qr_image', 'match_status', 'link_tv', 'reset_tv', 'update_match',
+                              'update_match_batch', 'claim_court_tv', 'provision_tvs', 'deprovision_tvs'})
+
+# Prometheus metrics served at /metrics
+metrics_registry = metrics.Registry()
+request_duration = metrics_registry.histogram(
+    'padelcast_http_request_duration_seconds', 'HTTP request latency by route',
+    ('method', 'route', 'status'))
+emit_duration = metrics_registry.histogram(
+    'padelcast_socketio_emit_duration_seconds', 'Time spent in socketio.emit fan-out', ('event',))
+qr_generation_duration = metrics_registry.histogram(
+    'padelcast_qr_generation_duration_seconds', 'QR code render time on the worker pool', ('format',))
+qr_wait_duration = metrics_registry.histogram(
+    'padelcast_qr_request_wait_seconds', 'Time a request waited for its QR code, queueing included')
+dropped_frames = metrics_registry.counter(
+    'padelcast_socketio_dropped_frames_total', 'Match update frames never sent to a slow TV', ('reason',))
+rejected_requests = metrics_registry.counter(
+    'padelcast_rejected_requests_total', 'Write requests refused by rate limiting or load shedding', ('reason',))
+match_updates = metrics_registry.counter(
+    'padelcast_match_updates_total', 'Score updates by outcome (applied, stale, duplicate)', ('result',))
+cleanup_duration = metrics_registry.histogram(
+    'padelcast_cleanup_sweep_duration_seconds', 'Duration of the old session cleanup sweep',
+    buckets=(0.001, 0.01, 0.1, 1.0, 10.0))
+job_duration = metrics_registry.histogram(
+    'padelcast_background_job_duration_seconds', 'Background job run time', ('job',),
+    buckets=(0.001, 0.01, 0.1, 1.0, 10.0))
+job_overruns = metrics_registry.counter(
+    'padelcast_background_job_overruns_total', 'Background job runs that outlasted their interval', ('job',))
+job_failures = metrics_registry.counter(
+    'padelcast_background_job_failures_total', 'Background job runs that raised', ('job',))
+routed_requests = metrics_registry.counter(
+    'padelcast_routed_requests_total', 'Requests and TV sockets sent to the node owning their TV', ('kind',))
+handoff_tvs = metrics_registry.counter(
+    'padelcast_handoff_tvs_total', 'TV sessions handed between nodes', ('result',))
+
+# Periodic and delayed jobs run on the server's event loop, started by the first request
+scheduler = Scheduler(on_run=job_duration.observe, on_overrun=job_overruns.inc, on_failure=job_failures.inc,
+                      on_lag=loop_lag.record)
 
-# Store active matches and their data
-active_matches = {}
-match_codes = {}  # code -> match_id mapping
-tv_sessions = {}  # tv_id -> session_data mapping
+qr_pool = QRRenderPool(max_workers=int(os.environ.get('QR_RENDER_WORKERS', 2)),
+                       max_pending=int(os.environ.get('QR_RENDER_QUEUE', 16)),
+                       on_render=qr_generation_duration.observe,
+                       offload=lambda func, *args: run_blocking(func, *args))
+metrics_registry.gauge('padelcast_qr_render_queue_depth', 'QR renders queued or running',
+                       lambda: qr_pool.pending)
+metrics_registry.gauge('padelcast_qr_image_cache_entries', 'Rendered QR images held in memory',
+                       lambda: len(qr_pool.cache))
+
+frame_outbox = FrameOutbox(lambda event, data, to, skip: emit_to_room(event, data, to, skip),
+                           max_in_flight=int(os.environ.get('SOCKET_MAX_IN_FLIGHT', 2)),
+                           max_pending=int(os.environ.get('SOCKET_MAX_PENDING', 4)),
+                           ack_timeout=float(os.environ.get('SOCKET_ACK_TIMEOUT', 5)),
+                           on_drop=dropped_frames.inc)
+metrics_registry.gauge('padelcast_socketio_pending_frames', 'Match update frames held for slow TVs',
+                       lambda: frame_outbox.pending)
+metrics_registry.gauge('padelcast_event_loop_lag_seconds', 'Recent peak event loop lag',
+                       lambda: loop_lag.lag)
+metrics_registry.gauge('padelcast_socketio_stalled_sockets', 'TV sockets waiting to acknowledge a frame',
+                       lambda: frame_outbox.stalled)
 
 class Match:
     def __init__(self, match_id, team1_name, team2_name, best_of_sets=5, court_number="1", championship_name="PADELCAST CHAMPIONSHIP", court_logo_data=None, team1_player1="Player 1", team1_player2="Player 2", team2_player1="Player 3", team2_player2="Player 4", match_format="Best of 3 Sets"):
@@ -53,6 +175,9 @@ class Match:
         
         self.is_match_finished = False
         self.winning_team = None
+        self.last_seq = None  # sequence number of the last applied update
+        self.writer_seqs = {}  # client id -> highest sequence number applied from it
+        self.version = 0  # bumped on every applied update, to order snapshots
         self.created_at = datetime.now()
         self.last_updated = datetime.now()
     
@@ -61,10 +186,250 @@ class Match:
     
     def get_team2_set_games(self, set_num):
         return self.team2_set_games.get(set_num, 0)
+    
+    def to_state(self):
+        """JSON-safe copy of the match, to hand it to another node"""
+        state = dict(vars(self))
+        state['created_at'] = self.created_at.isoformat()
+        state['last_updated'] = self.last_updated.isoformat()
+        return state
+    
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a match from to_state() output"""
+        match = cls.__new__(cls)
+        match.__dict__.update(state)
+        # JSON turned the set numbers into strings
+        match.team1_set_games = {int(n): games for n, games in state['team1_set_games'].items()}
+        match.team2_set_games = {int(n): games for n, games in state['team2_set_games'].items()}
+        match.created_at = datetime.fromisoformat(state['created_at'])
+        match.last_updated = datetime.fromisoformat(state['last_updated'])
+        # State from a node that kept one high-water mark per match
+        match.__dict__.setdefault('writer_seqs', {} if match.last_seq is None else {'': match.last_seq})
+        match.__dict__.setdefault('version', 0)
+        return match
+
+def socket_rooms():
+    """Socket.IO rooms in the default namespace (room -> {sid: eio_sid})
+
+    The asyncio server mode (asgi_app.py) replaces this with its own lookup.
+    """
+    return socketio.server.manager.rooms.get('/', {}) if socketio.server else {}
+
+def emit_to_room(event, data, room, skip=None):
+    """Send a Socket.IO event to every client in a room, except the sids in `skip`
+
+    The asyncio server mode (asgi_app.py) replaces this with its own emitter.
+    """
+    socketio.emit(event, data, room=room, skip_sid=skip or None)
+
+def start_background_task(target, *args):
+    """Run target outside the current request
+
+    The asyncio server mode (asgi_app.py) replaces this with its own runner.
+    """
+    return socketio.start_background_task(target, *args)
+
+def run_blocking(func, *args, **kwargs):
+    """Call blocking I/O or a subprocess without stalling the event loop
+
+    Under eventlet the call runs on a real OS thread (nothing is monkey
+    patched under `python app.py`). The asyncio server mode (asgi_app.py)
+    replaces this: its background tasks already run on worker threads.
+    """
+    if socketio.async_mode == 'eventlet':
+        return tpool.execute(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
+def start_scheduler():
+    """Run background jobs on the server's event loop
+
+    The asyncio server mode (asgi_app.py) replaces this with its own runner.
+    """
+    socketio.start_background_task(scheduler.run, socketio.sleep)
+
+def _connected_sockets():
+    return len(socket_rooms().get(None, {}))
+
+def _room_socket_counts():
+    # Skip the catch-all room and each client's private room named after its sid
+    return {(room,): len(members) for room, members in list(socket_rooms().items())
+            if room is not None and room not in members}
+
+metrics_registry.gauge('padelcast_active_matches', 'Matches held in memory', lambda: len(active_matches))
+metrics_registry.gauge('padelcast_tv_sessions', 'TV sessions held in memory', lambda: len(tv_sessions))
+metrics_registry.gauge('padelcast_match_codes', 'Match codes held in memory', lambda: len(match_codes))
+metrics_registry.gauge('padelcast_connected_sockets', 'Connected Socket.IO clients', _connected_sockets)
+# Room sizes are exported in buckets, never per TV: a TV ID is all it takes to post scores to it
+ROOM_SIZE_BUCKETS = ((1, '1'), (2, '2'), (5, '3-5'), (10, '6-10'), (float('inf'), '11+'))
+
+def _rooms_by_size():
+    counts = {(label,): 0 for _, label in ROOM_SIZE_BUCKETS}
+    for sockets in _room_socket_counts().values():
+        label = next(label for bound, label in ROOM_SIZE_BUCKETS if sockets <= bound)
+        counts[(label,)] += 1
+    return counts
+
+metrics_registry.gauge('padelcast_tv_rooms', 'TV rooms with connected Socket.IO clients, by number of clients',
+                       _rooms_by_size, ('sockets',))
+
+def is_admin_request():
+    """Check the admin token; admin endpoints are disabled when none is configured"""
+    admin_token = os.environ.get('PADELCAST_ADMIN_TOKEN')
+    if not admin_token:
+        return False
+    supplied = request.headers.get('X-Admin-Token') or request.args.get('token') or ''
+    return hmac.compare_digest(supplied.encode(), admin_token.encode())
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+def too_many_requests(status, error, retry_after):
+    """429/503 response telling the client when to try again"""
+    response = jsonify({'success': False, 'error': error, 'retry_after': round(retry_after, 3)})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(min(retry_after, 3600))))
+    return response
+
+def client_address():
+    # Behind TRUSTED_PROXY_HOPS proxies, ProxyFix has already taken this from X-Forwarded-For
+    return request.remote_addr
+
+@app.before_request
+def ensure_scheduler_started():
+    # Started by the first request rather than at import, so tools and tests
+    # importing the app get no background work
+    if not scheduler.started:
+        scheduler.started_at = scheduler.clock()
+        start_scheduler()
+
+# Still answered while handing over to a new process
+PROBE_ENDPOINTS = frozenset({'healthz', 'readyz', 'metrics_endpoint'})
+
+@app.before_request
+def refuse_during_handover():
+    """After handing state to a new process, refuse requests; clients retry and reach the new process"""
+    if handing_over and request.endpoint not in PROBE_ENDPOINTS:
+        response = too_many_requests(503, 'Server restarting', 1)
+        response.headers['Connection'] = 'close'
+        return response
+    return None
+
+@app.before_request
+def shed_write_load():
+    """Refuse writes while overloaded or from a flooding client, before reading the body"""
+    if request.endpoint not in RATE_LIMITED_ENDPOINTS:
+        return None
+    if loop_lag.lag > max_loop_lag:
+        rejected_requests.inc('overload')
+        return too_many_requests(503, 'Server overloaded', loop_lag.lag)
+    retry_after = rate_limiting and ip_limiter.take(client_address())
+    if retry_after:
+        rejected_requests.inc('client')
+        return too_many_requests(429, 'Too many requests', retry_after)
+    return None
+
+@app.before_request
+def limit_session_creation():
+    """Cap how fast one client address creates TV sessions; each one copies the session table"""
+    if request.endpoint not in SESSION_ENDPOINTS or not rate_limiting:
+        return None
+    retry_after = session_limiter.take(client_address())
+    if not retry_after:
+        return None
+    rejected_requests.inc('session')
+    retry_after = max(1, math.ceil(retry_after))
+    response = app.make_response((render_template('error.html', message='Too many new TV screens, retrying shortly',
+                                                  retry_after=retry_after), 429))
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def key_owner(key, held):
+    """URL of the node owning a routing key, or None to serve it here"""
+    # State held here is served here, even after a ring change, until it is handed over
+    if not hash_ring or held:
+        return None
+    owner = hash_ring.owner(key)
+    return None if owner == node_url else owner
+
+def tv_owner(tv_id):
+    """URL of the node serving a TV, or None to serve it here"""
+    if not isinstance(tv_id, str):
+        return None
+    return key_owner(tv_key(tv_id), tv_id in tv_sessions)
+
+def venue_owner(venue, court_number=None):
+    """URL of the node serving a venue's provisioned TVs, or None to serve them here"""
+    if court_number is None:
+        held = any(court[0] == venue for court in provisioned_courts)
+    else:
+        held = (venue, court_number) in provisioned_courts
+    return key_owner(venue_key(venue), held)
+
+def request_tv_ids():
+    """TV IDs the current request is about"""
+    if 'tv_id' in (request.view_args or {}):
+        return [request.view_args['tv_id']]
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return []
+    if request.endpoint == 'update_match_batch':
+        updates = data.get('updates') if isinstance(data.get('updates'), list) else []
+        return [update.get('tv_id') for update in updates if isinstance(update, dict)]
+    return [data.get('tv_id')]
+
+@app.before_request
+def route_to_owner():
+    """Redirect requests for another node's TVs or venue there; 307 keeps the method and body"""
+    if not hash_ring or request.endpoint not in ROUTED_ENDPOINTS:
+        return None
+    if request.endpoint == 'claim_court_tv':
+        owner = venue_owner(request.args.get('venue', ''), request.view_args['court_number'])
+    elif request.endpoint in ('provision_tvs', 'deprovision_tvs'):
+        owner = venue_owner(str((request.get_json(silent=True) or {}).get('venue', '')))
+    else:
+        tv_ids = request_tv_ids()
+        if moving_tvs and any(tv_id in moving_tvs for tv_id in tv_ids if isinstance(tv_id, str)):
+            return too_many_requests(503, 'TV is moving to another node', 1)
+        # A batch spanning several nodes is served here, update by update
+        owners = {tv_owner(tv_id) for tv_id in tv_ids}
+        owner = owners.pop() if len(owners) == 1 else None
+    if owner is None:
+        return None
+    routed_requests.inc('http')
+    return redirect(owner + (request.full_path if request.query_string else request.path), code=307)
+
+@app.after_request
+def allow_cross_node_status_polls(response):
+    # TV pages poll their own node; once their TV has moved, the poll follows a redirect to another origin
+    if hash_ring and request.endpoint == 'match_status':
+        response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+@app.before_request
+def start_request_profile():
+    profile = request_profiler.begin()
+    if profile is not None:
+        g.request_profile = profile
+
+@app.teardown_request
+def finish_request_profile(exc):
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        request_profiler.end(profile)
+
+@app.after_request
+def record_request_duration(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_duration.observe(time.perf_counter() - start, request.method, route, str(response.status_code))
+    return response
 
 def generate_tv_session():
     """Generate a unique TV session ID and QR code"""
-    tv_id = str(uuid.uuid4())
+    tv_id = hash_ring.mint_tv_id(node_url)
     
     # Create QR code data
     qr_data = {
@@ -73,42 +438,77 @@ def generate_tv_session():
         'timestamp': datetime.now().isoformat()
     }
     
-    try:
-        # Generate QR code
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(json.dumps(qr_data))
-        qr.make(fit=True)
-        
-        # Create QR code image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to base64 for embedding in HTML
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        qr_base64 = base64.b64encode(buffer.getvalue()).decode()
-        
-        print(f"✅ QR code generated successfully for TV {tv_id}")
-        
-    except Exception as e:
-        print(f"❌ Error generating QR code: {e}")
-        # Fallback: create a simple text-based QR representation
-        qr_base64 = None
-        qr_data['error'] = str(e)
+    qr_start = time.perf_counter()
+    qr_base64 = None
+    # SVG pages link the /qr endpoint, so nothing is rendered here
+    embed_png = qr_image_format == 'png'
+    qr_pending = embed_png and not qr_wait_inline
+    if embed_png and qr_wait_inline:
+        try:
+            # Rendered on the worker pool; this request yields until it is done
+            qr_base64 = base64.b64encode(qr_pool.render(json.dumps(qr_data))).decode()
+            print(f"✅ QR code generated successfully for TV {tv_id}")
+        except QRQueueFull:
+            # Pool is saturated: serve a placeholder and push the QR over Socket.IO
+            qr_pending = True
+        except Exception as e:
+            print(f"❌ Error generating QR code: {e}")
+            # Fallback: create a simple text-based QR representation
+            qr_data['error'] = str(e)
+        qr_wait_duration.observe(time.perf_counter() - qr_start)
     
     # Store TV session
     tv_sessions[tv_id] = {
         'created_at': datetime.now(),
         'qr_code': qr_base64,
+        'qr_pending': qr_pending,
         'qr_data': qr_data,
         'linked_match_id': None,
         'is_active': True
     }
+    if qr_pending:
+        start_background_task(render_pending_qr, tv_id, qr_data)
     
     return tv_id, qr_base64, qr_data
 
+def render_pending_qr(tv_id, qr_data):
+    """Render a placeholder session's QR code and send it to the TV's room"""
+    try:
+        qr_base64 = base64.b64encode(qr_pool.render(json.dumps(qr_data), block=True)).decode()
+    except Exception as e:
+        print(f"❌ Error generating QR code: {e}")
+        qr_base64 = None
+        qr_data['error'] = str(e)
+    
+    tv_session = tv_sessions.get(tv_id)
+    if tv_session is None:
+        return
+    tv_session['qr_code'] = qr_base64
+    tv_session['qr_pending'] = False
+    tv_session['qr_pushed'] = True
+    qr_ready = rendered_qr(tv_id)
+    if qr_ready:
+        emit_to_room('qr_ready', qr_ready, tv_id)
+    print(f"✅ QR code generated in the background for TV {tv_id}")
+
+def rendered_qr(tv_id):
+    """qr_ready payload for an unlinked TV whose placeholder QR has been rendered since"""
+    tv_session = tv_sessions.get(tv_id)
+    if tv_session is None or not tv_session.get('qr_pushed') or tv_session['linked_match_id']:
+        return None
+    return {'tv_id': tv_id, 'qr_code': tv_session['qr_code']}
+
 def generate_match_code():
     """Generate a unique 6-character code for the match"""
-    return str(uuid.uuid4())[:6].upper()
+    return code_allocator.allocate()
+
+def remove_match_codes(*match_ids):
+    """Drop the matches' codes and hand them back to the allocator"""
+    match_ids = set(match_ids)
+    codes_to_remove = [code for code, mid in match_codes.items() if mid in match_ids]
+    match_codes.remove_many(codes_to_remove)
+    for code in codes_to_remove:
+        code_allocator.release(code)
 
 def convert_tennis_score(points):
     """Convert point count to tennis score display"""
@@ -130,6 +530,40 @@ def convert_tennis_score(points):
         # If conversion fails, return the original value
         return str(points)
 
+def build_match_snapshot(match, total_sets=None):
+    """Build the scoreboard state sent to TVs for a match"""
+    # Convert scores to tennis format for display
+    team1_display_score = convert_tennis_score(match.team1_game_score)
+    team2_display_score = convert_tennis_score(match.team2_game_score)
+    team1_win_probability = win_probability(match)
+    
+    snapshot = {
+        'team1_name': match.team1_name,
+        'team2_name': match.team2_name,
+        'team1_game_score': team1_display_score,
+        'team2_game_score': team2_display_score,
+        'current_set': match.current_set,
+        'is_match_finished': match.is_match_finished,
+        'winning_team': match.winning_team,
+        'last_updated': match.last_updated.isoformat(),
+        'seq': match.last_seq,
+        'version': match.version,
+        'best_of_sets': match.best_of_sets,
+        'match_format': match.match_format,
+        'is_super_tiebreak': match.is_super_tiebreak,
+        'super_tiebreak_score1': match.super_tiebreak_score1,
+        'super_tiebreak_score2': match.super_tiebreak_score2,
+        'team1_win_probability': round(team1_win_probability, 3),
+        'team2_win_probability': round(1.0 - team1_win_probability, 3)
+    }
+    
+    # Add set scores
+    for i in range(1, (total_sets or match.best_of_sets) + 1):
+        snapshot[f'team1_set{i}_games'] = match.team1_set_games.get(i, 0)
+        snapshot[f'team2_set{i}_games'] = match.team2_set_games.get(i, 0)
+    
+    return snapshot
+
 @app.route('/')
 def index():
     """Main page - now shows TV setup instructions"""
@@ -138,7 +572,8 @@ def index():
     return render_template('tv_setup.html', 
                          tv_id=tv_id, 
                          qr_code=qr_base64, 
-                         qr_data=qr_data)
+                         qr_pending=tv_sessions[tv_id]['qr_pending'],
+                         qr_data=tv_sessions[tv_id]['qr_data'])
 
 @app.route('/tv')
 def tv_setup():
@@ -147,7 +582,8 @@ def tv_setup():
     return render_template('tv_setup.html', 
                          tv_id=tv_id, 
                          qr_code=qr_base64, 
-                         qr_data=qr_data)
+                         qr_pending=tv_sessions[tv_id]['qr_pending'],
+                         qr_data=tv_sessions[tv_id]['qr_data'])
 
 @app.route('/tv/<tv_id>')
 def tv_display(tv_id):
@@ -162,6 +598,7 @@ def tv_display(tv_id):
         return render_template('tv_qr_display.html', 
                              tv_id=tv_id, 
                              qr_code=tv_session['qr_code'],
+                             qr_pending=tv_session['qr_pending'],
                              qr_data=tv_session['qr_data'])
     
     # If match is linked, show the match display
@@ -174,6 +611,7 @@ def tv_display(tv_id):
         return render_template('tv_qr_display.html', 
                              tv_id=tv_id, 
                              qr_code=tv_session['qr_code'],
+                             qr_pending=tv_session['qr_pending'],
                              qr_data=tv_session['qr_data'])
     
     return render_template('tv_display.html', 
@@ -192,6 +630,42 @@ def tv_display(tv_id):
                          championship_name=match.championship_name,
                          court_logo_data=match.court_logo_data)
 
+@app.route('/qr/<tv_id>.<any(svg, png):fmt>')
+def qr_image(tv_id, fmt):
+    """QR code image for a TV session, rendered once per payload and cached"""
+    tv_session = tv_sessions.get(tv_id)
+    if tv_session is None:
+        return jsonify({'success': False, 'error': 'Invalid TV ID'}), 404
+    
+    payload = json.dumps(tv_session['qr_data'])
+    if not qr_wait_inline and qr_pool.cache.get((fmt, payload)) is None:
+        # This view must not wait for a render: the page retries the image shortly
+        start_background_task(render_qr_image, payload, fmt)
+        return too_many_requests(503, 'QR code is being rendered', 1)
+    try:
+        image = qr_pool.render(payload, fmt, block=True)
+    except Exception as e:
+        print(f"❌ Error generating QR code: {e}")
+        return jsonify({'success': False, 'error': 'QR generation failed'}), 500
+    
+    # A TV ID's QR payload never changes, so browsers can keep the image
+    response = Response(image, content_type=QR_CONTENT_TYPES[fmt])
+    response.set_etag(hashlib.sha1(f'{fmt}:{payload}'.encode()).hexdigest())
+    response.cache_control.private = True
+    response.cache_control.max_age = 86400
+    return response.make_conditional(request)
+
+def render_qr_image(payload, fmt):
+    """Render a /qr image into the cache, outside the request that asked for it"""
+    try:
+        qr_pool.render(payload, fmt, block=True)
+    except Exception as e:
+        print(f"❌ Error generating QR code: {e}")
+
+@app.context_processor
+def inject_qr_image_format():
+    return {'qr_image_format': qr_image_format}
+
 @app.route('/api/link-tv', methods=['POST'])
 def link_tv():
     """API endpoint for iPhone app to link to a TV via QR code"""
@@ -202,6 +676,11 @@ def link_tv():
     if not tv_id or tv_id not in tv_sessions:
         return jsonify({'success': False, 'error': 'Invalid TV ID'}), 400
     
+    retry_after = rate_limiting and tv_link_limiter.take(tv_id)
+    if retry_after:
+        rejected_requests.inc('tv')
+        return too_many_requests(429, 'Too many links for this TV', retry_after)
+    
     tv_session = tv_sessions[tv_id]
     
     # Create new match
@@ -252,19 +731,24 @@ def reset_tv(tv_id):
         match_id = tv_session['linked_match_id']
         if match_id in active_matches:
             del active_matches[match_id]
-        # Remove from match_codes
-        codes_to_remove = [code for code, mid in match_codes.items() if mid == match_id]
-        for code in codes_to_remove:
-            del match_codes[code]
+        remove_match_codes(match_id)
+    
+    if tv_session.get('provisioned'):
+        # Printed QR sheets point at this ID, so a provisioned TV keeps it
+        tv_session['linked_match_id'] = None
+        print(f"🔄 Provisioned TV {tv_id} reset")
+        return jsonify({
+            'success': True,
+            'new_tv_id': tv_id,
+            'qr_code': tv_session['qr_code']
+        })
     
     # Generate new QR code
     new_tv_id, qr_base64, qr_data = generate_tv_session()
     
-    # Update the existing session
-    tv_sessions[new_tv_id] = tv_sessions[tv_id]
-    tv_sessions[new_tv_id]['qr_code'] = qr_base64
-    tv_sessions[new_tv_id]['qr_data'] = qr_data
-    tv_sessions[new_tv_id]['linked_match_id'] = None
+    # Carry the existing session over; the fresh dict stays in place so a
+    # background QR render still finds it
+    tv_sessions[new_tv_id]['created_at'] = tv_session['created_at']
     
     # Remove old session
     del tv_sessions[tv_id]
@@ -277,32 +761,95 @@ def reset_tv(tv_id):
         'qr_code': qr_base64
     })
 
+MAX_BATCH_UPDATES = 100
+MAX_CLIENT_ID_LENGTH = 64
+MAX_WRITERS_PER_MATCH = 16
+
 @app.route('/api/update-match', methods=['POST'])
 def update_match():
     """API endpoint for iPhone app to update match data"""
+    received_ms = now_ms()
     print(f"📱 Received update request from iPhone app")
-    data = request.get_json()
+    body, status = apply_match_update(request.get_json(), received_ms)
+    if status in (429, 503):
+        return too_many_requests(status, body['error'], body['retry_after'])
+    return jsonify(body), status
+
+@app.route('/api/update-match/batch', methods=['POST'])
+def update_match_batch():
+    """Apply several match updates in one request; results come back in order"""
+    received_ms = now_ms()
+    updates = (request.get_json(silent=True) or {}).get('updates')
+    if not isinstance(updates, list) or not 0 < len(updates) <= MAX_BATCH_UPDATES:
+        return jsonify({'success': False, 'error': f'updates must be a list of 1 to {MAX_BATCH_UPDATES} updates'}), 400
+    
+    print(f"📱 Received batch of {len(updates)} updates")
+    results = []
+    for data in updates:
+        body, status = apply_match_update(data if isinstance(data, dict) else {}, received_ms)
+        results.append(dict(body, status=status))
+    return jsonify({'success': all(result['success'] for result in results), 'results': results})
+
+def apply_match_update(data, received_ms):
+    """Apply one update from a scoring device; returns (response body, status)"""
     print(f"📱 Request data: {data}")
     
     tv_id = data.get('tv_id')
     print(f"📱 TV ID: {tv_id}")
     
+    owner = tv_owner(tv_id)
+    if owner:
+        # Part of a batch spanning several nodes; the clients resend it to `node`
+        routed_requests.inc('misdirected')
+        return {'success': False, 'error': 'TV is served by another node', 'node': owner}, 421
+    
     if not tv_id or tv_id not in tv_sessions:
         print(f"❌ Invalid TV ID: {tv_id}")
-        return jsonify({'success': False, 'error': 'Invalid TV ID'}), 400
+        return {'success': False, 'error': 'Invalid TV ID'}, 400
+    
+    if tv_id in moving_tvs:
+        return {'success': False, 'error': 'TV is moving to another node', 'retry_after': 1}, 503
+    
+    retry_after = rate_limiting and tv_update_limiter.take(tv_id)
+    if retry_after:
+        rejected_requests.inc('tv')
+        return {'success': False, 'error': 'Too many updates for this TV', 'retry_after': round(retry_after, 3)}, 429
     
     tv_session = tv_sessions[tv_id]
     match_id = tv_session.get('linked_match_id')
     
     if not match_id:
         print(f"❌ No match linked to TV: {tv_id}")
-        return jsonify({'success': False, 'error': 'No match linked to this TV'}), 400
+        return {'success': False, 'error': 'No match linked to this TV'}, 400
     
     match = active_matches.get(match_id)
     
     if not match:
         print(f"❌ Match not found for ID: {match_id}")
-        return jsonify({'success': False, 'error': 'Match not found'}), 404
+        return {'success': False, 'error': 'Match not found'}, 404
+    
+    # High-water mark per writer: its retried or reordered updates must not roll the
+    # score back, while another device's clock never makes this one's updates stale
+    seq = data.get('seq')
+    if seq is not None:
+        if not isinstance(seq, int) or isinstance(seq, bool):
+            return {'success': False, 'error': 'seq must be an integer'}, 400
+        client_id = data.get('client_id', '')
+        if not isinstance(client_id, str) or len(client_id) > MAX_CLIENT_ID_LENGTH:
+            return {'success': False, 'error': f'client_id must be a string of up to {MAX_CLIENT_ID_LENGTH} characters'}, 400
+        last_seq = match.writer_seqs.get(client_id)
+        if last_seq is not None and seq <= last_seq:
+            reason = 'duplicate' if seq == last_seq else 'stale'
+            match_updates.inc(reason)
+            print(f"⏭️ Dropped {reason} update {seq} for match {match_id} (last {last_seq})")
+            return {'success': True, 'applied': False, 'reason': reason, 'last_seq': last_seq}, 200
+        match.writer_seqs.pop(client_id, None)
+        if len(match.writer_seqs) >= MAX_WRITERS_PER_MATCH:
+            # Forget the writer heard from least recently
+            del match.writer_seqs[next(iter(match.writer_seqs))]
+        match.writer_seqs[client_id] = seq
+        match.last_seq = seq
+    match.version += 1
     
     print(f"📱 Updating match {match_id} with data: {data}")
     
@@ -340,49 +887,85 @@ def update_match():
     match.winning_team = data.get('winning_team', match.winning_team)
     match.last_updated = datetime.now()
     
-    # Convert scores to tennis format for display
-    team1_display_score = convert_tennis_score(match.team1_game_score)
-    team2_display_score = convert_tennis_score(match.team2_game_score)
+    applied_ms = now_ms()
     
-    # Prepare update data
-    update_data = {
-        'team1_name': match.team1_name,
-        'team2_name': match.team2_name,
-        'team1_game_score': team1_display_score,
-        'team2_game_score': team2_display_score,
-        'current_set': match.current_set,
-        'is_match_finished': match.is_match_finished,
-        'winning_team': match.winning_team,
-        'last_updated': match.last_updated.isoformat(),
-        'best_of_sets': match.best_of_sets,
-        'match_format': match.match_format,
-        'is_super_tiebreak': match.is_super_tiebreak,
-        'super_tiebreak_score1': match.super_tiebreak_score1,
-        'super_tiebreak_score2': match.super_tiebreak_score2
-    }
+    # Fold finished matches into player and team records (only counted once)
+    if match.is_match_finished and match_stats.record_match(match):
+        print(f"📊 Recorded stats for finished match {match_id}")
     
-    # Add set scores
-    for i in range(1, match.best_of_sets + 1):
-        update_data[f'team1_set{i}_games'] = match.team1_set_games.get(i, 0)
-        update_data[f'team2_set{i}_games'] = match.team2_set_games.get(i, 0)
+    # Prepare update data; the TV ID lets a relay subscribed to several TVs route it
+    update_data = build_match_snapshot(match)
+    update_data['tv_id'] = tv_id
+    
+    # Stamp trace times so the TV can ack back with its render time
+    trace = {
+        'venue': match.championship_name,
+        'client_ts': parse_client_timestamp(data.get('client_timestamp')),
+        'server_received_ts': received_ms,
+        'server_emitted_ts': now_ms()
+    }
+    update_data['trace'] = trace
     
-    # Emit update to the specific TV
-    socketio.emit('match_update', update_data, room=tv_id)
+    # Emit update to the specific TV; TVs that are behind only get the latest state
+    with emit_duration.time('match_update'):
+        frame_outbox.publish('match_update', update_data, tv_id, list(socket_rooms().get(tv_id, {})))
+    latency_tracker.record_update(trace, applied_ms, now_ms())
     
+    match_updates.inc('applied')
     print(f"✅ Successfully updated match {match_id} via TV {tv_id}")
     
-    return jsonify({'success': True})
+    if seq is None:
+        return {'success': True}, 200
+    return {'success': True, 'applied': True, 'seq': seq}, 200
+
+def socket_redirect(tv_id):
+    """Data of the redirect event for a TV socket that joined the wrong node, or None"""
+    owner = tv_owner(tv_id)
+    if owner is None:
+        return None
+    routed_requests.inc('socket')
+    return {'tv_id': tv_id, 'url': f'{owner}/tv/{tv_id}'}
 
 @socketio.on('join')
 def on_join(data):
     """Handle TV display joining a match room"""
     tv_id = data['tv_id']
+    redirect_data = socket_redirect(tv_id)
+    if redirect_data:
+        emit('redirect', redirect_data)
+        return
     join_room(tv_id)
+    frame_outbox.joined(request.sid, tv_id)
+    # The room push may have gone out before this page's socket joined
+    qr_ready = rendered_qr(tv_id)
+    if qr_ready:
+        emit('qr_ready', qr_ready)
     print(f"TV display joined room: {tv_id}")
 
+def handle_render_ack(sid, data):
+    """A TV rendered a match update: release its next frame and record latency"""
+    frame_outbox.ack(sid)
+    if not isinstance(data, dict) or not isinstance(data.get('trace'), dict):
+        return
+    rendered_ms = parse_client_timestamp(data.get('rendered_ts'))
+    if rendered_ms is not None:
+        latency_tracker.record_render(data['trace'], rendered_ms)
+
+@socketio.on('leave')
+def on_leave(data):
+    """Stop sending a TV's updates to this client (used by venue relays)"""
+    leave_room(data['tv_id'])
+    frame_outbox.left(request.sid, data['tv_id'])
+
+@socketio.on('render_ack')
+def on_render_ack(data):
+    """TV display reports when it rendered a traced match update"""
+    handle_render_ack(request.sid, data)
+
 @socketio.on('disconnect')
 def on_disconnect():
     """Handle TV display disconnection"""
+    frame_outbox.forget(request.sid)
     print("TV display disconnected")
 
 @app.route('/api/match-status/<tv_id>')
@@ -401,32 +984,9 @@ def match_status(tv_id):
     if not match:
         return jsonify({'success': False, 'error': 'Match not found'}), 404
     
-    # Convert scores to tennis format for display
-    team1_display_score = convert_tennis_score(match.team1_game_score)
-    team2_display_score = convert_tennis_score(match.team2_game_score)
-    
-    # Build dynamic match data
-    match_data = {
-        'team1_name': match.team1_name,
-        'team2_name': match.team2_name,
-        'team1_game_score': team1_display_score,
-        'team2_game_score': team2_display_score,
-        'current_set': match.current_set,
-        'is_match_finished': match.is_match_finished,
-        'winning_team': match.winning_team,
-        'last_updated': match.last_updated.isoformat(),
-        'best_of_sets': match.best_of_sets,
-        'match_format': match.match_format,
-        'is_super_tiebreak': match.is_super_tiebreak,
-        'super_tiebreak_score1': match.super_tiebreak_score1,
-        'super_tiebreak_score2': match.super_tiebreak_score2
-    }
-    
-    # Add dynamic set data - include all sets that have been played
+    # Build dynamic match data - include all sets that have been played
     max_sets_played = max(match.best_of_sets, max(match.team1_set_games.keys(), default=0), max(match.team2_set_games.keys(), default=0))
-    for i in range(1, max_sets_played + 1):
-        match_data[f'team1_set{i}_games'] = match.team1_set_games.get(i, 0)
-        match_data[f'team2_set{i}_games'] = match.team2_set_games.get(i, 0)
+    match_data = build_match_snapshot(match, max_sets_played)
     
     # Add the actual number of sets being displayed
     match_data['total_sets_displayed'] = max_sets_played
@@ -436,48 +996,484 @@ def match_status(tv_id):
         'match': match_data
     })
 
+@app.route('/healthz')
+def healthz():
+    """Liveness probe: constant time, creates no sessions"""
+    return jsonify({'status': 'ok', 'uptime_s': round(time.time() - started_at, 1)})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe: background jobs are getting to run; reports in-memory state sizes"""
+    ready = scheduler.alive() and not handing_over
+    return jsonify({
+        'status': 'ready' if ready else 'not ready',
+        'uptime_s': round(time.time() - started_at, 1),
+        'active_matches': len(active_matches),
+        'tv_sessions': len(tv_sessions),
+        'match_codes': len(match_codes),
+        'connected_sockets': _connected_sockets(),
+        'qr_render_queue': qr_pool.pending,
+        'background_jobs': scheduler.status(),
+        'takeover': hot_restart.last_takeover
+    }), 200 if ready else 503
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics"""
+    return Response(metrics_registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/admin/profiler/start', methods=['POST'])
+def start_profiler():
+    """Start the sampling profiler or per-request cProfile for a bounded time"""
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', 'sample')
+    duration = data.get('duration', 10)
+    
+    try:
+        if mode == 'sample':
+            started = sampling_profiler.start(duration, data.get('interval_ms', 5) / 1000.0)
+        elif mode == 'request':
+            started = request_profiler.start(duration, data.get('fraction', 0.1))
+        else:
+            return jsonify({'success': False, 'error': f'Unknown mode: {mode}'}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if not started:
+        return jsonify({'success': False, 'error': 'Profiler already running'}), 409
+    
+    print(f"🔬 Profiler started: mode={mode}, duration={duration}s")
+    return jsonify({'success': True, 'mode': mode})
+
+@app.route('/admin/profiler/stop', methods=['POST'])
+def stop_profiler():
+    """Stop any running profiler early"""
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    sampling_profiler.stop()
+    request_profiler.stop()
+    return jsonify({'success': True})
+
+@app.route('/admin/profiler/status')
+def profiler_status():
+    """State of both profilers"""
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    return jsonify({
+        'success': True,
+        'sample': sampling_profiler.status(),
+        'request': request_profiler.status()
+    })
+
+@app.route('/admin/profiler/report')
+def profiler_report():
+    """Collapsed stacks (mode=sample) or a pstats summary (mode=request) as text"""
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    if request.args.get('mode', 'sample') == 'request':
+        report = request_profiler.report(request.args.get('limit', 50, type=int))
+    else:
+        report = sampling_profiler.collapsed()
+    return Response(report, content_type='text/plain; charset=utf-8')
+
+MAX_PROVISIONED_TVS = 500
+
+def provision_tv_session(venue, court_number):
+    """Create (or reuse) the pre-registered TV session for a venue's court"""
+    tv_id = provisioned_courts.get((venue, court_number))
+    if tv_id in tv_sessions:
+        return tv_id
+    
+    # Courts of a venue share a routing key, so they are served by one node
+    tv_id = hash_ring.mint_tv_id(node_url, venue_key(venue))
+    tv_sessions[tv_id] = {
+        'created_at': datetime.now(),
+        'qr_code': None,
+        'qr_pending': False,
+        'qr_data': {
+            'tv_id': tv_id,
+            'server_url': request.host_url.rstrip('/'),
+            'timestamp': datetime.now().isoformat()
+        },
+        'linked_match_id': None,
+        'is_active': True,
+        'provisioned': True,
+        'venue': venue,
+        'court_number': court_number
+    }
+    provisioned_courts[(venue, court_number)] = tv_id
+    return tv_id
+
+@app.route('/admin/tvs/provision', methods=['POST'])
+def provision_tvs():
+    """Pre-register a TV session per court and return their QR codes as JSON, a printable sheet or a zip"""
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    if not qr_wait_inline:
+        # Views run on the asyncio loop, and a sheet takes seconds to render
+        return jsonify({'success': False, 'error': 'Provisioning needs the eventlet server (app.py)'}), 501
+    
+    data = request.get_json(silent=True) or {}
+    venue = str(data.get('venue', ''))
+    output = data.get('output', 'json')
+    fmt = data.get('format', 'svg')
+    try:
+        count = int(data.get('count', 0))
+        first_court = int(data.get('first_court', 1))
+    except (ValueError, TypeError):
+        return jsonify({'success': False, 'error': 'count and first_court must be integers'}), 400
+    if not 1 <= count <= MAX_PROVISIONED_TVS:
+        return jsonify({'success': False, 'error': f'count must be between 1 and {MAX_PROVISIONED_TVS}'}), 400
+    if fmt not in QR_RENDERERS or output not in ('json', 'html', 'zip'):
+        return jsonify({'success': False, 'error': 'Unknown format or output'}), 400
+    
+    court_numbers = [str(first_court + i) for i in range(count)]
+    tv_ids = [provision_tv_session(venue, court_number) for court_number in court_numbers]
+    
+    render_start = time.perf_counter()
+    try:
+        images = run_blocking(qr_pool.render_batch, [json.dumps(tv_sessions[tv_id]['qr_data']) for tv_id in tv_ids], fmt)
+    except Exception as e:
+        print(f"❌ Error generating QR sheet: {e}")
+        return jsonify({'success': False, 'error': 'QR generation failed'}), 500
+    render_ms = round((time.perf_counter() - render_start) * 1000.0, 1)
+    print(f"🖨️ Provisioned {count} TVs for venue '{venue}' in {render_ms}ms")
+    
+    tvs = [{
+        'court_number': court_number,
+        'tv_id': tv_id,
+        'claim_url': url_for('claim_court_tv', court_number=court_number, venue=venue or None, _external=True),
+        'qr_url': url_for('qr_image', tv_id=tv_id, fmt=fmt, _external=True)
+    } for court_number, tv_id in zip(court_numbers, tv_ids)]
+    
+    if output == 'html':
+        for tv, image in zip(tvs, images):
+            tv['image'] = image.decode() if fmt == 'svg' else base64.b64encode(image).decode()
+        return render_template('qr_sheet.html', venue=venue, tvs=tvs, fmt=fmt)
+    
+    if output == 'zip':
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for tv, image in zip(tvs, images):
+                archive.writestr(f"court-{tv['court_number']}.{fmt}", image)
+            archive.writestr('manifest.json', json.dumps({'venue': venue, 'tvs': tvs}, indent=2))
+        response = Response(buffer.getvalue(), content_type='application/zip')
+        response.headers['Content-Disposition'] = 'attachment; filename=padelcast-tvs.zip'
+        return response
+    
+    return jsonify({'success': True, 'venue': venue, 'render_ms': render_ms, 'tvs': tvs})
+
+@app.route('/admin/tvs/deprovision', methods=['POST'])
+def deprovision_tvs():
+    """Retire a venue's provisioned TVs ({"venue": ..., "courts": [...]}, all courts if omitted) and their matches"""
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    venue = str(data.get('venue', ''))
+    courts = data.get('courts')
+    if courts is not None and not isinstance(courts, list):
+        return jsonify({'success': False, 'error': 'courts must be a list of court numbers'}), 400
+    courts = None if courts is None else {str(court) for court in courts}
+    
+    retired = {court: tv_id for court, tv_id in provisioned_courts.items()
+               if court[0] == venue and (courts is None or court[1] in courts)}
+    match_ids = [tv_sessions[tv_id]['linked_match_id'] for tv_id in retired.values()
+                 if tv_id in tv_sessions and tv_sessions[tv_id]['linked_match_id']]
+    active_matches.remove_many(match_ids)
+    remove_match_codes(*match_ids)
+    tv_sessions.remove_many(retired.values())
+    provisioned_courts.remove_many(retired)
+    print(f"🗑️ Deprovisioned {len(retired)} TVs for venue '{venue}'")
+    return jsonify({'success': True, 'venue': venue, 'deprovisioned': sorted(court for _, court in retired)})
+
+@app.route('/tv/court/<court_number>')
+def claim_court_tv(court_number):
+    """Open the provisioned TV session for a court (?venue= when provisioned with one)"""
+    tv_id = provisioned_courts.get((request.args.get('venue', ''), court_number))
+    if tv_id not in tv_sessions:
+        return render_template('error.html', message=f"No TV provisioned for court {court_number}"), 404
+    return redirect(url_for('tv_display', tv_id=tv_id))
+
+def stats_scope():
+    """Which matches a stats response covers: in a cluster, only those served by this node"""
+    return {'node': node_url or None, 'partial': len(hash_ring) > 1}
+
+@app.route('/api/latency')
+def latency_report():
+    """Per-venue, per-stage score latency histograms"""
+    return jsonify({
+        'success': True,
+        'latency': latency_tracker.snapshot(),
+        **stats_scope()
+    })
+
+@app.route('/api/stats/leaderboard')
+def stats_leaderboard():
+    """Top players or teams for a metric"""
+    kind = request.args.get('kind', 'player')
+    metric = request.args.get('metric', 'wins')
+    limit = request.args.get('limit', 10, type=int)
+    
+    try:
+        leaders = match_stats.leaderboard(kind, metric, min(limit, 100))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'kind': kind,
+        'metric': metric,
+        'leaders': leaders,
+        **stats_scope()
+    })
+
+@app.route('/api/stats/<kind>/<path:name>')
+def stats_record(kind, name):
+    """Win/loss record for a single player or team"""
+    record = match_stats.get_record(kind, name)
+    if not record:
+        return jsonify({'success': False, 'error': 'No stats found', **stats_scope()}), 404
+    
+    return jsonify({
+        'success': True,
+        'kind': kind,
+        'record': record,
+        **stats_scope()
+    })
+
+def export_tvs(tv_ids):
+    """JSON-safe state of TV sessions with their matches and codes, to hand them to another node"""
+    sessions = {tv_id: tv_sessions[tv_id] for tv_id in tv_ids if tv_id in tv_sessions}
+    matches = {tv_session['linked_match_id']: active_matches.get(tv_session['linked_match_id'])
+               for tv_session in sessions.values() if tv_session['linked_match_id']}
+    matches = {match_id: match for match_id, match in matches.items() if match is not None}
+    return {
+        'tv_sessions': {tv_id: dict(tv_session, created_at=tv_session['created_at'].isoformat())
+                        for tv_id, tv_session in sessions.items()},
+        'matches': {match_id: match.to_state() for match_id, match in matches.items()},
+        'match_codes': {code: match_id for code, match_id in match_codes.items() if match_id in matches},
+        'provisioned_courts': [[venue, court_number, tv_id]
+                               for (venue, court_number), tv_id in provisioned_courts.items() if tv_id in sessions]
+    }
+
+def import_tvs(state):
+    """Take over TV sessions exported by another node; returns how many"""
+    # Matches first, so a request finding a TV also finds its match
+    active_matches.update({match_id: Match.from_state(match_state)
+                           for match_id, match_state in state.get('matches', {}).items()})
+    codes = {}
+    for code, match_id in state.get('match_codes', {}).items():
+        if match_codes.get(code, match_id) != match_id:
+            # Issued here too (overlapping PADELCAST_WORKER_ID/COUNT): give the imported match a new code
+            code = generate_match_code()
+            print(f"⚠️ Match code clash on import, match {match_id} now has code {code}")
+        else:
+            code_allocator.claim(code)
+        codes[code] = match_id
+    match_codes.update(codes)
+    sessions = state.get('tv_sessions', {})
+    tv_sessions.update({tv_id: dict(tv_session, created_at=datetime.fromisoformat(tv_session['created_at']))
+                        for tv_id, tv_session in sessions.items()})
+    provisioned_courts.update({(venue, court_number): tv_id
+                               for venue, court_number, tv_id in state.get('provisioned_courts', [])})
+    return len(sessions)
+
+def drop_tvs(tv_ids):
+    """Forget TV sessions handed over to another node, with their matches and codes"""
+    tv_ids = set(tv_ids)
+    match_ids = {tv_sessions[tv_id]['linked_match_id'] for tv_id in tv_ids if tv_id in tv_sessions}
+    codes = [code for code, match_id in match_codes.items() if match_id in match_ids]
+    tv_sessions.remove_many(tv_ids)
+    active_matches.remove_many(match_ids)
+    match_codes.remove_many(codes)
+    for code in codes:
+        code_allocator.forget(code)
+    provisioned_courts.remove_many([court for court, tv_id in provisioned_courts.items() if tv_id in tv_ids])
+
+def set_cluster(nodes, version):
+    """Switch to a ring of these nodes if `version` is newer than ours; returns True if it did"""
+    global hash_ring, ring_version
+    if version <= ring_version:
+        return False
+    hash_ring = HashRing(nodes)
+    ring_version = version
+    print(f"🔀 Cluster v{version}: {', '.join(hash_ring.nodes)}")
+    return True
+
+def hand_over(owner, tv_ids):
+    """Send TVs with their matches to their new owner, then stop serving them here"""
+    # Writes to these TVs get 503 until the owner has them, so none are lost
+    moving_tvs.update(tv_ids)
+    try:
+        response = run_blocking(
+            requests.post,
+            f'{owner}/admin/cluster/import',
+            json=dict(export_tvs(tv_ids), nodes=hash_ring.nodes, version=ring_version),
+            headers={'X-Admin-Token': os.environ.get('PADELCAST_ADMIN_TOKEN', '')},
+            timeout=(3.05, 30))
+        response.raise_for_status()
+    except requests.RequestException as e:
+        moving_tvs.difference_update(tv_ids)
+        handoff_tvs.inc('failed', amount=len(tv_ids))
+        print(f"❌ Handing {len(tv_ids)} TVs to {owner} failed, keeping them for now: {e}")
+        return 0
+    drop_tvs(tv_ids)
+    moving_tvs.difference_update(tv_ids)
+    for tv_id in tv_ids:
+        emit_to_room('redirect', {'tv_id': tv_id, 'url': f'{owner}/tv/{tv_id}'}, tv_id)
+    handoff_tvs.inc('sent', amount=len(tv_ids))
+    print(f"📤 Handed {len(tv_ids)} TVs to {owner}")
+    return len(tv_ids)
+
+def rebalance():
+    """Start handing every TV held here but owned by another node to its owner; returns {node: TVs moving}"""
+    if not hash_ring or node_url not in hash_ring or handing_over:
+        return {}
+    by_owner = {}
+    for tv_id in tv_sessions:
+        owner = hash_ring.owner(tv_key(tv_id))
+        if owner != node_url and tv_id not in moving_tvs:
+            by_owner.setdefault(owner, []).append(tv_id)
+    for owner, tv_ids in by_owner.items():
+        # Marked before the task starts, so the next run does not send them again
+        moving_tvs.update(tv_ids)
+        start_background_task(hand_over, owner, tv_ids)
+    return {owner: len(tv_ids) for owner, tv_ids in by_owner.items()}
+
+@app.route('/admin/cluster', methods=['GET', 'POST'])
+def cluster():
+    """Show the ring, or replace it ({"nodes": [...], "version": n}) and hand over TVs that moved"""
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        nodes = data.get('nodes')
+        version = data.get('version', ring_version + 1)
+        if not node_url:
+            return jsonify({'success': False, 'error': 'PADELCAST_NODE_URL is not set'}), 400
+        if not isinstance(nodes, list) or not all(isinstance(node, str) and node for node in nodes):
+            return jsonify({'success': False, 'error': 'nodes must be a list of node URLs'}), 400
+        if not isinstance(version, int):
+            return jsonify({'success': False, 'error': 'version must be an integer'}), 400
+        set_cluster([node.rstrip('/') for node in nodes], version)
+        return jsonify({
+            'success': True,
+            'version': ring_version,
+            'nodes': hash_ring.nodes,
+            'moving': rebalance()
+        })
+    
+    return jsonify({
+        'success': True,
+        'node': node_url or None,
+        'version': ring_version,
+        'nodes': hash_ring.nodes,
+        'tv_sessions': len(tv_sessions),
+        'moving_tvs': len(moving_tvs)
+    })
+
+@app.route('/admin/cluster/import', methods=['POST'])
+def import_cluster_state():
+    """Take over TVs handed over by another node"""
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    count = import_tvs(data)
+    handoff_tvs.inc('received', amount=count)
+    print(f"📥 Took over {count} TVs")
+    # The sender may know of a newer ring than we do
+    if isinstance(data.get('version'), int) and set_cluster(data.get('nodes') or [], data['version']):
+        scheduler.after('rebalance_now', 0, rebalance)
+    return jsonify({'success': True, 'tvs': count})
+
+def export_state():
+    """Everything a new process of this server needs to carry on"""
+    return dict(export_tvs(list(tv_sessions)), nodes=hash_ring.nodes, version=ring_version,
+                code_cursor=code_allocator.cursor)
+
+def import_state(state):
+    """Carry on from export_state() of the previous process; returns how many TVs"""
+    set_cluster(state.get('nodes') or [], state.get('version', 0))  # keeps a ring changed at runtime
+    code_allocator.resume_from(state.get('code_cursor', 0))
+    return import_tvs(state)
+
+def pause_for_handover():
+    global handing_over
+    handing_over = True
+
+def resume_after_handover():
+    global handing_over
+    handing_over = False
+
+def drain_sockets(seconds=None):
+    """Disconnect every Socket.IO client, spread over `seconds` so they do not all reconnect at once"""
+    seconds = float(os.environ.get('HANDOVER_DRAIN_SECONDS', 2)) if seconds is None else seconds
+    sids = list(socket_rooms().get(None, {}))
+    for sid in sids:
+        socketio.server.disconnect(sid)
+        socketio.sleep(seconds / len(sids))
+    print(f"👋 Disconnected {len(sids)} sockets")
+
+hot_restart = HotRestart(export_state, import_state, pause_for_handover, resume_after_handover, drain_sockets)
+
 # Cleanup old matches and TV sessions (older than 24 hours)
-def cleanup_old_sessions():
-    """Remove old matches and TV sessions"""
-    while True:
-        current_time = datetime.now()
-        to_remove_matches = []
-        to_remove_tvs = []
-        
-        # Clean up old matches
-        for match_id, match in active_matches.items():
-            if (current_time - match.created_at).total_seconds() > 86400:  # 24 hours
-                to_remove_matches.append(match_id)
-        
-        # Clean up old TV sessions
-        for tv_id, tv_session in tv_sessions.items():
-            if (current_time - tv_session['created_at']).total_seconds() > 86400:  # 24 hours
-                to_remove_tvs.append(tv_id)
-        
-        # Remove old matches
-        for match_id in to_remove_matches:
-            del active_matches[match_id]
-            # Remove from match_codes
-            codes_to_remove = [code for code, mid in match_codes.items() if mid == match_id]
-            for code in codes_to_remove:
-                del match_codes[code]
-        
-        # Remove old TV sessions
-        for tv_id in to_remove_tvs:
-            del tv_sessions[tv_id]
-        
-        if to_remove_matches or to_remove_tvs:
-            print(f"Cleaned up {len(to_remove_matches)} old matches and {len(to_remove_tvs)} old TV sessions")
-        
-        time.sleep(3600)  # Run every hour
+def sweep_old_sessions(current_time=None):
+    """Remove matches and TV sessions older than 24 hours; returns (matches, tvs) removed"""
+    sweep_start = time.perf_counter()
+    current_time = current_time or datetime.now()
+    to_remove_matches = []
+    to_remove_tvs = []
+    
+    # Clean up old matches
+    for match_id, match in active_matches.items():
+        if (current_time - match.created_at).total_seconds() > 86400:  # 24 hours
+            to_remove_matches.append(match_id)
+    
+    # Clean up old TV sessions
+    for tv_id, tv_session in tv_sessions.items():
+        if tv_session.get('provisioned'):
+            continue  # kept until re-provisioned, their QR codes are printed
+        if (current_time - tv_session['created_at']).total_seconds() > 86400:  # 24 hours
+            to_remove_tvs.append(tv_id)
+    
+    # Remove old matches and TV sessions, one copy-on-write per container
+    active_matches.remove_many(to_remove_matches)
+    remove_match_codes(*to_remove_matches)
+    tv_sessions.remove_many(to_remove_tvs)
+    # Matches gone from memory cannot finish again, so stats need not remember them
+    match_stats.retain_matches(active_matches)
+    
+    if to_remove_matches or to_remove_tvs:
+        print(f"Cleaned up {len(to_remove_matches)} old matches and {len(to_remove_tvs)} old TV sessions")
+    
+    cleanup_duration.observe(time.perf_counter() - sweep_start)
+    return len(to_remove_matches), len(to_remove_tvs)
 
-# Start cleanup thread
-cleanup_thread = threading.Thread(target=cleanup_old_sessions, daemon=True)
-cleanup_thread.start()
+# Sweep hourly; the first sweep a minute after startup catches sessions left
+# over from before a restart
+scheduler.every('expire_sessions', 3600, sweep_old_sessions, first_run_in=60)
+# Retry handovers that failed, e.g. while the new owner was still starting
+scheduler.every('rebalance', 30, rebalance)
+scheduler.every('expire_frame_credits', frame_outbox.ack_timeout, frame_outbox.expire)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PadelCast cloud server')
+    parser.add_argument('--takeover', action='store_true',
+                        help='take over state and listening socket from the running server (hot restart)')
+    args = parser.parse_args()
     port = int(os.environ.get('PORT', 8080))
     print("🎾 PadelCast QR Code TV Web Server Starting...")
     print(f"📺 TV setup at: http://localhost:{port}/tv")
     print(f"📱 Scan QR codes to link iPhone apps to TVs")
-    socketio.run(app, host='0.0.0.0', port=port, debug=False, allow_unsafe_werkzeug=True)
+    if socketio.async_mode == 'eventlet':
+        handover_path = os.environ.get('PADELCAST_HANDOVER_SOCKET',
+                                       os.path.join(tempfile.gettempdir(), f'padelcast-{port}.sock'))
+        hot_restart.serve(app, port, handover_path, takeover=args.takeover)
+    else:
+        socketio.run(app, host='0.0.0.0', port=port, debug=False, allow_unsafe_werkzeug=True)
@@ -0,0 +1,212 @@
+"""
+Asyncio-native server mode for the PadelCast cloud server.
+
+Serves the same routes and Socket.IO events as app.py, with python-socketio's
+AsyncServer handling the websockets instead of Flask-SocketIO on eventlet.
+HTTP routes are the Flask views from app.py, called directly on the event
+loop: they do no I/O, so all match state is only ever touched from the
+loop thread and each route keeps exactly the same semantics. QR codes are
+the exception: they render on a worker thread and are pushed to the TV.
+
+Run with:
+    python asgi_app.py
+or:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8080 --ws-per-message-deflate false
+
+Per-message deflate keeps a zlib context per socket and is most of the
+memory of an idle TV connection; scoreboard frames are tiny, so it is off.
+"""
+
+import asyncio
+import io
+import sys
+
+import socketio
+
+import app as flask_server
+
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+
+_pending_emits = set()
+_loop = None
+_scheduler_task = None
+
+
+def socket_rooms():
+    """Socket.IO rooms of the async server (room -> {sid: eio_sid})"""
+    return sio.manager.rooms.get('/', {})
+
+
+def emit_to_room(event, data, room, skip=None):
+    """Schedule an emit on the event loop; Flask views call this synchronously"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Called from a background task's worker thread
+        asyncio.run_coroutine_threadsafe(sio.emit(event, data, room=room, skip_sid=skip or None), _loop)
+        return
+    task = loop.create_task(sio.emit(event, data, room=room, skip_sid=skip or None))
+    # Keep a reference until the task finishes so it cannot be garbage collected
+    _pending_emits.add(task)
+    task.add_done_callback(_pending_emits.discard)
+
+
+def start_background_task(target, *args):
+    """Run blocking background work (QR renders) on the loop's thread pool"""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    return _loop.run_in_executor(None, target, *args)
+
+
+async def _run_scheduler(scheduler):
+    while True:
+        delay = scheduler.run_pending()
+        start = scheduler.clock()
+        await asyncio.sleep(delay)
+        scheduler.woke(delay, scheduler.clock() - start)
+
+
+def run_blocking(func, *args, **kwargs):
+    """Background tasks already run on the loop's thread pool, so blocking there is fine"""
+    return func(*args, **kwargs)
+
+
+def start_scheduler():
+    """Run app.py's background jobs on the event loop, between requests"""
+    global _scheduler_task
+    _scheduler_task = asyncio.get_running_loop().create_task(_run_scheduler(flask_server.scheduler))
+
+
+# Route the Flask views' emits, room gauges and background work through the
+# async server. Views run on the loop and must not block it, so TV pages get
+# a QR placeholder and the rendered code arrives over Socket.IO.
+FLASK_HOOKS = {
+    'emit_to_room': emit_to_room,
+    'socket_rooms': socket_rooms,
+    'start_background_task': start_background_task,
+    'run_blocking': run_blocking,
+    'start_scheduler': start_scheduler,
+    'qr_wait_inline': False,
+}
+for _name, _value in FLASK_HOOKS.items():
+    setattr(flask_server, _name, _value)
+
+
+@sio.on('join')
+async def on_join(sid, data):
+    """Handle TV display joining a match room"""
+    tv_id = data['tv_id']
+    redirect = flask_server.socket_redirect(tv_id)
+    if redirect:
+        await sio.emit('redirect', redirect, to=sid)
+        return
+    await sio.enter_room(sid, tv_id)
+    flask_server.frame_outbox.joined(sid, tv_id)
+    # The room push may have gone out before this page's socket joined
+    qr_ready = flask_server.rendered_qr(tv_id)
+    if qr_ready:
+        await sio.emit('qr_ready', qr_ready, to=sid)
+    print(f"TV display joined room: {tv_id}")
+
+
+@sio.on('leave')
+async def on_leave(sid, data):
+    """Stop sending a TV's updates to this client (used by venue relays)"""
+    await sio.leave_room(sid, data['tv_id'])
+    flask_server.frame_outbox.left(sid, data['tv_id'])
+
+
+@sio.on('render_ack')
+async def on_render_ack(sid, data):
+    """TV display reports when it rendered a traced match update"""
+    flask_server.handle_render_ack(sid, data)
+
+
+@sio.on('disconnect')
+async def on_disconnect(sid):
+    """Handle TV display disconnection"""
+    flask_server.frame_outbox.forget(sid)
+    print("TV display disconnected")
+
+
+def _wsgi_environ(scope, body):
+    """Build a WSGI environ from an ASGI HTTP scope"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def http_app(scope, receive, send):
+    """Serve non-Socket.IO HTTP requests with the Flask views from app.py"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+    result = flask_server.app.wsgi_app(_wsgi_environ(scope, body), start_response)
+    try:
+        content = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+    await send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+    await send({'type': 'http.response.body', 'body': content})
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=http_app)
+
+if __name__ == '__main__':
+    import os
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 8080))
+    print("🎾 PadelCast QR Code TV Web Server (asyncio mode) Starting...")
+    print(f"📺 TV setup at: http://localhost:{port}/tv")
+    uvicorn.run(app, host='0.0.0.0', port=port, log_level='warning',
+                ws_per_message_deflate=False, ws_max_size=65536, ws_max_queue=8)
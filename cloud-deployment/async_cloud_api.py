@@ -0,0 +1,193 @@
+"""
+Asyncio counterpart of PadelCastCloudAPI for venue controllers driving many
+courts at once.
+
+All calls share one aiohttp connection pool and a concurrency limit, so a
+slow court no longer holds up the others. With batch_window set, updates
+issued within that window are sent together to /api/update-match/batch;
+servers without the batch endpoint get individual requests instead.
+
+Usage:
+    async with AsyncPadelCastCloudAPI('http://localhost:8080', batch_window=0.01) as api:
+        await asyncio.gather(*(api.update_match(None, court.payload()) for court in courts))
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
+
+import aiohttp
+
+
+def _result(success, data=None, error=None):
+    result = {'success': success, 'timestamp': datetime.now().isoformat()}
+    if success:
+        result['data'] = data
+    else:
+        result['error'] = error
+    return result
+
+
+class AsyncPadelCastCloudAPI:
+    def __init__(self, base_url=None, pool_size=100, max_concurrency=20, connect_timeout=3.05,
+                 read_timeout=10, batch_window=None, max_batch=50):
+        self.base_url = base_url or os.environ.get('PADELCAST_CLOUD_URL', 'http://localhost:8080')
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.batch_supported = True
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session = None
+        self._batch = []  # (payload, future) waiting for the next flush
+        self._flush_task = None
+        self._last_seq = 0
+        self.client_id = uuid.uuid4().hex
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        """Send any batched updates, then close pooled connections"""
+        if self._flush_task:
+            await self._flush_task
+        if self._session:
+            await self._session.close()
+
+    async def _request(self, method, path, body=None, failure='Server error', base_url=None):
+        try:
+            async with self._semaphore:
+                url = f"{base_url or self.base_url}{path}"
+                async with self._get_session().request(method, url, json=body) as response:
+                    if response.status == 200:
+                        return _result(True, await response.json())
+                    return dict(_result(False, error=f'{failure}: {response.status}'), status=response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return _result(False, error=f'Network error: {str(e) or type(e).__name__}')
+
+    async def generate_code(self, team1_name="Team A", team2_name="Team B"):
+        """Generate a new match code from the cloud server"""
+        result = await self._request('POST', '/generate-code', {'team1_name': team1_name, 'team2_name': team2_name})
+        if result['success']:
+            data = result.pop('data')
+            result.update(code=data.get('code'), match_id=data.get('match_id'),
+                          tv_url=f"{self.base_url}/tv/{data.get('code')}")
+        return result
+
+    async def get_match_status(self, code):
+        """Get current match status from the cloud server"""
+        return await self._request('GET', f'/api/match-status/{code}', failure='Match not found or server error')
+
+    async def link_tv(self, tv_id, match_data):
+        """Link a TV (from its QR code) to a new match"""
+        return await self._request('POST', '/api/link-tv', {'tv_id': tv_id, 'match_data': match_data}, 'Link failed')
+
+    async def reset_tv(self, tv_id):
+        """Unlink a TV's match; the response carries the TV's new ID"""
+        return await self._request('POST', f'/api/reset-tv/{tv_id}', failure='Reset failed')
+
+    async def get_server_info(self):
+        """Get server information and status"""
+        result = await self._request('GET', '/readyz', failure='Not ready')
+        result['status'] = 'online' if result['success'] else 'offline'
+        return result
+
+    async def update_match(self, code, match_data):
+        """Update match data on the cloud server"""
+        match_data = dict(match_data, code=code)
+        # Sequence numbers let the server drop retried or reordered updates; the server
+        # orders them per client ID, so other devices' clocks do not matter
+        match_data.setdefault('seq', self._next_seq())
+        match_data.setdefault('client_id', self.client_id)
+        if not self.batch_window or not self.batch_supported:
+            return await self._request('POST', '/api/update-match', match_data, 'Update failed')
+
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((match_data, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_batches())
+        return await future
+
+    def _next_seq(self):
+        # Microseconds since the epoch: increasing, and not reset when the client restarts
+        self._last_seq = max(self._last_seq + 1, time.time_ns() // 1000)
+        return self._last_seq
+
+    async def _flush_batches(self):
+        """Send queued updates one batch at a time, so they reach the server in order"""
+        try:
+            while self._batch:
+                if len(self._batch) < self.max_batch:
+                    await asyncio.sleep(self.batch_window)
+                batch, self._batch = self._batch[:self.max_batch], self._batch[self.max_batch:]
+                await self._send_batch(batch)
+        finally:
+            self._flush_task = None
+
+    async def _send_batch(self, batch):
+        try:
+            results = await self._batch_results([payload for payload, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            # Callers awaiting these updates must not wait forever
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _batch_results(self, payloads):
+        if len(payloads) == 1 or not self.batch_supported:
+            return await asyncio.gather(*(self._request('POST', '/api/update-match', payload, 'Update failed')
+                                          for payload in payloads))
+        results = await self._post_batch(payloads)
+        if results is None:
+            # Older server without the batch endpoint
+            self.batch_supported = False
+            return await self._batch_results(payloads)
+        await self._resend_misdirected(payloads, results)
+        return results
+
+    async def _post_batch(self, payloads, base_url=None):
+        """Results of one batch request, in order; None if the server has no batch endpoint"""
+        response = await self._request('POST', '/api/update-match/batch', {'updates': payloads}, 'Update failed',
+                                       base_url)
+        if not response['success']:
+            if response.get('status') in (404, 405):
+                return None
+            return [response] * len(payloads)
+        results = []
+        for item in response['data']['results']:
+            result = _result(item['success'], item, item.get('error'))
+            if item.get('status') == 421:
+                result['node'] = item.get('node')
+            results.append(result)
+        return results
+
+    async def _resend_misdirected(self, payloads, results):
+        """Send updates for TVs served by another node (421) on to that node, updating results in place"""
+        by_node = {}
+        for index, result in enumerate(results):
+            if result.get('node'):
+                by_node.setdefault(result.pop('node'), []).append(index)
+        resent = await asyncio.gather(*(self._post_batch([payloads[i] for i in indexes], node)
+                                        for node, indexes in by_node.items()))
+        for indexes, node_results in zip(by_node.values(), resent):
+            for index, result in zip(indexes, node_results or []):
+                results[index] = result
@@ -0,0 +1,163 @@
+"""
+Per-connection flow control for scoreboard frames.
+
+Every match_update carries the full match state, so a TV that falls behind
+only ever needs the newest one. Each connection may have `max_in_flight`
+frames sent but not yet acknowledged (TVs acknowledge with render_ack once
+a frame is on screen). Frames published beyond that wait in a per-connection
+outbox that keeps only the latest frame per room, and at most `max_pending`
+rooms (or one per room the socket joined, for venue relays following many
+TVs on one connection), so a stalled browser costs a bounded amount of
+server memory instead of a growing backlog of obsolete states. When the TV catches up, it gets the
+newest state straight away.
+
+While every socket in a room has credit, a frame goes out as one room emit,
+encoded once; only sockets that are behind are skipped. Credits expire: a
+socket that has not acknowledged for `ack_timeout` seconds (an old TV page,
+or a lost ack) gets its held frames on the next publish or expire() call.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Connection:
+    __slots__ = ('in_flight', 'sent_at', 'pending', 'rooms')
+
+    def __init__(self):
+        self.in_flight = 0
+        self.sent_at = 0.0  # when the newest in-flight frame was sent
+        self.pending = OrderedDict()  # room -> (event, data), oldest first
+        self.rooms = set()  # rooms joined through joined()
+
+
+class FrameOutbox:
+    """Latest-frame-wins delivery of room events to each connected socket"""
+
+    def __init__(self, send, max_in_flight=2, max_pending=4, ack_timeout=5.0, on_drop=None, clock=time.monotonic):
+        self.send = send  # send(event, data, to, skip): `to` is a room or a sid, `skip` lists sids left out
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+        self.ack_timeout = ack_timeout
+        self.on_drop = on_drop  # on_drop(reason) for each discarded frame
+        self.clock = clock
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """Frames held back for connections that are behind"""
+        with self._lock:
+            return sum(len(conn.pending) for conn in self._connections.values())
+
+    @property
+    def stalled(self):
+        """Connections with no credit left for another frame"""
+        with self._lock:
+            return sum(1 for conn in self._connections.values() if conn.in_flight >= self.max_in_flight)
+
+    def publish(self, event, data, room, sids):
+        """Send a frame to the sids of a room in one emit, holding it for those that are behind"""
+        behind, dropped = self._admit(event, data, room, sids)
+        if len(behind) < len(sids):
+            self.send(event, data, room, behind)
+        self._dropped(dropped)
+
+    def publish_to(self, event, data, room, sid):
+        """Send a room's frame to one socket only, such as one that just joined"""
+        behind, dropped = self._admit(event, data, room, [sid])
+        if not behind:
+            self.send(event, data, sid, [])
+        self._dropped(dropped)
+
+    def _admit(self, event, data, room, sids):
+        """Take a credit for each sid that has one; hold the frame for the others"""
+        now = self.clock()
+        behind = []
+        dropped = []
+        with self._lock:
+            for sid in sids:
+                conn = self._connections.get(sid)
+                if conn is None:
+                    conn = self._connections[sid] = _Connection()
+                if conn.in_flight >= self.max_in_flight and now - conn.sent_at >= self.ack_timeout:
+                    conn.in_flight = 0  # its acks are not coming
+                if conn.in_flight < self.max_in_flight:
+                    conn.in_flight += 1
+                    conn.sent_at = now
+                    continue
+                behind.append(sid)
+                if conn.pending.pop(room, None) is not None:
+                    dropped.append('superseded')
+                conn.pending[room] = (event, data)
+                if len(conn.pending) > max(self.max_pending, len(conn.rooms)):
+                    conn.pending.popitem(last=False)
+                    dropped.append('overflow')
+        return behind, dropped
+
+    def joined(self, sid, room):
+        """A socket joined a room: it may hold one more pending frame"""
+        with self._lock:
+            conn = self._connections.get(sid)
+            if conn is None:
+                conn = self._connections[sid] = _Connection()
+            conn.rooms.add(room)
+
+    def left(self, sid, room):
+        """A socket left a room: drop the frame held for it there"""
+        with self._lock:
+            conn = self._connections.get(sid)
+            if conn is None:
+                return
+            conn.rooms.discard(room)
+            held = conn.pending.pop(room, None)
+        if held is not None:
+            self._dropped(['left'])
+
+    def ack(self, sid):
+        """A frame reached the client: release the next pending one, if any"""
+        with self._lock:
+            conn = self._connections.get(sid)
+            if conn is None:
+                return
+            conn.in_flight = max(conn.in_flight - 1, 0)
+            if not conn.pending:
+                return
+            event, data = conn.pending.popitem(last=False)[1]
+            conn.in_flight += 1
+            conn.sent_at = self.clock()
+        self.send(event, data, sid, [])
+
+    def expire(self):
+        """Release frames held for sockets that stopped acknowledging; returns how many were sent"""
+        now = self.clock()
+        ready = []
+        with self._lock:
+            for sid, conn in self._connections.items():
+                if not conn.pending or now - conn.sent_at < self.ack_timeout:
+                    continue
+                conn.in_flight = 0
+                while conn.pending and conn.in_flight < self.max_in_flight:
+                    ready.append((sid, conn.pending.popitem(last=False)[1]))
+                    conn.in_flight += 1
+                conn.sent_at = now
+        for sid, (event, data) in ready:
+            self.send(event, data, sid, [])
+        return len(ready)
+
+    def forget(self, sid):
+        """Drop all state for a disconnected socket"""
+        with self._lock:
+            conn = self._connections.pop(sid, None)
+        if conn is not None:
+            self._dropped(['disconnected'] * len(conn.pending))
+
+    def clear(self):
+        with self._lock:
+            self._connections.clear()
+
+    def _dropped(self, reasons):
+        if self.on_drop:
+            for reason in reasons:
+                self.on_drop(reason)
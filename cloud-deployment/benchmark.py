@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+In-process load and latency benchmark for the PadelCast cloud server.
+
+Drives app.py through Flask's test client (scoring devices posting
+/api/update-match) and Flask-SocketIO test clients (TVs joined to their
+rooms), so no running server or network is needed.
+
+Usage:
+    python benchmark.py                      # run and print results
+    python benchmark.py --save-baseline      # store results as the new baseline
+    python benchmark.py --compare            # exit 1 if worse than the baseline
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import resource
+import sys
+import time
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# metric -> True if higher is better
+COMPARED_METRICS = {
+    'throughput_updates_per_s': True,
+    'latency_p50_ms': False,
+    'latency_p99_ms': False,
+    'cpu_ms_per_update': False,
+}
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def current_rss_kb():
+    """Resident set size in KB (falls back to peak RSS off Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the server's per-request print() logging"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+class Court:
+    """One linked TV session, its scoring device state and the TVs watching it"""
+
+    def __init__(self, tv_id):
+        self.tv_id = tv_id
+        self.tvs = []
+        self.points = [0, 0]
+        self.games = [0, 0]
+
+    def next_update(self, update_number):
+        # Alternate point winners deterministically; roll games over at 4 points
+        winner = update_number % 2 if update_number % 3 else 0
+        self.points[winner] += 1
+        if self.points[winner] >= 4:
+            self.points = [0, 0]
+            self.games[winner] = (self.games[winner] + 1) % 6
+        return {
+            'tv_id': self.tv_id,
+            'team1_game_score': self.points[0],
+            'team2_game_score': self.points[1],
+            'set1_games': list(self.games),
+            'current_set': 1,
+            'client_timestamp': time.time() * 1000
+        }
+
+
+def setup_courts(server, client, courts, tvs_per_court):
+    """Create linked TV sessions and connect Socket.IO clients to their rooms"""
+    result = []
+    for i in range(courts):
+        client.get('/tv')
+        tv_id = next(reversed(server.tv_sessions))
+        response = client.post('/api/link-tv', json={
+            'tv_id': tv_id,
+            'match_data': {'team1_name': f'Court {i + 1} A', 'team2_name': f'Court {i + 1} B',
+                           'court_number': str(i + 1), 'best_of_sets': 3}
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f'link-tv failed: {response.status_code}')
+        court = Court(tv_id)
+        for _ in range(tvs_per_court):
+            tv = server.socketio.test_client(server.app)
+            tv.emit('join', {'tv_id': tv_id})
+            court.tvs.append(tv)
+        result.append(court)
+    return result
+
+
+def drain(courts):
+    """Pop queued messages from every TV and return how many match updates arrived
+
+    Each update is acknowledged like a real TV does once it has rendered it,
+    so the server keeps sending every frame instead of only the latest.
+    """
+    delivered = 0
+    for court in courts:
+        for tv in court.tvs:
+            for packet in tv.get_received():
+                if packet['name'] == 'match_update':
+                    delivered += 1
+                    tv.emit('render_ack', {'tv_id': court.tv_id})
+    return delivered
+
+
+def run(courts=200, tvs_per_court=5, updates=5000, workload=None, workload_name='round-robin'):
+    """Run the benchmark and return a dict of results
+
+    `workload` is an iterable of (court_index, payload) pairs, such as
+    tournament_traffic.update_workload(); a None payload means a synthetic
+    point. By default every court gets points in round-robin order.
+    """
+    import app as server
+
+    # One client drives every court as fast as it can, which is what the limits stop
+    server.rate_limiting = False
+    client = server.app.test_client()
+    with quiet():
+        court_list = setup_courts(server, client, courts, tvs_per_court)
+        drain(court_list)
+
+        if workload is None:
+            workload = ((n, None) for n in range(updates))
+
+        gc.collect()
+        rss_before = current_rss_kb()
+        latencies = []
+        delivered = 0
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+
+        for n, (court_index, payload) in enumerate(workload):
+            if n >= updates:
+                break
+            court = court_list[court_index % courts]
+            if payload is None:
+                payload = court.next_update(n)
+            else:
+                payload = dict(payload, tv_id=court.tv_id, client_timestamp=time.time() * 1000)
+            start = time.perf_counter()
+            response = client.post('/api/update-match', json=payload)
+            # Test clients receive synchronously, so the emit has reached every TV here
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            if response.status_code != 200:
+                raise RuntimeError(f'update-match failed: {response.status_code}')
+            delivered += drain([court])
+
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        delivered += drain(court_list)
+        gc.collect()
+        rss_after = current_rss_kb()
+
+        for court in court_list:
+            for tv in court.tvs:
+                tv.disconnect()
+
+    sent = len(latencies)
+    return {
+        'config': {'courts': courts, 'tvs_per_court': tvs_per_court, 'updates': sent, 'workload': workload_name},
+        'throughput_updates_per_s': round(sent / wall, 1) if wall else None,
+        'latency_p50_ms': round(percentile(latencies, 0.5), 3),
+        'latency_p99_ms': round(percentile(latencies, 0.99), 3),
+        'latency_max_ms': round(max(latencies), 3),
+        'cpu_ms_per_update': round(cpu * 1000.0 / sent, 3),
+        'memory_growth_kb': rss_after - rss_before,
+        'deliveries': delivered,
+        'expected_deliveries': sent * tvs_per_court,
+        'python': sys.version.split()[0],
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages (empty if within tolerance)"""
+    regressions = []
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        current = results.get(metric)
+        reference = baseline.get(metric)
+        if current is None or not reference:
+            continue
+        change = (current - reference) / reference
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f'{metric}: {current} vs baseline {reference} ({change:+.0%})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PadelCast in-process load benchmark')
+    parser.add_argument('--courts', type=int, default=200)
+    parser.add_argument('--tvs-per-court', type=int, default=5)
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--workload', choices=('round-robin', 'tournament'), default='round-robin')
+    parser.add_argument('--seed', type=int, default=0, help='tournament workload seed')
+    parser.add_argument('--save-baseline', action='store_true', help='store results as the new baseline')
+    parser.add_argument('--compare', action='store_true', help='fail if worse than the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--baseline-file', default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    print(f"🎾 Benchmarking {args.courts} courts x {args.tvs_per_court} TVs, {args.updates} updates...")
+    workload = None
+    if args.workload == 'tournament':
+        from tournament_traffic import generate_tournament, update_workload
+        # Enough matches per court that the tournament covers the requested update count
+        matches_per_court = max(args.updates // (args.courts * 60) + 1, 1)
+        workload = update_workload(generate_tournament(args.courts, matches_per_court, args.seed))
+    results = run(args.courts, args.tvs_per_court, args.updates, workload, args.workload)
+    print(json.dumps(results, indent=2))
+
+    if results['deliveries'] != results['expected_deliveries']:
+        print(f"❌ Delivered {results['deliveries']} of {results['expected_deliveries']} updates")
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.baseline_file, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"💾 Baseline saved to {args.baseline_file}")
+
+    if args.compare:
+        try:
+            with open(args.baseline_file) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"❌ No baseline at {args.baseline_file}; run with --save-baseline first")
+            sys.exit(1)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ Performance regressions:")
+            for message in regressions:
+                print(f"   {message}")
+            sys.exit(1)
+        print("✅ Within tolerance of baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Per-update latency of PadelCastCloudAPI with and without connection pooling.
+
+Starts app.py locally (or uses --url), links a TV, then sends the same score
+updates through a fresh connection per request (module-level requests.post,
+as the client used to) and through the client's pooled keep-alive session.
+
+Usage:
+    python benchmark_client.py --updates 500
+    python benchmark_client.py --url https://your-app.up.railway.app --updates 100
+"""
+
+import argparse
+import json
+import re
+import time
+
+import requests
+
+from benchmark import percentile
+from benchmark_connections import start_server
+from cloud_api import PadelCastCloudAPI
+
+TV_ID_PATTERN = re.compile(r"let tvId = '([0-9a-fA-F-]+)'")
+
+
+def link_tv(base_url):
+    tv_id = TV_ID_PATTERN.search(requests.get(f'{base_url}/tv', timeout=10).text).group(1)
+    response = requests.post(f'{base_url}/api/link-tv', json={'tv_id': tv_id, 'match_data': {}}, timeout=10)
+    response.raise_for_status()
+    return tv_id
+
+
+def measure(send, tv_id, updates):
+    latencies = []
+    for n in range(updates):
+        payload = {'tv_id': tv_id, 'team1_game_score': n % 4, 'team2_game_score': (n // 4) % 4}
+        start = time.perf_counter()
+        if not send(payload):
+            raise RuntimeError('update failed')
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return {
+        'updates': updates,
+        'latency_p50_ms': round(percentile(latencies, 0.5), 3),
+        'latency_p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(sum(latencies) / updates, 3),
+    }
+
+
+def run(base_url, updates):
+    tv_id = link_tv(base_url)
+
+    def unpooled(payload):
+        response = requests.post(f'{base_url}/api/update-match', json=payload, timeout=10)
+        return response.status_code == 200
+
+    with PadelCastCloudAPI(base_url) as api:
+        def pooled(payload):
+            return api.update_match(None, payload)['success']
+
+        # Warm up both paths (DNS, server caches, the pool's first connection)
+        measure(unpooled, tv_id, 10)
+        measure(pooled, tv_id, 10)
+        results = {'unpooled': measure(unpooled, tv_id, updates), 'pooled': measure(pooled, tv_id, updates)}
+
+    results['speedup_p50'] = round(results['unpooled']['latency_p50_ms'] / results['pooled']['latency_p50_ms'], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cloud client latency with and without pooling')
+    parser.add_argument('--url', help='benchmark a running server instead of starting app.py')
+    parser.add_argument('--port', type=int, default=18090)
+    parser.add_argument('--updates', type=int, default=500)
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.url
+    if not base_url:
+        process, base_url = start_server('eventlet', args.port)
+    try:
+        print(f"📡 Sending {args.updates} updates to {base_url} per mode...")
+        print(json.dumps(run(base_url.rstrip('/'), args.updates), indent=2))
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Head-to-head idle websocket benchmark: eventlet mode vs asyncio mode.
+
+Starts each server mode as a subprocess, opens N idle TV websockets that
+join a room (speaking the Engine.IO/Socket.IO wire protocol directly), and
+reports the server's resident memory per connection and update fan-out time.
+
+Usage:
+    python benchmark_connections.py --connections 10000
+    python benchmark_connections.py --modes asyncio --connections 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SERVER_COMMANDS = {
+    'eventlet': [sys.executable, 'app.py'],
+    'asyncio': [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--host', '127.0.0.1',
+                '--log-level', 'warning', '--no-access-log', '--ws-per-message-deflate', 'false',
+                '--ws-max-size', '65536', '--ws-max-queue', '8'],
+}
+
+
+def raise_fd_limit(wanted):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = min(max(soft, wanted), hard)
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    return target
+
+
+def rss_kb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def http(base_url, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.read().decode()
+
+
+def start_server(mode, port):
+    # Measure the server at full load rather than its rate limits and load shedding
+    env = dict(os.environ, PORT=str(port), RATE_LIMITING='off', MAX_LOOP_LAG='inf')
+    command = SERVER_COMMANDS[mode] + (['--port', str(port)] if mode == 'asyncio' else [])
+    process = subprocess.Popen(command, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            http(base_url, 'GET', '/metrics')
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+class IdleTV:
+    """Minimal Socket.IO v5 client: connect, join a room, answer pings, count updates"""
+
+    def __init__(self, url, tv_id):
+        self.url = url
+        self.tv_id = tv_id
+        self.updates = 0
+        self.ws = None
+        self.task = None
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, max_size=None, open_timeout=60, ping_interval=None)
+        await self.ws.recv()  # Engine.IO open packet
+        await self.ws.send('40')  # Socket.IO connect to the default namespace
+        while not (await self.ws.recv()).startswith('40'):
+            pass
+        await self.ws.send('42' + json.dumps(['join', {'tv_id': self.tv_id}]))
+        self.task = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            async for message in self.ws:
+                if message == '2':
+                    await self.ws.send('3')
+                elif message.startswith('42["match_update"'):
+                    self.updates += 1
+                    await self.ws.send('42' + json.dumps(['render_ack', {'tv_id': self.tv_id}]))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+        if self.ws:
+            await self.ws.close()
+
+
+async def run_mode(mode, port, connections, batch):
+    process, base_url = start_server(mode, port)
+    try:
+        html = http(base_url, 'GET', '/tv')
+        tv_id = html.split("let tvId = '", 1)[1].split("'", 1)[0]
+        http(base_url, 'POST', '/api/link-tv', {'tv_id': tv_id, 'match_data': {}})
+        await asyncio.sleep(0.5)
+        baseline_kb = rss_kb(process.pid)
+
+        ws_url = base_url.replace('http', 'ws') + '/socket.io/?EIO=4&transport=websocket'
+        tvs = []
+        started = time.perf_counter()
+        for offset in range(0, connections, batch):
+            group = [IdleTV(ws_url, tv_id) for _ in range(min(batch, connections - offset))]
+            await asyncio.gather(*(tv.connect() for tv in group))
+            tvs.extend(group)
+        connect_s = time.perf_counter() - started
+        await asyncio.sleep(2.0)
+        loaded_kb = rss_kb(process.pid)
+
+        # One update fanned out to every idle TV
+        started = time.perf_counter()
+        await asyncio.to_thread(http, base_url, 'POST', '/api/update-match', {'tv_id': tv_id, 'team1_game_score': 1})
+        deadline = time.time() + 60
+        while sum(tv.updates for tv in tvs) < connections and time.time() < deadline:
+            await asyncio.sleep(0.01)
+        fanout_s = time.perf_counter() - started
+        delivered = sum(tv.updates for tv in tvs)
+
+        await asyncio.gather(*(tv.close() for tv in tvs), return_exceptions=True)
+        return {
+            'mode': mode,
+            'connections': connections,
+            'connect_s': round(connect_s, 2),
+            'rss_baseline_mb': round(baseline_kb / 1024, 1),
+            'rss_loaded_mb': round(loaded_kb / 1024, 1),
+            'kb_per_connection': round((loaded_kb - baseline_kb) / connections, 2),
+            'fanout_ms': round(fanout_s * 1000, 1),
+            'delivered': delivered,
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Idle websocket memory benchmark per server mode')
+    parser.add_argument('--connections', type=int, default=10000)
+    parser.add_argument('--modes', nargs='+', choices=sorted(SERVER_COMMANDS), default=['eventlet', 'asyncio'])
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--batch', type=int, default=200, help='concurrent connection attempts')
+    args = parser.parse_args()
+
+    limit = raise_fd_limit(args.connections * 2 + 256)
+    if limit < args.connections + 256:
+        print(f"⚠️  File descriptor limit is {limit}; lower --connections or raise ulimit -n")
+
+    results = []
+    for i, mode in enumerate(args.modes):
+        print(f"🔌 {mode}: opening {args.connections} idle TV websockets...")
+        results.append(asyncio.run(run_mode(mode, args.port + i, args.connections, args.batch)))
+        print(json.dumps(results[-1], indent=2))
+
+    if len(results) == 2 and results[1]['kb_per_connection']:
+        ratio = results[0]['kb_per_connection'] / results[1]['kb_per_connection']
+        print(f"📊 {results[0]['mode']} uses {ratio:.1f}x the memory per connection of {results[1]['mode']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Shared state under mixed read/write load: copy-on-write SnapshotDict against
+a plain dict behind one global lock.
+
+Reader threads do what score updates and status pages do (look up a TV,
+then its match), a sweeper thread walks every entry as the expiry sweep and
+metrics do, and a writer thread links and expires sessions. With a global
+lock, a sweep has to hold the lock for its whole walk, which stalls every
+lookup. With the snapshot dict, neither readers nor the sweep take a lock.
+
+Usage:
+    python benchmark_state.py --entries 5000 --readers 4 --seconds 3
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+
+from benchmark import percentile
+from snapshot_dict import SnapshotDict
+
+
+class LockedDict:
+    """The alternative: every access, including a full walk, holds one lock"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def remove_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def count_where(self, predicate):
+        with self._lock:
+            return sum(1 for value in self._data.values() if predicate(value))
+
+
+class SnapshotState(SnapshotDict):
+    def count_where(self, predicate):
+        return sum(1 for value in self.values() if predicate(value))
+
+
+def run(state, entries, readers, seconds, writes_per_s):
+    keys = [f'tv-{n}' for n in range(entries)]
+    for key in keys:
+        state[key] = {'created_at': 0.0, 'linked_match_id': key}
+
+    stop = threading.Event()
+    reads = [0] * readers
+    lookup_ms = [[] for _ in range(readers)]
+    sweep_ms = []
+    writes = [0]
+
+    def reader(index):
+        rng = random.Random(index)
+        while not stop.is_set():
+            start = time.perf_counter()
+            for _ in range(100):
+                session = state.get(rng.choice(keys))
+                if session is not None:
+                    state.get(session['linked_match_id'])
+            lookup_ms[index].append((time.perf_counter() - start) * 10.0)  # per lookup, in ms
+            reads[index] += 100
+
+    def sweeper():
+        while not stop.is_set():
+            start = time.perf_counter()
+            state.count_where(lambda session: session['created_at'] > 1.0)
+            sweep_ms.append((time.perf_counter() - start) * 1000.0)
+
+    def writer():
+        rng = random.Random(-1)
+        serial = entries
+        while not stop.is_set():
+            key = f'tv-{serial}'
+            serial += 1
+            state[key] = {'created_at': time.time(), 'linked_match_id': key}
+            state.remove_many([rng.choice(keys)])
+            writes[0] += 2
+            time.sleep(1.0 / writes_per_s)
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    threads += [threading.Thread(target=sweeper), threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    lookups = [value for values in lookup_ms for value in values]
+    return {
+        'reads_per_s': round(sum(reads) / seconds),
+        'writes_per_s': round(writes[0] / seconds),
+        'sweeps_per_s': round(len(sweep_ms) / seconds, 1),
+        'lookup_p50_us': round(percentile(lookups, 0.5) * 1000.0, 2),
+        'lookup_p99_us': round(percentile(lookups, 0.99) * 1000.0, 2),
+        'sweep_p50_ms': round(percentile(sweep_ms, 0.5), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy-on-write state against a global lock')
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--writes-per-s', type=float, default=200.0)
+    args = parser.parse_args()
+
+    results = {}
+    for name, state in (('global_lock', LockedDict()), ('snapshot', SnapshotState())):
+        print(f"📊 {name}: {args.entries} entries, {args.readers} readers, {args.seconds}s...")
+        results[name] = run(state, args.entries, args.readers, args.seconds, args.writes_per_s)
+    results['read_speedup'] = round(results['snapshot']['reads_per_s'] / results['global_lock']['reads_per_s'], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,79 @@
 import requests
 import json
 import os
-from datetime import datetime
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from outbox import Outbox
+
+# Only calls that are safe to repeat are retried after the request was sent;
+# failed connection attempts are retried for every method
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+MAX_FLUSH_INTERVAL = 60.0  # seconds between outbox flushes while the server stays down
+
+def retry_after_seconds(response):
+    """Seconds a Retry-After header asks to wait (delay or HTTP date), or None"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
 
 class PadelCastCloudAPI:
-    def __init__(self, base_url=None):
+    def __init__(self, base_url=None, pool_size=10, connect_timeout=3.05, read_timeout=10,
+                 retries=3, backoff_factor=0.3, outbox_path=None, flush_interval=5.0):
         # Use environment variable for cloud URL or default to localhost
         self.base_url = base_url or os.environ.get('PADELCAST_CLOUD_URL', 'http://localhost:8080')
+        self.timeout = (connect_timeout, read_timeout)
+        # Durable queue for updates that could not be delivered (None disables it)
+        self.outbox = Outbox(outbox_path) if outbox_path else None
+        self._last_seq = 0
+        self.client_id = uuid.uuid4().hex
+        self._seq_lock = threading.Lock()
+        self._retry_at = 0.0  # monotonic time before which the server asked not to flush
+        self._flush_lock = threading.Lock()
+        
+        # One keep-alive session so score updates reuse TCP/TLS connections
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(502, 503, 504),
+                      allowed_methods=IDEMPOTENT_METHODS, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Queued updates also go out when the caller sends nothing new
+        self.flush_interval = flush_interval
+        self._stop_flushing = threading.Event()
+        self._flusher = None
+        if self.outbox is not None and flush_interval:
+            self._flusher = threading.Thread(target=self._flush_in_background, name='outbox-flusher', daemon=True)
+            self._flusher.start()
+    
+    def close(self):
+        """Stop the outbox flusher, then close pooled connections and the outbox"""
+        self._stop_flushing.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.session.close()
+        if self.outbox is not None:
+            self.outbox.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
         
     def generate_code(self, team1_name="Team A", team2_name="Team B"):
         """Generate a new match code from the cloud server"""
@@ -15,7 +82,7 @@ class PadelCastCloudAPI:
                 'team1_name': team1_name,
                 'team2_name': team2_name
             }
-            response = requests.post(f"{self.base_url}/generate-code", json=data, headers={'Content-Type': 'application/json'}, timeout=10)
+            response = self.session.post(f"{self.base_url}/generate-code", json=data, timeout=self.timeout)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -41,7 +108,7 @@ class PadelCastCloudAPI:
     def get_match_status(self, code):
         """Get current match status from the cloud server"""
         try:
-            response = requests.get(f"{self.base_url}/api/match-status/{code}", timeout=10)
+            response = self.session.get(f"{self.base_url}/api/match-status/{code}", timeout=self.timeout)
             if response.status_code == 200:
                 return {
                     'success': True,
@@ -62,28 +129,165 @@ class PadelCastCloudAPI:
             }
     
     def update_match(self, code, match_data):
-        """Update match data on the cloud server"""
+        """Update match data on the cloud server
+
+        With an outbox, updates that fail on the network or a 5xx are queued on
+        disk (latest per match) and sent once the server is reachable again.
+        """
+        # Add the code to a copy, so a caller reusing its dict gets a fresh seq next time
+        match_data = dict(match_data, code=code)
+        # Sequence numbers let the server drop retried or reordered updates; the server
+        # orders them per client ID, so other devices' clocks do not matter
+        match_data.setdefault('seq', self._next_seq())
+        match_data.setdefault('client_id', self.client_id)
+        
+        if self.outbox is not None and len(self.outbox):
+            # Older updates are still queued, so this one must not overtake them
+            self.outbox.put(self._outbox_key(match_data), match_data)
+            self.flush_outbox()
+            if not len(self.outbox):
+                return {'success': True, 'data': {'success': True}, 'timestamp': datetime.now().isoformat()}
+            return {
+                'success': False,
+                'queued': True,
+                'error': f'Server unreachable, {len(self.outbox)} updates queued',
+                'timestamp': datetime.now().isoformat()
+            }
+        
+        result, retryable = self._send_update(match_data)
+        if retryable and self.outbox is not None:
+            self._back_off(result)
+            self.outbox.put(self._outbox_key(match_data), match_data)
+            result['queued'] = True
+        return result
+    
+    def _next_seq(self):
+        # Microseconds since the epoch: increasing, and not reset when the client restarts
+        with self._seq_lock:
+            self._last_seq = max(self._last_seq + 1, time.time_ns() // 1000)
+            return self._last_seq
+    
+    def _outbox_key(self, match_data):
+        return match_data.get('tv_id') or match_data.get('code') or ''
+    
+    def _send_update(self, match_data, base_url=None):
+        """POST one update; returns (result, worth retrying later)"""
         try:
-            # Add the code to the match data
-            match_data['code'] = code
-            
-            response = requests.post(
-                f"{self.base_url}/api/update-match",
+            response = self.session.post(
+                f"{base_url or self.base_url}/api/update-match",
                 json=match_data,
-                headers={'Content-Type': 'application/json'},
-                timeout=10
+                timeout=self.timeout
             )
             
+            if response.status_code == 421 and base_url is None:
+                # The TV moved to another node of a cluster since this request was routed
+                node = self._misdirected_to(response)
+                if node:
+                    return self._send_update(match_data, node)
             if response.status_code == 200:
                 return {
                     'success': True,
                     'data': response.json(),
                     'timestamp': datetime.now().isoformat()
-                }
+                }, False
             else:
                 return {
                     'success': False,
                     'error': f'Update failed: {response.status_code}',
+                    'retry_after': retry_after_seconds(response),
+                    'timestamp': datetime.now().isoformat()
+                }, response.status_code >= 500 or response.status_code == 429  # 429: rate limited, not rejected
+        except requests.exceptions.RequestException as e:
+            return {
+                'success': False,
+                'error': f'Network error: {str(e)}',
+                'timestamp': datetime.now().isoformat()
+            }, True
+    
+    def _misdirected_to(self, response):
+        try:
+            return response.json().get('node')
+        except ValueError:
+            return None
+    
+    def _flush_in_background(self):
+        """Flush the outbox every flush_interval, backing off while updates stay queued"""
+        delay = self.flush_interval
+        while not self._stop_flushing.wait(max(delay, self._retry_at - time.monotonic())):
+            if not len(self.outbox):
+                delay = self.flush_interval
+                continue
+            try:
+                self.flush_outbox()
+            except Exception as e:
+                print(f"⚠️ Outbox flush failed: {e}")
+            delay = self.flush_interval if not len(self.outbox) else min(delay * 2, MAX_FLUSH_INTERVAL)
+    
+    def flush_outbox(self, max_workers=4):
+        """Send queued updates, oldest first; returns how many were delivered"""
+        # The background flusher and update_match must not send the same entry twice
+        with self._flush_lock:
+            return self._flush(max_workers)
+    
+    def _flush(self, max_workers):
+        entries = self.outbox.pending()
+        if not entries or time.monotonic() < self._retry_at:
+            return 0
+        
+        # Probe with the oldest entry so an outage costs one request, not one per court
+        seq, key, payload = entries[0]
+        result, retryable = self._send_update(payload)
+        if retryable:
+            self._back_off(result)
+            return 0
+        self.outbox.ack(seq)
+        delivered = 1 if result['success'] else 0
+        
+        # One entry per match, so the rest can go out in parallel
+        with ThreadPoolExecutor(max_workers) as executor:
+            outcomes = executor.map(lambda entry: self._send_queued(entry[2]), entries[1:])
+            for (seq, key, payload), (result, retryable) in zip(entries[1:], outcomes):
+                if retryable:
+                    self._back_off(result)
+                    continue
+                if not result['success']:
+                    print(f"⚠️ Dropping queued update for {key}: {result['error']}")
+                self.outbox.ack(seq)
+                delivered += 1 if result['success'] else 0
+        return delivered
+    
+    def _send_queued(self, payload):
+        # Once the server has asked for a pause, leave the rest queued
+        if time.monotonic() < self._retry_at:
+            return {'success': False, 'error': 'Backing off'}, True
+        return self._send_update(payload)
+    
+    def _back_off(self, result):
+        """Hold off flushing for as long as a 429 or 503 response asked"""
+        if result.get('retry_after'):
+            self._retry_at = max(self._retry_at, time.monotonic() + result['retry_after'])
+    
+    def link_tv(self, tv_id, match_data):
+        """Link a TV (from its QR code) to a new match"""
+        return self._post_json("/api/link-tv", {'tv_id': tv_id, 'match_data': match_data}, 'Link failed')
+    
+    def reset_tv(self, tv_id):
+        """Unlink a TV's match; the response carries the TV's new ID"""
+        return self._post_json(f"/api/reset-tv/{tv_id}", None, 'Reset failed')
+    
+    def _post_json(self, path, body, failure):
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=body, timeout=self.timeout)
+            if response.status_code == 200:
+                return {
+                    'success': True,
+                    'data': response.json(),
+                    'timestamp': datetime.now().isoformat()
+                }
+            else:
+                return {
+                    'success': False,
+                    'error': f'{failure}: {response.status_code}',
                     'timestamp': datetime.now().isoformat()
                 }
         except requests.exceptions.RequestException as e:
@@ -96,14 +300,16 @@ class PadelCastCloudAPI:
     def get_server_info(self):
         """Get server information and status"""
         try:
-            response = requests.get(f"{self.base_url}/", timeout=5)
+            # /readyz is a constant-time check; GET / would mint a TV session and QR code
+            response = self.session.get(f"{self.base_url}/readyz", timeout=(self.timeout[0], 5))
             return {
-                'success': True,
-                'status': 'online',
+                'success': response.status_code == 200,
+                'status': 'online' if response.status_code == 200 else 'not ready',
                 'response_time': response.elapsed.total_seconds(),
+                'server': response.json(),
                 'timestamp': datetime.now().isoformat()
             }
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             return {
                 'success': False,
                 'status': 'offline',
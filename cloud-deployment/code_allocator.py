@@ -0,0 +1,140 @@
+"""
+Collision-free short match codes.
+
+Codes are drawn from an alphabet without look-alike characters (no 0/O,
+1/I/L). Each code is an index pushed through an affine permutation of the
+whole code space, so consecutive allocations look unrelated but distinct
+indexes can never map to the same code. Worker processes split the index
+space by residue (worker k of n only uses indexes congruent to k mod n), so
+codes stay unique across workers without any coordination.
+
+Released codes are recycled oldest first once they have been free for
+`reuse_after` seconds, so a stale scoreboard cannot reach the next match.
+A code handed over to another node with its match is claimed there and
+forgotten, never recycled, by the node that issued it.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+ALPHABET = '23456789ABCDEFGHJKMNPQRSTUVWXYZ'
+
+# Multiplier and offset of the index permutation; the multiplier is raised
+# until it is coprime with the code space size
+PERMUTATION_MULTIPLIER = 0x5DEECE66D
+PERMUTATION_OFFSET = 0xB
+
+
+class CodeSpaceExhausted(Exception):
+    """Raised when every code available to this worker is in use"""
+
+
+class CodeAllocator:
+    """Hands out unique short codes in O(1) and recycles released ones"""
+
+    def __init__(self, length=6, alphabet=ALPHABET, worker_id=0, worker_count=1,
+                 reuse_after=3600.0, clock=time.monotonic):
+        if not 0 <= worker_id < worker_count:
+            raise ValueError('worker_id must be in [0, worker_count)')
+        self.length = length
+        self.alphabet = alphabet
+        self.worker_id = worker_id
+        self.worker_count = worker_count
+        self.reuse_after = reuse_after
+        self.clock = clock
+        self.capacity = len(alphabet) ** length
+        self._multiplier = PERMUTATION_MULTIPLIER % self.capacity
+        while math.gcd(self._multiplier, self.capacity) != 1:
+            self._multiplier += 1
+        self._offset = PERMUTATION_OFFSET % self.capacity
+        self._inverse = pow(self._multiplier, -1, self.capacity)
+        self._digits = {char: value for value, char in enumerate(alphabet)}
+        self._next = worker_id
+        self._released = deque()  # (released_at, index), oldest first
+        self._in_use = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._in_use)
+
+    def encode(self, index):
+        """Code for an index of the code space"""
+        value = (index * self._multiplier + self._offset) % self.capacity
+        base = len(self.alphabet)
+        chars = []
+        for _ in range(self.length):
+            value, digit = divmod(value, base)
+            chars.append(self.alphabet[digit])
+        return ''.join(reversed(chars))
+
+    def decode(self, code):
+        """Index of a code, or None if it is not a well-formed code"""
+        if len(code) != self.length:
+            return None
+        value = 0
+        base = len(self.alphabet)
+        for char in code.upper():
+            digit = self._digits.get(char)
+            if digit is None:
+                return None
+            value = value * base + digit
+        return (value - self._offset) * self._inverse % self.capacity
+
+    def allocate(self):
+        """Return a code that no live match on any worker holds"""
+        with self._lock:
+            while True:
+                if self._released and self.clock() - self._released[0][0] >= self.reuse_after:
+                    index = self._released.popleft()[1]
+                elif self._next < self.capacity:
+                    index = self._next
+                    self._next += self.worker_count
+                else:
+                    raise CodeSpaceExhausted(f'{len(self._in_use)} codes in use')
+                # Skip codes claimed from another process (hot restart, handover between nodes)
+                if index not in self._in_use:
+                    break
+            self._in_use.add(index)
+        return self.encode(index)
+
+    def release(self, code):
+        """Return a code to the pool; unknown codes are ignored"""
+        index = self.decode(code)
+        with self._lock:
+            if index in self._in_use:
+                self._in_use.remove(index)
+                self._released.append((self.clock(), index))
+
+    def claim(self, code):
+        """Mark a code handed over by another node as in use here; returns False if malformed"""
+        index = self.decode(code)
+        if index is None:
+            return False
+        with self._lock:
+            self._in_use.add(index)
+        return True
+
+    def forget(self, code):
+        """Drop a code handed over to another node without recycling it here"""
+        index = self.decode(code)
+        with self._lock:
+            self._in_use.discard(index)
+
+    @property
+    def cursor(self):
+        """Next fresh index; a restarted process resumes from here"""
+        return self._next
+
+    def resume_from(self, cursor):
+        """Continue after codes issued by the previous process of this worker"""
+        with self._lock:
+            if cursor > self._next and cursor % self.worker_count == self.worker_id:
+                self._next = cursor
+
+    def clear(self):
+        with self._lock:
+            self._next = self.worker_id
+            self._released.clear()
+            self._in_use.clear()
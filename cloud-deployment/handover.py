@@ -0,0 +1,180 @@
+"""
+Zero-downtime restarts: a running server hands its state and its listening
+socket to the new version.
+
+Besides its HTTP port, the running server listens on a Unix socket. A new
+process started with --takeover connects to it, and then:
+
+1. The old process stops accepting connections and refuses further requests
+   on open ones with 503. New connections wait in the listening socket's
+   backlog rather than being refused.
+2. The old process sends the listening socket itself (SCM_RIGHTS) and its
+   state as JSON.
+3. The new process loads the state, starts accepting on the same socket and
+   reports ready. Connections that queued meanwhile are served by it.
+4. The old process disconnects its Socket.IO clients, spread over a few
+   seconds. They reconnect to the new process. Then the old process exits.
+
+The state is exported after the old process stops taking writes. Writes
+refused with 503 carry Retry-After: the iOS app resends them with the same
+seq (a few attempts), and cloud_api.py queues them when it has an outbox.
+Other clients get the 503 back. If the new process fails to report ready in
+time, the old one resumes serving.
+
+Serving runs on eventlet, as `python app.py` does.
+"""
+
+import json
+import os
+import socket
+import struct
+import time
+
+import eventlet
+import eventlet.wsgi
+from eventlet.greenio import GreenSocket
+
+HEADER = struct.Struct('!I')  # length of the JSON message that follows
+
+
+def _read_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), 1 << 20))
+        if not chunk:
+            raise ConnectionError('handover peer went away')
+        data += chunk
+    return bytes(data)
+
+
+def _send(sock, message):
+    data = json.dumps(message).encode()
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _receive(sock):
+    size, = HEADER.unpack(_read_exact(sock, HEADER.size))
+    return json.loads(_read_exact(sock, size))
+
+
+class HotRestart:
+    """Serves a WSGI app on a listening socket it can hand to its successor"""
+
+    def __init__(self, export_state, import_state, on_pause, on_resume, drain, ready_timeout=15.0):
+        self.export_state = export_state  # export_state() -> JSON-safe dict
+        self.import_state = import_state  # import_state(state) -> TVs taken over
+        self.on_pause = on_pause  # stop changing state; requests from now on get 503
+        self.on_resume = on_resume  # the successor failed, serve again
+        self.drain = drain  # disconnect this process's long-lived clients
+        self.ready_timeout = ready_timeout
+        self.last_takeover = None  # timings of the handover that started this process
+        self._listener = None
+        self._server = None
+        self._wsgi_app = None
+        self._done = None
+
+    def serve(self, wsgi_app, port, path, takeover=False):
+        """Serve until handed over; with takeover, first take over from the server at `path`"""
+        self._wsgi_app = wsgi_app
+        self._done = eventlet.Event()
+        if takeover:
+            self._listener = self._take_over(path)
+        if self._listener is None:
+            self._listener = eventlet.listen(('0.0.0.0', port))
+        self._start_server()
+
+        if os.path.exists(path):
+            os.unlink(path)  # left by the process we took over from, or a crashed one
+        control = eventlet.listen(path, family=socket.AF_UNIX)
+        eventlet.spawn(self._wait_for_successor, control)
+        print(f"🔁 Hot restart: start the next version with --takeover (handover socket {path})")
+        self._done.wait()
+
+    def _start_server(self):
+        self._server = eventlet.spawn(eventlet.wsgi.server, self._listener, self._wsgi_app, log_output=False)
+
+    # Successor side
+
+    def _take_over(self, path):
+        started = time.perf_counter()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            print(f"⚠️ No running server at {path} to take over from, starting fresh")
+            sock.close()
+            return None
+        with sock:
+            _send(sock, {'op': 'takeover', 'pid': os.getpid()})
+            header, fds, _, _ = socket.recv_fds(sock, HEADER.size, 1)
+            if not fds:
+                raise RuntimeError('Running server did not hand over its listening socket')
+            header += _read_exact(sock, HEADER.size - len(header))
+            size, = HEADER.unpack(header)
+            transfer_start = time.perf_counter()
+            message = json.loads(_read_exact(sock, size))
+            import_start = time.perf_counter()
+            tvs = self.import_state(message['state'])
+            listener = GreenSocket(socket.socket(fileno=fds[0]))
+            _send(sock, {'op': 'ready', 'pid': os.getpid()})
+        now = time.perf_counter()
+        self.last_takeover = {
+            'from_pid': message['pid'],
+            'tvs': tvs,
+            'state_bytes': size,
+            'transfer_ms': round((import_start - transfer_start) * 1000.0, 1),
+            'import_ms': round((now - import_start) * 1000.0, 1),
+            'total_ms': round((now - started) * 1000.0, 1),
+            # Same host, so wall clocks agree
+            'requests_paused_ms': round((time.time() - message['paused_at']) * 1000.0, 1),
+        }
+        print(f"🔁 Took over {tvs} TVs from pid {message['pid']}: {self.last_takeover}")
+        return listener
+
+    # Predecessor side
+
+    def _wait_for_successor(self, control):
+        while True:
+            conn, _ = control.accept()
+            with conn:
+                if self._hand_over(conn):
+                    break
+        control.close()
+        self._done.send()
+
+    def _hand_over(self, conn):
+        """Hand state and listener to the process on `conn`; returns True once it has taken over"""
+        try:
+            with eventlet.Timeout(self.ready_timeout):
+                request = _receive(conn)
+        except (OSError, ValueError, eventlet.Timeout) as e:
+            print(f"⚠️ Ignoring handover request: {e}")
+            return False
+        if request.get('op') != 'takeover':
+            return False
+
+        paused_at = time.time()
+        started = time.perf_counter()
+        self.on_pause()
+        spare = self._listener.dup()
+        # Stops accepting and closes our copy; open connections are left to finish
+        self._server.kill(SystemExit)
+        try:
+            state = json.dumps({'pid': os.getpid(), 'paused_at': paused_at, 'state': self.export_state()}).encode()
+            socket.send_fds(conn.fd, [HEADER.pack(len(state))], [spare.fileno()])
+            conn.sendall(state)
+            with eventlet.Timeout(self.ready_timeout):
+                reply = _receive(conn)
+            if reply.get('op') != 'ready':
+                raise ValueError(f'unexpected reply {reply!r}')
+        except (OSError, ValueError, eventlet.Timeout) as e:
+            print(f"❌ Handover to pid {request.get('pid')} failed ({e}), resuming")
+            self._listener = spare
+            self._start_server()
+            self.on_resume()
+            return False
+        spare.close()
+        handover_ms = round((time.perf_counter() - started) * 1000.0, 1)
+        print(f"🔁 Handed over to pid {reply['pid']} in {handover_ms}ms ({len(state)} bytes), draining")
+        self.drain()
+        return True
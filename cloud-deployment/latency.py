@@ -0,0 +1,147 @@
+"""
+End-to-end score latency tracing, from the scoring device to the TV render.
+
+Stages (all in milliseconds):
+    ingest    - client tap (client clock) to server receive
+    apply     - server receive to match state updated
+    emit      - state updated to socketio.emit returning
+    delivery  - emit to TV render (TV clock)
+    total     - client tap to TV render
+
+Ingest, delivery and total compare clocks on different devices, so skew
+shows up in them. Negative values are clamped to zero rather than dropped,
+so a badly skewed device is still visible in the counts.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+STAGES = ('ingest', 'apply', 'emit', 'delivery', 'total')
+
+# Upper bounds of the histogram buckets in milliseconds; the last one catches everything
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+DEFAULT_VENUE = 'default'
+OTHER_VENUE = 'other'
+MAX_VENUES = 256  # venue labels come from clients, so cap the cardinality
+
+
+def now_ms():
+    """Current wall-clock time in epoch milliseconds"""
+    return time.time() * 1000.0
+
+
+def parse_client_timestamp(value):
+    """Accept epoch seconds or milliseconds from a client and return milliseconds"""
+    try:
+        ts = float(value)
+    except (ValueError, TypeError):
+        return None
+    if ts <= 0:
+        return None
+    # Anything below ~1973 in milliseconds is really a seconds value
+    return ts * 1000.0 if ts < 1e11 else ts
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKET_BOUNDS_MS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value_ms):
+        value_ms = max(value_ms, 0.0)
+        self.counts[bisect_left(BUCKET_BOUNDS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(BUCKET_BOUNDS_MS, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound if bound != float('inf') else None
+        return None
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum_ms': round(self.total, 3),
+            'avg_ms': round(self.total / self.count, 3) if self.count else None,
+            'p50_ms': self.quantile(0.5),
+            'p90_ms': self.quantile(0.9),
+            'p99_ms': self.quantile(0.99),
+            'buckets': {
+                ('+Inf' if bound == float('inf') else str(bound)): bucket_count
+                for bound, bucket_count in zip(BUCKET_BOUNDS_MS, self.counts)
+            }
+        }
+
+
+class LatencyTracker:
+    """Per-venue, per-stage latency histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (venue, stage) -> Histogram
+        self._venues = set()
+
+    def observe(self, venue, stage, value_ms):
+        if value_ms is None:
+            return
+        venue = str(venue)[:64] if venue else DEFAULT_VENUE
+        with self._lock:
+            histogram = self._histograms.get((venue, stage))
+            if histogram is None:
+                if venue not in self._venues:
+                    if len(self._venues) >= MAX_VENUES:
+                        venue = OTHER_VENUE
+                    self._venues.add(venue)
+                key = (venue, stage)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram()
+            histogram.observe(value_ms)
+
+    def record_update(self, trace, applied_ms, emitted_ms):
+        """Record the server-side stages of one update from its trace dict"""
+        venue = trace.get('venue')
+        received_ms = trace['server_received_ts']
+        client_ms = trace.get('client_ts')
+        if client_ms is not None:
+            self.observe(venue, 'ingest', received_ms - client_ms)
+        self.observe(venue, 'apply', applied_ms - received_ms)
+        self.observe(venue, 'emit', emitted_ms - applied_ms)
+
+    def record_render(self, trace, rendered_ms):
+        """Record delivery (and total) from a TV render acknowledgement"""
+        venue = trace.get('venue')
+        emitted_ms = parse_client_timestamp(trace.get('server_emitted_ts'))
+        if emitted_ms is not None:
+            self.observe(venue, 'delivery', rendered_ms - emitted_ms)
+        client_ms = parse_client_timestamp(trace.get('client_ts'))
+        if client_ms is not None:
+            self.observe(venue, 'total', rendered_ms - client_ms)
+
+    def snapshot(self):
+        """All histograms as {venue: {stage: summary}}"""
+        with self._lock:
+            items = [(key, histogram.to_dict()) for key, histogram in self._histograms.items()]
+        result = {}
+        for (venue, stage), summary in sorted(items):
+            result.setdefault(venue, {})[stage] = summary
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._venues.clear()
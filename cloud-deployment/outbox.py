@@ -0,0 +1,50 @@
+"""
+Durable outbox of score updates that could not be delivered.
+
+Each scoring update carries the full match state, so only the latest one
+per match is worth keeping: queueing an update replaces any pending update
+for the same key (last write wins). Entries live in a small SQLite file,
+survive restarts, and come back in the order they were last written.
+"""
+
+import json
+import sqlite3
+import threading
+
+
+class Outbox:
+    """Latest pending payload per key, persisted to disk"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS outbox ('
+                         'seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE NOT NULL, payload TEXT NOT NULL)')
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def put(self, key, payload):
+        """Queue payload for key, replacing any pending payload for the same key"""
+        with self._lock:
+            # REPLACE deletes the old row, so the entry moves to the back of the queue
+            self._db.execute('REPLACE INTO outbox (key, payload) VALUES (?, ?)', (key, json.dumps(payload)))
+
+    def pending(self, limit=None):
+        """(seq, key, payload) tuples, oldest first"""
+        with self._lock:
+            rows = self._db.execute('SELECT seq, key, payload FROM outbox ORDER BY seq LIMIT ?',
+                                    (-1 if limit is None else limit,)).fetchall()
+        return [(seq, key, json.loads(payload)) for seq, key, payload in rows]
+
+    def ack(self, seq):
+        """Remove a delivered entry; a newer payload queued since then is kept"""
+        with self._lock:
+            self._db.execute('DELETE FROM outbox WHERE seq = ?', (seq,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,195 @@
+"""
+On-demand profiling for the live server.
+
+Two modes, both time-bounded and idle (zero cost) unless started:
+
+    sample   - a real OS thread snapshots every other thread's stack at a
+               fixed interval and aggregates collapsed stacks for flamegraphs
+    request  - cProfile around a random fraction of requests, aggregated
+               into a pstats report
+
+Under eventlet the sampler must run on an unpatched OS thread, otherwise
+it would be a greenlet that only ever sees itself.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+
+try:
+    from eventlet import patcher
+    _os_threading = patcher.original('threading')
+    _os_time = patcher.original('time')
+except ImportError:
+    import time as _os_time
+    _os_threading = threading
+
+MAX_DURATION = 120  # seconds
+MIN_INTERVAL = 0.001  # seconds
+MAX_STACK_DEPTH = 64
+MAX_DISTINCT_STACKS = 20000
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+class SamplingProfiler:
+    """Statistical stack sampler producing collapsed stacks"""
+
+    def __init__(self):
+        # Shared with the sampler's OS thread, so it must not be a green lock
+        self._lock = _os_threading.Lock()
+        self._stacks = {}
+        self._samples = 0
+        self._dropped = 0
+        self._thread = None
+        self._stop_event = None
+        self._deadline = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=10.0, interval=0.005):
+        """Start sampling for `duration` seconds; returns False if already running"""
+        if self.running:
+            return False
+        duration = min(max(float(duration), 0.1), MAX_DURATION)
+        interval = max(float(interval), MIN_INTERVAL)
+        with self._lock:
+            self._stacks = {}
+            self._samples = 0
+            self._dropped = 0
+        self._stop_event = _os_threading.Event()
+        self._deadline = _os_time.monotonic() + duration
+        self._thread = _os_threading.Thread(target=self._run, args=(interval, self._stop_event),
+                                            name='padelcast-sampler', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    def _run(self, interval, stop_event):
+        own_id = _os_threading.get_ident()
+        while not stop_event.is_set() and _os_time.monotonic() < self._deadline:
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = _collapse(frame)
+                    if stack in self._stacks:
+                        self._stacks[stack] += 1
+                    elif len(self._stacks) < MAX_DISTINCT_STACKS:
+                        self._stacks[stack] = 1
+                    else:
+                        self._dropped += 1
+                    self._samples += 1
+            del frames
+            stop_event.wait(interval)
+
+    def collapsed(self):
+        """Collapsed stacks ("a;b;c count" per line), heaviest first"""
+        with self._lock:
+            items = sorted(self._stacks.items(), key=lambda item: item[1], reverse=True)
+        return ''.join(f"{stack} {count}\n" for stack, count in items)
+
+    def status(self):
+        with self._lock:
+            return {
+                'running': self.running,
+                'samples': self._samples,
+                'distinct_stacks': len(self._stacks),
+                'dropped_samples': self._dropped
+            }
+
+
+class RequestProfiler:
+    """cProfile a random fraction of requests for a bounded time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = None
+        self._profiled = 0
+        self._deadline = None
+        self._fraction = 0.0
+        # Only one request at a time: cProfile cannot nest and greenlets share a thread
+        self._busy = False
+
+    @property
+    def running(self):
+        return self._deadline is not None and _os_time.monotonic() < self._deadline
+
+    def start(self, duration=30.0, fraction=0.1):
+        if self.running:
+            return False
+        with self._lock:
+            self._stats = None
+            self._profiled = 0
+            self._fraction = min(max(float(fraction), 0.0), 1.0)
+            self._deadline = _os_time.monotonic() + min(max(float(duration), 0.1), MAX_DURATION)
+        return True
+
+    def stop(self):
+        self._deadline = None
+
+    def begin(self):
+        """Maybe start profiling the current request; returns a profile or None"""
+        if not self.running or self._busy or random.random() >= self._fraction:
+            return None
+        with self._lock:
+            if self._busy:
+                return None
+            self._busy = True
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active in this interpreter
+            self._busy = False
+            return None
+        return profile
+
+    def end(self, profile):
+        profile.disable()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self._profiled += 1
+            self._busy = False
+
+    def report(self, limit=50):
+        """pstats summary sorted by cumulative time"""
+        with self._lock:
+            if self._stats is None:
+                return ''
+            output = io.StringIO()
+            self._stats.stream = output
+            self._stats.sort_stats('cumulative').print_stats(limit)
+            return output.getvalue()
+
+    def status(self):
+        return {
+            'running': self.running,
+            'fraction': self._fraction,
+            'profiled_requests': self._profiled
+        }
@@ -0,0 +1,236 @@
+"""
+QR code rendering off the request path.
+
+qrcode's matrix fitting is pure Python and Pillow's PNG encoding is CPU
+bound, so rendering inline freezes every other connection on the single
+eventlet worker. Renders go to a small pool of real OS threads instead:
+through the server's offload hook when it has one (eventlet.tpool while an
+eventlet hub is serving, monkey patched or not), else through eventlet.tpool
+when threading is monkey patched, else through a ThreadPoolExecutor. The number of renders in
+flight is bounded; callers that find the pool full should fall back to a
+placeholder and render in the background.
+
+Images are PNG (Pillow) or a compact single-path SVG built straight from
+the QR matrix, and are cached by payload so repeat views never re-render.
+
+Bulk provisioning renders whole batches across every CPU core in a fresh
+interpreter (python qr_render.py --batch svg < payloads.json), which keeps
+process pools away from the server's monkey-patched threading.
+"""
+
+import base64
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+import qrcode
+
+try:
+    from eventlet import patcher, tpool
+except ImportError:
+    patcher = tpool = None
+
+
+class QRQueueFull(Exception):
+    """Raised when too many renders are already in flight"""
+
+
+def _qr_matrix(text, border):
+    qr = qrcode.QRCode(version=1, border=border)
+    qr.add_data(text)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def render_qr_svg(text, border=5):
+    """Render text as an SVG QR code: one path of horizontal module runs"""
+    matrix = _qr_matrix(text, border)
+    size = len(matrix)
+    runs = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            runs.append(f'M{start} {y}h{x - start}v1h-{x - start}z')
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+            f'<rect width="{size}" height="{size}" fill="#fff"/><path d="{"".join(runs)}"/></svg>').encode()
+
+
+def render_qr_png(text, box_size=10, border=5):
+    """Render text as a QR code PNG"""
+    qr = qrcode.QRCode(version=1, box_size=box_size, border=border)
+    qr.add_data(text)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_qr_png_base64(text, box_size=10, border=5):
+    """Render text as a QR code PNG and return it base64-encoded"""
+    return base64.b64encode(render_qr_png(text, box_size, border)).decode()
+
+
+RENDERERS = {'png': render_qr_png, 'svg': render_qr_svg}
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def render_batch(texts, fmt='svg', processes=None):
+    """Render many payloads in parallel across CPU cores; images come back in order"""
+    renderer = RENDERERS[fmt]
+    processes = min(processes or os.cpu_count() or 1, len(texts))
+    if processes <= 1:
+        return [renderer(text) for text in texts]
+    with ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(renderer, texts, chunksize=max(len(texts) // (processes * 4), 1)))
+
+
+def render_batch_subprocess(texts, fmt='svg', timeout=120):
+    """render_batch in a fresh interpreter
+
+    Blocks the calling thread until the child exits, so servers call it from
+    a worker thread (app.run_blocking), never on an event loop.
+    """
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--batch', fmt],
+                            input=json.dumps(texts), capture_output=True, text=True,
+                            timeout=timeout, check=True)
+    return [base64.b64decode(image) for image in json.loads(result.stdout)]
+
+
+class ImageCache:
+    """Thread-safe LRU of rendered images keyed on (format, payload)"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            self._entries[key] = image
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class QRRenderPool:
+    """Bounded pool of OS threads for QR rendering"""
+
+    def __init__(self, max_workers=2, max_pending=32, on_render=None, cache=None, offload=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        # Called with the render duration in seconds, from the worker thread
+        self.on_render = on_render
+        # offload(func, *args) runs a blocking call without stalling the caller's event loop
+        self.offload = offload
+        self.cache = cache if cache is not None else ImageCache()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+
+    @property
+    def pending(self):
+        """Renders queued or running"""
+        return self._pending
+
+    def _timed_render(self, text, fmt):
+        start = time.perf_counter()
+        try:
+            return RENDERERS[fmt](text)
+        finally:
+            if self.on_render:
+                self.on_render(time.perf_counter() - start, fmt)
+
+    def _execute(self, text, fmt):
+        if self.offload is not None:
+            return self.offload(self._timed_render, text, fmt)
+        if tpool is not None and patcher.is_monkey_patched('thread'):
+            return tpool.execute(self._timed_render, text, fmt)
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='qr-render')
+        return self._executor.submit(self._timed_render, text, fmt).result()
+
+    def render(self, text, fmt='png', block=False):
+        """Return the image bytes for text, rendering on the pool on a cache miss
+
+        With block=False this raises QRQueueFull instead of waiting for a slot.
+        """
+        image = self.cache.get((fmt, text))
+        if image is not None:
+            return image
+        if not self._slots.acquire(blocking=False):
+            if not block:
+                raise QRQueueFull()
+            # Waiting for a slot must not stall the event loop either
+            if self.offload is not None:
+                self.offload(self._slots.acquire)
+            else:
+                self._slots.acquire()
+        with self._lock:
+            self._pending += 1
+        try:
+            image = self._execute(text, fmt)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+        self.cache.put((fmt, text), image)
+        return image
+
+    def render_batch(self, texts, fmt='svg'):
+        """Return images for many payloads, rendering cache misses across all cores"""
+        images = {}
+        for text in texts:
+            image = self.cache.get((fmt, text))
+            if image is not None:
+                images[text] = image
+        missing = [text for text in dict.fromkeys(texts) if text not in images]
+        if missing:
+            start = time.perf_counter()
+            for text, image in zip(missing, render_batch_subprocess(missing, fmt)):
+                images[text] = image
+                self.cache.put((fmt, text), image)
+            if self.on_render:
+                self.on_render((time.perf_counter() - start) / len(missing), fmt)
+        return [images[text] for text in texts]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != '--batch' or sys.argv[2] not in RENDERERS:
+        sys.exit(f"usage: {sys.argv[0]} --batch {{{','.join(RENDERERS)}}} < payloads.json")
+    rendered = render_batch(json.load(sys.stdin), sys.argv[2])
+    json.dump([base64.b64encode(image).decode() for image in rendered], sys.stdout)
@@ -0,0 +1,70 @@
+"""
+Rate limiting and overload detection for the write endpoints.
+
+TokenBucketLimiter keeps one bucket per key (a TV ID or a client address).
+Buckets refill lazily when a key is seen, so a check is O(1), and only the
+`max_keys` most recently seen keys are kept: a forgotten key simply starts
+again with a full bucket.
+
+LoopLagMonitor holds how late the background scheduler's wakeups are. On a
+cooperative server (eventlet or asyncio) that is how long every request is
+currently waiting for its turn, the most direct signal that the process is
+overloaded.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """`rate` requests per second per key, with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst, max_keys=10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at], least recently seen first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key):
+        """Spend a token for key; returns 0 if allowed, else seconds until a token is available"""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate if self.rate else float('inf')
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class LoopLagMonitor:
+    """Event loop lag in seconds, held at its peak and decaying between samples"""
+
+    def __init__(self, decay=0.8):
+        self.decay = decay
+        self.lag = 0.0
+
+    def record(self, lag):
+        """Record how late one wakeup was"""
+        # Rise at once so shedding starts on the first late wakeup, fall gradually
+        self.lag = max(lag, self.lag * self.decay)
+
+    def clear(self):
+        self.lag = 0.0
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Venue relay mode of the PadelCast server.
+
+Runs on a box at the venue, between the venue's TVs and the cloud server
+(app.py). The relay keeps one Socket.IO connection to the cloud and joins
+each TV's room there once, however many screens at the venue show that TV.
+It caches the latest scoreboard per TV and serves TVs locally:
+
+    /tv/<tv_id>              fetched from the cloud, last good copy kept for outages
+    /api/match-status/<id>   answered from the cache
+    Socket.IO                match_update pushed to local screens with the same
+                             per-socket flow control as the cloud (backpressure.py)
+
+Everything else (TV setup pages, QR images, resets) is passed through to the
+cloud. Phones keep talking to the cloud directly: QR codes carry the cloud's
+URL.
+
+When the cloud connection drops, Socket.IO reconnects on its own. The relay
+then rejoins every room and refetches each TV's status, so screens catch up
+on anything they missed. If the cloud is a cluster and a TV lives on another
+node, the cloud answers the join with a redirect event; the relay then opens
+a connection to that node and follows the TV there. A venue box serves a few dozen screens, so the relay
+uses plain threads rather than eventlet.
+
+Run with:
+    python relay.py --upstream https://your-app.up.railway.app --port 8081
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import requests
+import socketio as socketio_client
+from flask import Flask, Response, jsonify, render_template, request
+from flask_socketio import SocketIO, emit, join_room
+
+import metrics
+from backpressure import FrameOutbox
+from scheduler import Scheduler
+from snapshot_dict import SnapshotDict
+
+# Headers of cloud responses worth passing on to screens
+PASSED_HEADERS = frozenset({'content-type', 'location', 'etag', 'cache-control', 'last-modified', 'retry-after'})
+
+app = Flask(__name__)
+started_at = time.time()
+socketio = SocketIO(app, async_mode='threading', cors_allowed_origins='*')
+
+metrics_registry = metrics.Registry()
+upstream_frames = metrics_registry.counter(
+    'padelcast_relay_upstream_frames_total', 'Match updates received from the cloud server')
+resyncs = metrics_registry.counter(
+    'padelcast_relay_resyncs_total', 'Match statuses refetched from the cloud server', ('result',))
+dropped_frames = metrics_registry.counter(
+    'padelcast_socketio_dropped_frames_total', 'Match update frames never sent to a slow TV', ('reason',))
+
+
+class Relay:
+    """Cloud subscriptions and the latest match status per TV"""
+
+    def __init__(self, upstream_url, publish, has_listeners, forward=None, status_ttl=2.0, timeout=(3.05, 10)):
+        self.upstream_url = upstream_url.rstrip('/')
+        self.publish = publish  # publish(tv_id, snapshot) to local screens
+        self.has_listeners = has_listeners  # has_listeners(tv_id): a local screen is connected
+        self.forward = forward  # forward(event, data, tv_id) to local screens, as is
+        self.status_ttl = status_ttl  # how long an unlinked TV's status is reused
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.client = self._new_client(None)
+        self.statuses = SnapshotDict()  # tv_id -> (status code, body, fetched_at) of /api/match-status
+        self.pages = SnapshotDict()  # tv_id -> last good /tv/<tv_id> page as (body, content type)
+        self.qr_codes = SnapshotDict()  # tv_id -> qr_ready data of a TV whose QR was rendered late
+        self._subscriptions = {}  # tv_id -> when a screen last asked for it
+        self._tv_nodes = {}  # tv_id -> URL of the cluster node serving it, if not the upstream
+        self._node_clients = {}  # node URL -> connection to that node
+        self._lock = threading.Lock()
+
+    def _new_client(self, node_url):
+        """Socket.IO connection to the upstream (node_url None) or another cluster node"""
+        client = socketio_client.Client(reconnection=True, reconnection_delay=1, reconnection_delay_max=5)
+        client.on('connect', lambda: self._on_connect(node_url))
+        client.on('disconnect', lambda *args: self._on_disconnect(node_url))
+        client.on('match_update', lambda data: self._on_match_update(data, client))
+        client.on('redirect', self._on_redirect)
+        client.on('qr_ready', self._on_qr_ready)
+        return client
+
+    def _client_for(self, tv_id):
+        node_url = self._tv_nodes.get(tv_id)
+        return self._node_clients[node_url] if node_url else self.client
+
+    @property
+    def connected(self):
+        return self.client.connected
+
+    @property
+    def subscriptions(self):
+        return len(self._subscriptions)
+
+    def start(self):
+        """Connect to the cloud in the background; Socket.IO handles reconnects after that"""
+        threading.Thread(target=self._connect_loop, args=(self.client, None), daemon=True).start()
+
+    def _connect_loop(self, client, node_url):
+        delay = 1
+        while node_url is None or self._node_clients.get(node_url) is client:
+            try:
+                client.connect(node_url or self.upstream_url, wait_timeout=5)
+                return
+            except socketio_client.exceptions.ConnectionError as e:
+                print(f"⚠️ Cloud server {node_url or self.upstream_url} unreachable ({e}), retrying in {delay}s")
+                time.sleep(delay)
+                delay = min(delay * 2, 10)
+
+    def subscribe(self, tv_id):
+        """Follow a TV's updates from the cloud"""
+        with self._lock:
+            new = tv_id not in self._subscriptions
+            self._subscriptions[tv_id] = time.monotonic()
+            client = self._client_for(tv_id)
+        if new and client.connected:
+            client.emit('join', {'tv_id': tv_id})
+
+    def prune(self, max_idle=300):
+        """Unsubscribe from TVs no local screen has shown for `max_idle` seconds"""
+        cutoff = time.monotonic() - max_idle
+        with self._lock:
+            idle = [tv_id for tv_id, seen in self._subscriptions.items()
+                    if seen < cutoff and not self.has_listeners(tv_id)]
+            clients = [self._client_for(tv_id) for tv_id in idle]
+            for tv_id in idle:
+                del self._subscriptions[tv_id]
+                self._tv_nodes.pop(tv_id, None)
+            # Connections to other nodes are kept only while they serve a followed TV
+            unused = [node_url for node_url in self._node_clients if node_url not in self._tv_nodes.values()]
+            closing = [self._node_clients.pop(node_url) for node_url in unused]
+        self.statuses.remove_many(idle)
+        self.pages.remove_many(idle)
+        self.qr_codes.remove_many(idle)
+        for tv_id, client in zip(idle, clients):
+            if client.connected and client not in closing:
+                client.emit('leave', {'tv_id': tv_id})
+        for client in closing:
+            client.disconnect()
+        return len(idle)
+
+    def snapshot(self, tv_id):
+        """Latest scoreboard for a linked TV, or None"""
+        cached = self.statuses.get(tv_id)
+        if cached and cached[0] == 200 and cached[1].get('success'):
+            return cached[1]['match']
+        return None
+
+    def status(self, tv_id):
+        """(status code, body) of the TV's /api/match-status, from the cache when possible"""
+        self.subscribe(tv_id)
+        cached = self.statuses.get(tv_id)
+        # Linked TVs are kept current by pushed updates; unlinked ones are rechecked
+        # at most every status_ttl, however many screens poll
+        if cached and (self.snapshot(tv_id) is not None or time.monotonic() - cached[2] < self.status_ttl):
+            return cached[0], cached[1]
+        try:
+            return self.resync(tv_id)
+        except requests.RequestException:
+            if cached:
+                return cached[0], cached[1]
+            return 502, {'success': False, 'error': 'Scoreboard server unreachable'}
+
+    def resync(self, tv_id):
+        """Refetch a TV's status from the cloud and push it to local screens"""
+        try:
+            response = self.http.get(f'{self.upstream_url}/api/match-status/{tv_id}', timeout=self.timeout)
+            body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            resyncs.inc('failed')
+            raise requests.RequestException(str(e)) from e
+        resyncs.inc('ok')
+        self.statuses[tv_id] = (response.status_code, body, time.monotonic())
+        if response.status_code == 200 and body.get('success'):
+            self.publish(tv_id, body['match'])
+        return response.status_code, body
+
+    def page(self, tv_id):
+        """(body, content type, status) of the TV page, or None if the cloud is unreachable with nothing cached"""
+        self.subscribe(tv_id)
+        try:
+            response = self.http.get(f'{self.upstream_url}/tv/{tv_id}', timeout=self.timeout)
+        except requests.RequestException:
+            cached = self.pages.get(tv_id)
+            return cached + (200,) if cached else None
+        content_type = response.headers.get('Content-Type', 'text/html; charset=utf-8')
+        if response.status_code == 200:
+            self.pages[tv_id] = (response.content, content_type)
+        return response.content, content_type, response.status_code
+
+    def _on_connect(self, node_url=None):
+        with self._lock:
+            tv_ids = [tv_id for tv_id in self._subscriptions if self._tv_nodes.get(tv_id) == node_url]
+            client = self._node_clients.get(node_url) if node_url else self.client
+        if client is None:
+            return
+        print(f"🔗 Connected to cloud server {node_url or self.upstream_url}, resyncing {len(tv_ids)} TVs")
+        for tv_id in tv_ids:
+            client.emit('join', {'tv_id': tv_id})
+        # Catch up on updates missed while disconnected, off the client's event thread
+        client.start_background_task(self._resync_all, tv_ids)
+
+    def _resync_all(self, tv_ids):
+        for tv_id in tv_ids:
+            try:
+                self.resync(tv_id)
+            except requests.RequestException:
+                pass
+
+    def _on_disconnect(self, node_url=None):
+        print(f"⚠️ Lost connection to cloud server {node_url or self.upstream_url}")
+
+    def _on_redirect(self, data):
+        """The TV is served by another node of a cloud cluster: follow it there"""
+        tv_id = data.get('tv_id')
+        node_url = data.get('url', '').rpartition('/tv/')[0].rstrip('/')
+        if not tv_id or not node_url:
+            return
+        with self._lock:
+            if tv_id not in self._subscriptions:
+                return
+            previous = self._client_for(tv_id)
+            if node_url == self.upstream_url:
+                self._tv_nodes.pop(tv_id, None)
+                client, new = self.client, False
+            else:
+                self._tv_nodes[tv_id] = node_url
+                client = self._node_clients.get(node_url)
+                new = client is None
+                if new:
+                    client = self._node_clients[node_url] = self._new_client(node_url)
+        print(f"↪️ TV {tv_id} is served by {node_url}, following it there")
+        if previous is not client and previous.connected:
+            previous.emit('leave', {'tv_id': tv_id})
+        if new:
+            # Joins the node's TVs once connected
+            threading.Thread(target=self._connect_loop, args=(client, node_url), daemon=True).start()
+        elif client.connected:
+            client.emit('join', {'tv_id': tv_id})
+            client.start_background_task(self._resync_all, [tv_id])
+
+    def _on_qr_ready(self, data):
+        """A TV's QR code was rendered after its page was served: pass it on to its screens"""
+        tv_id = data.get('tv_id')
+        if tv_id not in self._subscriptions:
+            return
+        self.qr_codes[tv_id] = data
+        if self.forward is not None:
+            self.forward('qr_ready', data, tv_id)
+
+    def _on_match_update(self, data, client=None):
+        # Acknowledge at once: the relay is the cloud's client, local screens have their own flow control
+        tv_id = data.get('tv_id')
+        (client or self.client).emit('render_ack', {'tv_id': tv_id})
+        upstream_frames.inc()
+        if tv_id not in self._subscriptions:
+            return
+        cached = self.statuses.get(tv_id)
+        previous = self.snapshot(tv_id)
+        if previous is None:
+            # Newly linked: fetch the full status (the update lacks display-only fields)
+            self.client.start_background_task(self._resync_all, [tv_id])
+            return
+        version, last_version = data.get('version'), previous.get('version')
+        if version is not None and last_version is not None and version < last_version:
+            return
+        match = dict(previous, **{key: value for key, value in data.items() if key not in ('trace', 'tv_id')})
+        self.statuses[tv_id] = (200, dict(cached[1], match=match), time.monotonic())
+        self.publish(tv_id, data)
+
+
+def local_rooms():
+    """Socket.IO rooms of the local screens (room -> {sid: eio_sid})"""
+    return socketio.server.manager.rooms.get('/', {}) if socketio.server else {}
+
+
+def publish_snapshot(tv_id, snapshot):
+    frame_outbox.publish('match_update', snapshot, tv_id, list(local_rooms().get(tv_id, {})))
+
+
+frame_outbox = FrameOutbox(lambda event, data, to, skip: socketio.emit(event, data, to=to, skip_sid=skip or None),
+                           on_drop=dropped_frames.inc)
+relay = Relay(os.environ.get('PADELCAST_UPSTREAM_URL', 'http://localhost:8080'), publish_snapshot,
+              lambda tv_id: bool(local_rooms().get(tv_id)),
+              forward=lambda event, data, tv_id: socketio.emit(event, data, to=tv_id))
+scheduler = Scheduler()
+scheduler.every('prune_subscriptions', 60, relay.prune)
+scheduler.every('expire_frame_credits', frame_outbox.ack_timeout, frame_outbox.expire)
+
+metrics_registry.gauge('padelcast_relay_upstream_connected', 'Whether the cloud connection is up',
+                       lambda: int(relay.connected))
+metrics_registry.gauge('padelcast_relay_subscriptions', 'TVs followed on the cloud server',
+                       lambda: relay.subscriptions)
+metrics_registry.gauge('padelcast_connected_sockets', 'Connected Socket.IO clients',
+                       lambda: len(local_rooms().get(None, {})))
+metrics_registry.gauge('padelcast_socketio_pending_frames', 'Match update frames held for slow TVs',
+                       lambda: frame_outbox.pending)
+
+
+def start_background_work():
+    """Connect to the cloud and start pruning idle subscriptions"""
+    relay.start()
+    threading.Thread(target=scheduler.run, args=(time.sleep,), daemon=True).start()
+
+
+@app.route('/tv/<tv_id>')
+def tv_display(tv_id):
+    """TV page from the cloud, or the last good copy while it is unreachable"""
+    page = relay.page(tv_id)
+    if page is None:
+        return render_template('error.html', message='Scoreboard server unreachable'), 502
+    body, content_type, status = page
+    return Response(body, status=status, content_type=content_type)
+
+
+@app.route('/api/match-status/<tv_id>')
+def match_status(tv_id):
+    """Current match status for a TV, served from the relay's cache"""
+    status, body = relay.status(tv_id)
+    return jsonify(body), status
+
+
+@app.route('/healthz')
+def healthz():
+    """Liveness probe"""
+    return jsonify({'status': 'ok', 'uptime_s': round(time.time() - started_at, 1)})
+
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe: connected to the cloud server"""
+    ready = relay.connected
+    return jsonify({
+        'status': 'ready' if ready else 'not ready',
+        'upstream': relay.upstream_url,
+        'subscriptions': relay.subscriptions,
+        'cached_statuses': len(relay.statuses),
+        'connected_sockets': len(local_rooms().get(None, {})),
+    }), 200 if ready else 503
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics"""
+    return Response(metrics_registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/', defaults={'path': ''}, methods=['GET', 'POST'])
+@app.route('/<path:path>', methods=['GET', 'POST'])
+def proxy(path):
+    """Everything else (TV setup, QR images, resets) goes straight to the cloud server"""
+    headers = {name: request.headers[name] for name in ('Content-Type', 'If-None-Match') if name in request.headers}
+    try:
+        response = relay.http.request(request.method, f'{relay.upstream_url}/{path}', params=request.args,
+                                      data=request.get_data(), headers=headers, timeout=relay.timeout,
+                                      allow_redirects=False)
+    except requests.RequestException:
+        return render_template('error.html', message='Scoreboard server unreachable'), 502
+    passed = {name: value for name, value in response.headers.items() if name.lower() in PASSED_HEADERS}
+    return Response(response.content, status=response.status_code, headers=passed)
+
+
+@socketio.on('join')
+def on_join(data):
+    """A local screen joins its TV's room and gets the latest scoreboard at once"""
+    tv_id = data['tv_id']
+    join_room(tv_id)
+    relay.subscribe(tv_id)
+    snapshot = relay.snapshot(tv_id)
+    if snapshot is not None:
+        frame_outbox.publish_to('match_update', snapshot, tv_id, request.sid)
+        return
+    # A page still waiting for its QR code may have missed the push
+    qr_ready = relay.qr_codes.get(tv_id)
+    if qr_ready is not None:
+        emit('qr_ready', qr_ready)
+
+
+@socketio.on('render_ack')
+def on_render_ack(data):
+    """A local screen rendered an update: release its next frame"""
+    frame_outbox.ack(request.sid)
+
+
+@socketio.on('disconnect')
+def on_disconnect():
+    frame_outbox.forget(request.sid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PadelCast venue relay')
+    parser.add_argument('--upstream', default=relay.upstream_url, help='URL of the cloud server')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8081)))
+    args = parser.parse_args()
+
+    relay.upstream_url = args.upstream.rstrip('/')
+    start_background_work()
+    print("🎾 PadelCast venue relay starting...")
+    print(f"☁️ Cloud server: {relay.upstream_url}")
+    print(f"📺 Point venue TVs at: http://<this box>:{args.port}/tv")
+    socketio.run(app, host='0.0.0.0', port=args.port, allow_unsafe_werkzeug=True)
+
+
+if __name__ == '__main__':
+    main()
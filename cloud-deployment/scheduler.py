@@ -0,0 +1,149 @@
+"""
+Cooperative scheduler for the server's periodic and delayed background jobs.
+
+Jobs run one at a time on the server's own event loop (an eventlet green
+thread, or an asyncio task in asgi_app.py), between requests rather than
+alongside them, so a job can walk the in-memory state without racing a
+request handler. Jobs must therefore be short and must not block.
+
+Between runs, the scheduler sleeps for at most `tick` seconds. How late each
+wakeup is gives the event loop lag, which is reported through `on_lag`.
+
+Each periodic job runs again `interval` seconds after it was due, plus up to
+`jitter` of the interval at random, so worker processes spread their sweeps
+out. A run that takes longer than its interval is an overrun. Runs missed
+meanwhile are skipped rather than replayed back to back.
+"""
+
+import random
+import time
+
+
+class Job:
+    __slots__ = ('name', 'func', 'interval', 'jitter', 'next_run', 'runs', 'failures', 'overruns',
+                 'last_duration', 'max_duration')
+
+    def __init__(self, name, func, interval, jitter, next_run):
+        self.name = name
+        self.func = func
+        self.interval = interval  # None for a one-shot job
+        self.jitter = jitter
+        self.next_run = next_run
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.last_duration = None
+        self.max_duration = 0.0
+
+    def status(self, now):
+        return {
+            'interval_s': self.interval,
+            'next_run_in_s': round(self.next_run - now, 3),
+            'runs': self.runs,
+            'failures': self.failures,
+            'overruns': self.overruns,
+            'last_duration_ms': None if self.last_duration is None else round(self.last_duration * 1000, 3),
+            'max_duration_ms': round(self.max_duration * 1000, 3),
+        }
+
+
+class Scheduler:
+    """Runs registered jobs when due; driven by run() or by an async loop calling run_pending()"""
+
+    def __init__(self, tick=0.1, stall_after=30.0, on_run=None, on_overrun=None, on_failure=None,
+                 on_lag=None, clock=time.monotonic, rng=None):
+        self.tick = tick
+        self.stall_after = stall_after
+        self.on_run = on_run  # on_run(seconds, job_name)
+        self.on_overrun = on_overrun  # on_overrun(job_name)
+        self.on_failure = on_failure  # on_failure(job_name)
+        self.on_lag = on_lag  # on_lag(seconds a wakeup was late)
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.jobs = {}
+        self.started_at = None
+        self.last_tick = None
+
+    @property
+    def started(self):
+        return self.started_at is not None
+
+    def every(self, name, interval, func, jitter=0.1, first_run_in=None):
+        """Run func every `interval` seconds, first after `first_run_in` (default: one interval)"""
+        delay = interval if first_run_in is None else first_run_in
+        self.jobs[name] = Job(name, func, interval, jitter, self.clock() + delay)
+
+    def after(self, name, delay, func):
+        """Run func once, `delay` seconds from now"""
+        self.jobs[name] = Job(name, func, None, 0.0, self.clock() + delay)
+
+    def cancel(self, name):
+        self.jobs.pop(name, None)
+
+    def run_pending(self):
+        """Run every job that is due; returns how long to sleep before calling again"""
+        now = self.clock()
+        self.last_tick = now
+        for job in sorted((job for job in self.jobs.values() if job.next_run <= now), key=lambda job: job.next_run):
+            if self.jobs.get(job.name) is job:  # not cancelled by an earlier job
+                self._run_job(job)
+        now = self.clock()
+        next_run = min((job.next_run for job in self.jobs.values()), default=now + self.tick)
+        return min(max(next_run - now, 0.0), self.tick)
+
+    def woke(self, requested, slept):
+        """Report a sleep of `requested` seconds that actually took `slept`"""
+        if self.on_lag:
+            self.on_lag(max(slept - requested, 0.0))
+
+    def run(self, sleep):
+        """Run jobs forever, sleeping with the server's cooperative sleep"""
+        if self.started_at is None:
+            self.started_at = self.clock()
+        while True:
+            delay = self.run_pending()
+            start = self.clock()
+            sleep(delay)
+            self.woke(delay, self.clock() - start)
+
+    def alive(self):
+        """True once started, as long as the loop keeps getting round to the scheduler"""
+        if not self.started:
+            return False
+        return self.clock() - (self.last_tick or self.started_at) < self.stall_after
+
+    def status(self):
+        now = self.clock()
+        return {name: job.status(now) for name, job in self.jobs.items()}
+
+    def _run_job(self, job):
+        due = job.next_run
+        start = self.clock()
+        try:
+            job.func()
+        except Exception as e:
+            job.failures += 1
+            print(f"❌ Background job {job.name} failed: {e}")
+            if self.on_failure:
+                self.on_failure(job.name)
+        end = self.clock()
+        duration = end - start
+        job.runs += 1
+        job.last_duration = duration
+        job.max_duration = max(job.max_duration, duration)
+        if self.on_run:
+            self.on_run(duration, job.name)
+
+        if job.interval is None:
+            if self.jobs.get(job.name) is job:
+                del self.jobs[job.name]
+            return
+        next_run = due + job.interval
+        if next_run <= end:
+            # Still busy (or starved) when the next run came due; skip the missed runs
+            job.overruns += 1
+            print(f"⚠️ Background job {job.name} overran its {job.interval}s interval")
+            if self.on_overrun:
+                self.on_overrun(job.name)
+            next_run = end + job.interval
+        job.next_run = next_run + self.rng.uniform(0, job.jitter * job.interval)
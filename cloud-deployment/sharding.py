@@ -0,0 +1,72 @@
+"""
+Consistent-hash sharding of TVs and their matches across server nodes.
+
+Every node holds the state of the TVs it owns; nothing is shared. The owner
+of a TV is found on a hash ring where each node sits at `vnodes` points, so
+load spreads evenly and adding or removing a node only moves the keys on
+the arcs it gains or loses (about 1/n of them).
+
+The routing key is carried in the TV ID itself: its first 8 characters. A
+node creating a TV picks an ID whose key it owns, so any node can route a
+request from the ID alone. A match lives with the TV it is linked to.
+Provisioned TVs take their venue's key as prefix, so all courts of a venue
+land on, and move together to, the same node.
+"""
+
+import bisect
+import hashlib
+import uuid
+
+TV_KEY_LENGTH = 8
+
+
+def key_hash(key):
+    """Position of a key on the ring"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+def tv_key(tv_id):
+    """Routing key of a TV"""
+    return tv_id[:TV_KEY_LENGTH]
+
+
+def venue_key(venue):
+    """Routing key shared by every provisioned TV of a venue"""
+    return hashlib.blake2b(f'venue:{venue}'.encode(), digest_size=TV_KEY_LENGTH // 2).hexdigest()
+
+
+class HashRing:
+    """Maps keys to nodes; build a new ring to change membership"""
+
+    def __init__(self, nodes=(), vnodes=160):
+        self.vnodes = vnodes
+        self.nodes = sorted(set(nodes))
+        points = sorted((key_hash(f'{node}#{i}'), node) for node in self.nodes for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.nodes
+
+    def owner(self, key):
+        """Node owning a key: the first node point clockwise from it, or None on an empty ring"""
+        if not self._points:
+            return None
+        return self._owners[bisect.bisect(self._points, key_hash(key)) % len(self._points)]
+
+    def mint_tv_id(self, node, key=None, attempts=1000):
+        """New TV ID with routing key `key`, or one that `node` owns"""
+        tv_id = str(uuid.uuid4())
+        if key is not None:
+            return key + tv_id[TV_KEY_LENGTH:]
+        if node not in self:
+            return tv_id
+        # Each draw lands on `node` with probability about 1/len(self)
+        for _ in range(attempts):
+            if self.owner(tv_key(tv_id)) == node:
+                break
+            tv_id = str(uuid.uuid4())
+        return tv_id
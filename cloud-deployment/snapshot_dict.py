@@ -0,0 +1,110 @@
+"""
+Copy-on-write dict for the server's shared in-memory state.
+
+Readers never lock. Every read goes to whichever dict is current, and a
+published dict is never modified again. A loop over items() (the expiry
+sweep, a metrics scrape, a status page) therefore sees one consistent
+snapshot, and can never fail with "dictionary changed size during
+iteration", whatever writers do meanwhile.
+
+Writers serialise on a lock. Each write copies the current dict, changes
+the copy, and publishes it with a single reference swap (read-copy-update).
+A write costs O(n), so use remove_many()/update() to apply several changes
+with one copy. That suits this server, where reads (every score update
+looks up its TV and match) vastly outnumber structural writes (linking,
+resetting and expiring sessions). The values themselves are shared, not
+copied: a Match or session dict updated in place is visible to every
+snapshot.
+"""
+
+import threading
+from collections.abc import MutableMapping
+from types import MappingProxyType
+
+_MISSING = object()
+
+
+class SnapshotDict(MutableMapping):
+    """Mapping whose readers work lock-free on immutable snapshots"""
+
+    def __init__(self, data=None):
+        self._data = dict(data or {})
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Read-only view of the current state; later writes never change it"""
+        return MappingProxyType(self._data)
+
+    # Reads: one attribute load, then plain dict operations on a frozen dict
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __reversed__(self):
+        return reversed(self._data)
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        return self._data.values()
+
+    def items(self):
+        return self._data.items()
+
+    def __eq__(self, other):
+        return self._data == (other._data if isinstance(other, SnapshotDict) else other)
+
+    def __repr__(self):
+        return f'SnapshotDict({self._data!r})'
+
+    # Writes: copy, change the copy, publish
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            data = dict(self._data)
+            data[key] = value
+            self._data = data
+
+    def __delitem__(self, key):
+        with self._lock:
+            data = dict(self._data)
+            del data[key]
+            self._data = data
+
+    def pop(self, key, *default):
+        with self._lock:
+            data = dict(self._data)
+            value = data.pop(key, *default)
+            self._data = data
+        return value
+
+    def update(self, other=(), **kwargs):
+        with self._lock:
+            data = dict(self._data)
+            data.update(other, **kwargs)
+            self._data = data
+
+    def remove_many(self, keys):
+        """Delete every key present in one write; returns how many were removed"""
+        with self._lock:
+            data = dict(self._data)
+            removed = sum(1 for key in keys if data.pop(key, _MISSING) is not _MISSING)
+            self._data = data
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._data = {}
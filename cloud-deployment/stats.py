@@ -0,0 +1,177 @@
+"""
+Incremental player and team statistics for finished matches.
+
+Each finished match updates a handful of counters, and every leaderboard
+metric keeps a sorted list so top-N queries never scan the full history.
+Moving a record within a sorted list is a binary search plus a list insert,
+O(n) in the number of players or teams (a memmove, cheap at club scale).
+
+Match IDs already recorded are remembered so a match is never counted
+twice; the session sweep calls retain_matches() to forget those of matches
+the server no longer holds.
+"""
+
+import threading
+from bisect import bisect_left, insort
+
+# Names the apps fill in when nobody typed one; aggregating them is noise
+DEFAULT_NAMES = {'Player 1', 'Player 2', 'Player 3', 'Player 4', 'Team 1', 'Team 2', ''}
+
+LEADERBOARD_METRICS = ('wins', 'matches_played', 'sets_won', 'games_won', 'tiebreaks_won')
+KINDS = ('player', 'team')
+
+
+class Record:
+    """Win/loss record for one player or team"""
+
+    __slots__ = ('name', 'matches_played', 'wins', 'losses', 'sets_won', 'sets_lost',
+                 'games_won', 'games_lost', 'tiebreaks_won', 'tiebreaks_lost')
+
+    def __init__(self, name):
+        self.name = name
+        self.matches_played = 0
+        self.wins = 0
+        self.losses = 0
+        self.sets_won = 0
+        self.sets_lost = 0
+        self.games_won = 0
+        self.games_lost = 0
+        self.tiebreaks_won = 0
+        self.tiebreaks_lost = 0
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self.__slots__}
+        data['win_rate'] = round(self.wins / self.matches_played, 3) if self.matches_played else 0.0
+        return data
+
+
+def summarize_match(match):
+    """Return per-team totals (sets, games, tie-breaks) for a finished Match"""
+    totals = {1: {'sets': 0, 'games': 0, 'tiebreaks': 0}, 2: {'sets': 0, 'games': 0, 'tiebreaks': 0}}
+    set_numbers = set(match.team1_set_games) | set(match.team2_set_games)
+    for i in sorted(set_numbers):
+        try:
+            g1 = int(match.team1_set_games.get(i, 0))
+            g2 = int(match.team2_set_games.get(i, 0))
+        except (ValueError, TypeError):
+            continue
+        totals[1]['games'] += g1
+        totals[2]['games'] += g2
+        if g1 == g2:
+            continue
+        winner = 1 if g1 > g2 else 2
+        totals[winner]['sets'] += 1
+        # A set won by a single game (7-6, or 9-8 in a pro set) went to a tie-break
+        if abs(g1 - g2) == 1 and max(g1, g2) >= 7:
+            totals[winner]['tiebreaks'] += 1
+
+    if match.is_super_tiebreak and match.super_tiebreak_score1 != match.super_tiebreak_score2:
+        winner = 1 if match.super_tiebreak_score1 > match.super_tiebreak_score2 else 2
+        totals[winner]['sets'] += 1
+        totals[winner]['tiebreaks'] += 1
+    return totals
+
+
+def _countable(name):
+    return isinstance(name, str) and name.strip() not in DEFAULT_NAMES
+
+
+class StatsBook:
+    """Aggregated records with sorted leaderboard indexes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._records = {kind: {} for kind in KINDS}
+        # kind -> metric -> sorted list of (-value, name)
+        self._indexes = {kind: {metric: [] for metric in LEADERBOARD_METRICS} for kind in KINDS}
+        self._recorded_matches = set()
+
+    def _record(self, kind, name):
+        record = self._records[kind].get(name)
+        if record is None:
+            record = Record(name)
+            self._records[kind][name] = record
+            for metric, index in self._indexes[kind].items():
+                insort(index, (0, name))
+        return record
+
+    def _apply(self, kind, name, won, mine, theirs):
+        record = self._record(kind, name)
+        old_values = {metric: getattr(record, metric) for metric in LEADERBOARD_METRICS}
+
+        record.matches_played += 1
+        if won:
+            record.wins += 1
+        else:
+            record.losses += 1
+        record.sets_won += mine['sets']
+        record.sets_lost += theirs['sets']
+        record.games_won += mine['games']
+        record.games_lost += theirs['games']
+        record.tiebreaks_won += mine['tiebreaks']
+        record.tiebreaks_lost += theirs['tiebreaks']
+
+        for metric, old_value in old_values.items():
+            new_value = getattr(record, metric)
+            if new_value == old_value:
+                continue
+            index = self._indexes[kind][metric]
+            del index[bisect_left(index, (-old_value, name))]
+            insort(index, (-new_value, name))
+
+    def record_match(self, match):
+        """Add a finished match to the aggregates; returns False if skipped"""
+        if not match.is_match_finished or match.winning_team not in (1, 2):
+            return False
+
+        totals = summarize_match(match)
+        sides = {
+            1: (match.team1_name, (match.team1_player1, match.team1_player2)),
+            2: (match.team2_name, (match.team2_player1, match.team2_player2)),
+        }
+
+        with self._lock:
+            if match.match_id in self._recorded_matches:
+                return False
+            self._recorded_matches.add(match.match_id)
+
+            for team in (1, 2):
+                other = 2 if team == 1 else 1
+                won = match.winning_team == team
+                team_name, players = sides[team]
+                if _countable(team_name):
+                    self._apply('team', team_name, won, totals[team], totals[other])
+                for player in set(players):
+                    if _countable(player):
+                        self._apply('player', player, won, totals[team], totals[other])
+        return True
+
+    def retain_matches(self, live_match_ids):
+        """Forget recorded matches not in `live_match_ids`; returns how many were forgotten"""
+        with self._lock:
+            before = len(self._recorded_matches)
+            self._recorded_matches = {match_id for match_id in self._recorded_matches if match_id in live_match_ids}
+            return before - len(self._recorded_matches)
+
+    def get_record(self, kind, name):
+        """Return the record for a player or team as a dict, or None"""
+        with self._lock:
+            record = self._records.get(kind, {}).get(name)
+            return record.to_dict() if record else None
+
+    def leaderboard(self, kind='player', metric='wins', limit=10):
+        """Top `limit` records for a metric, highest first"""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown kind: {kind}")
+        if metric not in LEADERBOARD_METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        with self._lock:
+            top = self._indexes[kind][metric][:max(limit, 0)]
+            return [self._records[kind][name].to_dict() for _, name in top]
+
+    def clear(self):
+        with self._lock:
+            self._reset()
@@ -0,0 +1,92 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as server  # noqa: E402
+
+# Tests run background jobs by hand instead of on a green thread
+server.start_scheduler = lambda: None
+
+
+@pytest.fixture
+def app_module():
+    """The server module with all in-memory state cleared"""
+    server.active_matches.clear()
+    server.match_codes.clear()
+    server.code_allocator.clear()
+    server.tv_sessions.clear()
+    server.provisioned_courts.clear()
+    server.match_stats.clear()
+    server.latency_tracker.clear()
+    server.frame_outbox.clear()
+    for limiter in (server.ip_limiter, server.tv_update_limiter, server.tv_link_limiter, server.session_limiter):
+        limiter.clear()
+    server.loop_lag.clear()
+    server.scheduler.started_at = server.scheduler.last_tick = None
+    yield server
+    server.active_matches.clear()
+    server.match_codes.clear()
+    server.tv_sessions.clear()
+    server.provisioned_courts.clear()
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def tv_id(app_module, client):
+    """A fresh, unlinked TV session"""
+    response = client.get('/tv')
+    assert response.status_code == 200
+    return next(reversed(app_module.tv_sessions))
+
+
+@pytest.fixture
+def linked_tv(client, tv_id):
+    """A TV session linked to a new best-of-3 match"""
+    response = client.post('/api/link-tv', json={
+        'tv_id': tv_id,
+        'match_data': {
+            'team1_name': 'Lions',
+            'team2_name': 'Tigers',
+            'team1_player1': 'Ana',
+            'team1_player2': 'Bea',
+            'team2_player1': 'Cy',
+            'team2_player2': 'Di',
+            'best_of_sets': 3
+        }
+    })
+    assert response.status_code == 200
+    return tv_id
+
+
+@pytest.fixture
+def tv_socket(app_module, linked_tv):
+    """A Socket.IO test client joined to the linked TV's room"""
+    socket = app_module.socketio.test_client(app_module.app)
+    socket.emit('join', {'tv_id': linked_tv})
+    socket.get_received()
+    yield socket
+    if socket.is_connected():
+        socket.disconnect()
+
+
+@pytest.fixture
+def live_server(app_module, monkeypatch):
+    """Base URL of the app served over real HTTP from a background thread"""
+    from werkzeug.serving import make_server
+
+    # Plain threads serve here, not an eventlet hub, so blocking calls run in place
+    monkeypatch.setattr(app_module, 'run_blocking', lambda func, *args, **kwargs: func(*args, **kwargs))
+    http_server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{http_server.server_port}'
+    http_server.shutdown()
+    thread.join()
@@ -0,0 +1,49 @@
+"""Helpers for tests that run servers as separate local processes"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start(args, port, env=None, ready_path='/healthz'):
+    """Run a server script (app.py, relay.py) on a port; returns (process, base URL) once it answers"""
+    process = subprocess.Popen([sys.executable] + list(args), cwd=HERE,
+                               env=dict(os.environ, PORT=str(port), **(env or {})),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(base_url + ready_path, timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{args} did not start')
+
+
+def stop(*processes):
+    for process in processes:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def wait_for(condition, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
@@ -0,0 +1,354 @@
+import io
+import zipfile
+from datetime import datetime, timedelta
+
+
+def test_match_defaults(app_module):
+    match = app_module.Match('m1', 'A', 'B', best_of_sets=3)
+    assert match.team1_set_games == {1: 0, 2: 0, 3: 0}
+    assert match.get_team1_set_games(2) == 0
+    assert match.get_team2_set_games(9) == 0
+    assert match.current_set == 1
+    assert not match.is_match_finished
+    assert not match.is_super_tiebreak
+
+
+def test_convert_tennis_score(app_module):
+    convert = app_module.convert_tennis_score
+    assert [convert(p) for p in range(6)] == ['0', '15', '30', '40', 'AD', '5']
+    assert convert('2') == '30'
+    assert convert(None) == 'None'
+    assert convert('AD') == 'AD'
+
+
+def test_tv_setup_creates_session(app_module, client):
+    response = client.get('/tv')
+    assert response.status_code == 200
+    assert len(app_module.tv_sessions) == 1
+    tv_id, session = next(iter(app_module.tv_sessions.items()))
+    assert tv_id.encode() in response.data
+    assert session['linked_match_id'] is None
+    assert session['qr_code']
+
+
+def test_tv_display_pages(client, tv_id, linked_tv):
+    assert b'Invalid TV session' in client.get('/tv/not-a-tv').data
+    response = client.get(f'/tv/{linked_tv}')
+    assert response.status_code == 200
+    assert b'Lions' in response.data
+
+
+def test_link_tv(app_module, client, tv_id):
+    response = client.post('/api/link-tv', json={'tv_id': tv_id, 'match_data': {'team1_name': 'X'}})
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data['success'] and data['tv_id'] == tv_id
+    match = app_module.active_matches[data['match_id']]
+    assert match.team1_name == 'X'
+    assert match.best_of_sets == 3
+    assert app_module.match_codes[data['code']] == data['match_id']
+    assert app_module.tv_sessions[tv_id]['linked_match_id'] == data['match_id']
+
+
+def test_link_tv_rejects_unknown_tv(client):
+    response = client.post('/api/link-tv', json={'tv_id': 'nope'})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_update_match_emits_snapshot(app_module, client, linked_tv, tv_socket):
+    response = client.post('/api/update-match', json={
+        'tv_id': linked_tv,
+        'team1_game_score': 3,
+        'team2_game_score': 1,
+        'set1_games': [4, 2],
+        'client_timestamp': 1.7e12
+    })
+    assert response.get_json() == {'success': True}
+
+    packets = [p for p in tv_socket.get_received() if p['name'] == 'match_update']
+    assert len(packets) == 1
+    snapshot = packets[0]['args'][0]
+    assert snapshot['team1_game_score'] == '40'
+    assert snapshot['team2_game_score'] == '15'
+    assert snapshot['team1_set1_games'] == 4
+    assert snapshot['team2_set1_games'] == 2
+    assert 0.5 < snapshot['team1_win_probability'] < 1.0
+    assert snapshot['trace']['client_ts'] == 1.7e12
+
+
+def test_update_match_errors(client, tv_id):
+    assert client.post('/api/update-match', json={'tv_id': 'nope'}).status_code == 400
+    assert client.post('/api/update-match', json={'tv_id': tv_id}).status_code == 400
+    assert client.post('/api/update-match/batch', json={'updates': []}).status_code == 400
+    results = client.post('/api/update-match/batch', json={'updates': [{'tv_id': tv_id}, 'junk']}).get_json()['results']
+    assert [result['status'] for result in results] == [400, 400]
+
+
+def test_update_match_drops_stale_and_duplicate_seq(client, linked_tv):
+    def update(seq, points):
+        return client.post('/api/update-match', json={'tv_id': linked_tv, 'seq': seq, 'team1_game_score': points})
+
+    assert update(10, 2).get_json() == {'success': True, 'applied': True, 'seq': 10}
+    assert update(10, 2).get_json()['reason'] == 'duplicate'
+    stale = update(9, 1).get_json()
+    assert stale['applied'] is False and stale['reason'] == 'stale' and stale['last_seq'] == 10
+    status = client.get(f'/api/match-status/{linked_tv}').get_json()['match']
+    assert status['team1_game_score'] == '30'
+    assert update('11', 3).status_code == 400
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'padelcast_match_updates_total{result="stale"} 1' in body
+    assert 'padelcast_match_updates_total{result="duplicate"} 1' in body
+
+
+def test_writers_with_skewed_clocks_keep_their_own_seq(app_module, client, linked_tv):
+    def update(client_id, seq, points):
+        return client.post('/api/update-match', json={
+            'tv_id': linked_tv, 'client_id': client_id, 'seq': seq, 'team1_game_score': points}).get_json()
+
+    # The referee's clock runs an hour ahead of the scorer's
+    ahead = 1_700_003_600_000_000
+    behind = 1_700_000_000_000_000
+    assert update('referee', ahead, 1)['applied'] is True
+    assert update('scorer', behind, 2)['applied'] is True
+    assert update('scorer', behind + 1, 3)['applied'] is True
+    stale = update('referee', ahead - 1, 0)
+    assert stale['reason'] == 'stale' and stale['last_seq'] == ahead
+    match = client.get(f'/api/match-status/{linked_tv}').get_json()['match']
+    assert match['team1_game_score'] == '40' and match['version'] == 3
+
+    assert client.post('/api/update-match', json={'tv_id': linked_tv, 'client_id': 7, 'seq': 1}).status_code == 400
+
+    # Only the most recent writers are remembered
+    for n in range(app_module.MAX_WRITERS_PER_MATCH):
+        update(f'device-{n}', 1, 2)
+    match_id = app_module.tv_sessions[linked_tv]['linked_match_id']
+    writers = app_module.active_matches[match_id].writer_seqs
+    assert len(writers) == app_module.MAX_WRITERS_PER_MATCH and 'referee' not in writers
+
+
+def test_update_match_super_tiebreak_and_finish(app_module, client, linked_tv):
+    client.post('/api/update-match', json={
+        'tv_id': linked_tv,
+        'set1_games': [6, 4],
+        'set2_games': [3, 6],
+        'current_set': 3,
+        'super_tiebreak_score': [10, 8],
+        'is_match_finished': True,
+        'winning_team': 1
+    })
+    status = client.get(f'/api/match-status/{linked_tv}').get_json()['match']
+    assert status['is_super_tiebreak'] is True
+    assert status['super_tiebreak_score1'] == 10
+    assert status['team1_win_probability'] == 1.0
+    assert app_module.match_stats.get_record('team', 'Lions')['wins'] == 1
+
+
+def test_match_status(client, tv_id, linked_tv):
+    assert client.get('/api/match-status/nope').status_code == 400
+    data = client.get(f'/api/match-status/{linked_tv}').get_json()
+    assert data['success']
+    assert data['match']['team1_name'] == 'Lions'
+    assert data['match']['total_sets_displayed'] == 3
+
+
+def test_reset_tv(app_module, client, linked_tv):
+    match_id = app_module.tv_sessions[linked_tv]['linked_match_id']
+    data = client.post(f'/api/reset-tv/{linked_tv}').get_json()
+    assert data['success']
+    new_tv_id = data['new_tv_id']
+    assert linked_tv not in app_module.tv_sessions
+    assert app_module.tv_sessions[new_tv_id]['linked_match_id'] is None
+    assert match_id not in app_module.active_matches
+    assert match_id not in app_module.match_codes.values()
+    assert client.post('/api/reset-tv/nope').status_code == 400
+
+
+def test_sweep_old_sessions(app_module, client, linked_tv):
+    client.get('/tv')
+    assert app_module.sweep_old_sessions() == (0, 0)
+
+    old = datetime.now() - timedelta(hours=25)
+    for match in app_module.active_matches.values():
+        match.created_at = old
+    app_module.tv_sessions[linked_tv]['created_at'] = old
+
+    assert app_module.sweep_old_sessions() == (1, 1)
+    assert not app_module.active_matches
+    assert not app_module.match_codes
+    assert len(app_module.tv_sessions) == 1
+
+
+def test_render_ack_records_latency(app_module, client, linked_tv, tv_socket):
+    client.post('/api/update-match', json={'tv_id': linked_tv, 'client_timestamp': 1.7e12})
+    trace = tv_socket.get_received()[-1]['args'][0]['trace']
+    tv_socket.emit('render_ack', {'tv_id': linked_tv, 'trace': trace, 'rendered_ts': trace['server_emitted_ts'] + 20})
+    tv_socket.emit('render_ack', 'garbage')
+
+    venue = client.get('/api/latency').get_json()['latency']['PADELCAST CHAMPIONSHIP']
+    assert venue['delivery']['count'] == 1
+    assert venue['delivery']['p50_ms'] == 25
+    assert {'ingest', 'apply', 'emit', 'total'} <= set(venue)
+
+
+def test_stats_endpoints(client, linked_tv):
+    client.post('/api/update-match', json={
+        'tv_id': linked_tv, 'set1_games': [7, 6], 'set2_games': [6, 1],
+        'is_match_finished': True, 'winning_team': 2
+    })
+    leaders = client.get('/api/stats/leaderboard?kind=team&metric=wins').get_json()['leaders']
+    assert leaders[0]['name'] == 'Tigers'
+    assert client.get('/api/stats/player/Ana').get_json()['record']['losses'] == 1
+    assert client.get('/api/stats/player/Nobody').status_code == 404
+    assert client.get('/api/stats/leaderboard?metric=bogus').status_code == 400
+
+
+def test_metrics_endpoint(client, linked_tv, tv_socket):
+    client.post('/api/update-match', json={'tv_id': linked_tv})
+    response = client.get('/metrics')
+    assert response.content_type.startswith('text/plain')
+    body = response.get_data(as_text=True)
+    assert 'padelcast_active_matches 1' in body
+    assert 'padelcast_tv_rooms{sockets="1"} 1' in body
+    assert linked_tv not in body
+    assert 'route="/api/update-match"' in body
+    assert 'padelcast_socketio_emit_duration_seconds_count{event="match_update"}' in body
+
+
+def test_admin_endpoints_require_token(client, monkeypatch):
+    monkeypatch.delenv('PADELCAST_ADMIN_TOKEN', raising=False)
+    assert client.get('/admin/profiler/status').status_code == 403
+
+    monkeypatch.setenv('PADELCAST_ADMIN_TOKEN', 'secret')
+    assert client.get('/admin/profiler/status', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    response = client.get('/admin/profiler/status', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert response.get_json()['sample']['running'] is False
+
+
+def test_provision_tvs(app_module, client, monkeypatch):
+    monkeypatch.setenv('PADELCAST_ADMIN_TOKEN', 'secret')
+    admin = {'X-Admin-Token': 'secret'}
+    assert client.post('/admin/tvs/provision', json={'count': 2}).status_code == 403
+    assert client.post('/admin/tvs/provision', json={'count': 0}, headers=admin).status_code == 400
+
+    data = client.post('/admin/tvs/provision', json={'count': 3, 'venue': 'Club'}, headers=admin).get_json()
+    tv_ids = [tv['tv_id'] for tv in data['tvs']]
+    assert [tv['court_number'] for tv in data['tvs']] == ['1', '2', '3']
+    assert all(app_module.tv_sessions[tv_id]['provisioned'] for tv_id in tv_ids)
+
+    # Re-provisioning reuses the sessions, so printed sheets stay valid
+    sheet = client.post('/admin/tvs/provision', json={'count': 3, 'venue': 'Club', 'output': 'html'}, headers=admin)
+    assert sheet.data.count(b'<svg ') == 3 and tv_ids[0].encode() in sheet.data
+    archive = client.post('/admin/tvs/provision', json={'count': 3, 'venue': 'Club', 'output': 'zip'}, headers=admin)
+    assert zipfile.ZipFile(io.BytesIO(archive.data)).namelist() == [
+        'court-1.svg', 'court-2.svg', 'court-3.svg', 'manifest.json']
+
+    claim = client.get('/tv/court/2?venue=Club')
+    assert claim.status_code == 302 and claim.headers['Location'].endswith(f'/tv/{tv_ids[1]}')
+    assert f'/qr/{tv_ids[1]}.png'.encode() in client.get(f'/tv/{tv_ids[1]}').data
+    assert client.get('/tv/court/2').status_code == 404
+
+    # Provisioned TVs keep their ID across resets and survive the sweep
+    assert client.post(f'/api/reset-tv/{tv_ids[0]}').get_json()['new_tv_id'] == tv_ids[0]
+    app_module.tv_sessions[tv_ids[0]]['created_at'] = datetime.now() - timedelta(days=7)
+    assert app_module.sweep_old_sessions() == (0, 0)
+
+    # Until they are deprovisioned
+    client.post('/api/link-tv', json={'tv_id': tv_ids[1]})
+    assert client.post('/admin/tvs/deprovision', json={'venue': 'Club', 'courts': 1}, headers=admin).status_code == 400
+    retired = client.post('/admin/tvs/deprovision', json={'venue': 'Club', 'courts': [1, 2]}, headers=admin)
+    assert retired.get_json()['deprovisioned'] == ['1', '2']
+    assert set(app_module.tv_sessions) == {tv_ids[2]} and not app_module.match_codes
+    assert client.get('/tv/court/2?venue=Club').status_code == 404
+    client.post('/admin/tvs/deprovision', json={'venue': 'Club'}, headers=admin)
+    assert not app_module.tv_sessions and not app_module.provisioned_courts
+
+    # In asyncio mode, views must not wait seconds for a sheet
+    monkeypatch.setattr(app_module, 'qr_wait_inline', False)
+    assert client.post('/admin/tvs/provision', json={'count': 3, 'venue': 'Club'}, headers=admin).status_code == 501
+
+
+def test_health_endpoints_do_not_create_sessions(app_module, client, linked_tv):
+    assert client.get('/healthz').get_json()['status'] == 'ok'
+    data = client.get('/readyz').get_json()
+    assert data['status'] == 'ready'
+    assert (data['tv_sessions'], data['active_matches'], data['match_codes']) == (1, 1, 1)
+    assert data['background_jobs']['expire_sessions']['interval_s'] == 3600
+    assert len(app_module.tv_sessions) == 1
+
+    # Not ready once the event loop stops getting round to background jobs
+    app_module.scheduler.last_tick = app_module.scheduler.clock() - 60
+    assert client.get('/readyz').status_code == 503
+
+
+def test_slow_tv_only_gets_latest_frame(app_module, client, linked_tv, tv_socket):
+    for points in range(1, 5):
+        client.post('/api/update-match', json={'tv_id': linked_tv, 'team1_game_score': points})
+    frames = [p['args'][0] for p in tv_socket.get_received() if p['name'] == 'match_update']
+    assert [frame['team1_game_score'] for frame in frames] == ['15', '30']
+    assert app_module.frame_outbox.pending == 1
+
+    tv_socket.emit('render_ack', {'tv_id': linked_tv})
+    frames = [p['args'][0] for p in tv_socket.get_received() if p['name'] == 'match_update']
+    assert [frame['team1_game_score'] for frame in frames] == ['AD']
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'padelcast_socketio_dropped_frames_total{reason="superseded"} 1' in body
+    assert 'padelcast_socketio_pending_frames 0' in body
+
+
+def test_write_endpoints_are_rate_limited(app_module, client, linked_tv, monkeypatch):
+    statuses = [client.post('/api/update-match', json={'tv_id': linked_tv}).status_code for _ in range(21)]
+    assert statuses == [200] * 20 + [429]
+    response = client.post('/api/update-match', json={'tv_id': linked_tv})
+    assert int(response.headers['Retry-After']) >= 1
+
+    # The fixture already linked this TV once
+    statuses = [client.post('/api/link-tv', json={'tv_id': linked_tv}).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+
+    monkeypatch.setattr(app_module, 'ip_limiter', app_module.TokenBucketLimiter(rate=1, burst=1))
+    assert client.post('/api/reset-tv/nope').status_code == 400
+    assert client.post('/api/reset-tv/nope').status_code == 429
+    assert 'padelcast_rejected_requests_total{reason="client"} 1' in client.get('/metrics').get_data(as_text=True)
+
+
+def test_writes_are_shed_while_loop_lags(app_module, client, linked_tv):
+    app_module.loop_lag.lag = 2.5
+    response = client.post('/api/update-match', data='not even json')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
+    assert client.get('/healthz').status_code == 200
+    assert client.get(f'/api/match-status/{linked_tv}').status_code == 200
+
+
+def test_tv_session_creation_is_rate_limited(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, 'session_limiter', app_module.TokenBucketLimiter(rate=0.5, burst=2))
+    assert [client.get('/tv').status_code for _ in range(3)] == [200, 200, 429]
+    response = client.get('/')
+    assert response.headers['Retry-After'] == '2'
+    assert b'http-equiv="refresh" content="2"' in response.data
+    assert len(app_module.tv_sessions) == 2
+
+
+def test_forwarded_for_is_only_trusted_behind_configured_proxies(app_module, client, linked_tv, monkeypatch):
+    monkeypatch.setattr(app_module, 'ip_limiter', app_module.TokenBucketLimiter(rate=0.1, burst=1))
+    post = lambda address: client.post('/api/reset-tv/nope', headers={'X-Forwarded-For': address}).status_code
+    # No proxy configured: a made-up X-Forwarded-For does not buy a fresh limit
+    assert [post('10.0.0.1'), post('10.0.0.2')] == [400, 429]
+
+    # Behind one proxy, the address it appended is the client
+    monkeypatch.setattr(app_module.app, 'wsgi_app', app_module.ProxyFix(app_module.app.wsgi_app, x_for=1))
+    assert [post('1.2.3.4, 10.0.0.3'), post('10.0.0.4'), post('1.2.3.4, 10.0.0.4')] == [400, 400, 429]
+
+
+def test_socket_join_and_disconnect(app_module, linked_tv):
+    socket = app_module.socketio.test_client(app_module.app)
+    socket.emit('join', {'tv_id': linked_tv})
+    assert app_module._room_socket_counts()[(linked_tv,)] == 1
+    socket.emit('leave', {'tv_id': linked_tv})
+    assert (linked_tv,) not in app_module._room_socket_counts()
+    socket.emit('join', {'tv_id': linked_tv})
+    socket.disconnect()
+    assert (linked_tv,) not in app_module._room_socket_counts()
@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+
+
+@pytest.fixture
+def asgi(app_module):
+    """asgi_app, with the app.py hooks it installs restored after the test"""
+    original = dict(vars(app_module))
+    import asgi_app
+    for name, value in asgi_app.FLASK_HOOKS.items():
+        setattr(app_module, name, value)
+    yield asgi_app
+    for name in asgi_app.FLASK_HOOKS:
+        setattr(app_module, name, original[name])
+
+
+def call(asgi_module, method, path, body=None):
+    """Send one HTTP request through the ASGI app and return (status, body)"""
+    payload = json.dumps(body).encode() if body is not None else b''
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 1234), 'scheme': 'http', 'http_version': '1.1',
+    }
+    messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await asgi_module.app(scope, receive, send)
+        await asyncio.sleep(0)  # let scheduled emits run
+
+    asyncio.run(run())
+    return sent[0]['status'], b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def test_routes_have_same_semantics(asgi, app_module, monkeypatch):
+    emitted = []
+
+    async def fake_emit(event, data, room=None, skip_sid=None):
+        emitted.append((event, room, data, skip_sid))
+
+    monkeypatch.setattr(asgi.sio, 'emit', fake_emit)
+
+    status, html = call(asgi, 'GET', '/tv')
+    assert status == 200
+    tv_id = next(reversed(app_module.tv_sessions))
+    assert tv_id.encode() in html
+    # The QR code renders off the loop and is pushed to the TV's room
+    assert b'qrPlaceholder' in html
+    assert emitted[0][:2] == ('qr_ready', tv_id)
+    assert emitted[0][2]['qr_code'] == app_module.tv_sessions[tv_id]['qr_code']
+    emitted.clear()
+
+    status, body = call(asgi, 'POST', '/api/link-tv', {'tv_id': tv_id, 'match_data': {'team1_name': 'Lions'}})
+    assert status == 200 and json.loads(body)['success']
+
+    # Match updates go to the TV's room through the frame outbox, in one emit
+    asgi.sio.manager.basic_enter_room('tv-sid', '/', tv_id, eio_sid='tv-eio')
+    try:
+        status, body = call(asgi, 'POST', '/api/update-match', {'tv_id': tv_id, 'team1_game_score': 2})
+    finally:
+        asgi.sio.manager.basic_leave_room('tv-sid', '/', tv_id)
+    assert status == 200
+    assert emitted[0][:2] == ('match_update', tv_id) and emitted[0][3] is None
+    assert emitted[0][2]['team1_game_score'] == '30'
+
+    status, body = call(asgi, 'GET', f'/api/match-status/{tv_id}')
+    assert json.loads(body)['match']['team1_name'] == 'Lions'
+
+    assert call(asgi, 'GET', '/api/match-status/nope')[0] == 400
+    assert call(asgi, 'GET', '/api/stats/leaderboard?metric=bogus')[0] == 400
+
+
+def test_qr_ready_reaches_a_socket_that_joins_after_the_render(asgi, app_module, monkeypatch):
+    emitted = []
+
+    async def fake_emit(event, data, room=None, skip_sid=None, to=None):
+        emitted.append((event, to or room, data))
+
+    async def fake_enter_room(sid, room, namespace=None):
+        pass
+
+    monkeypatch.setattr(asgi.sio, 'emit', fake_emit)
+    monkeypatch.setattr(asgi.sio, 'enter_room', fake_enter_room)
+
+    # The room push goes out while the page is still loading
+    status, html = call(asgi, 'GET', '/tv')
+    tv_id = next(reversed(app_module.tv_sessions))
+    assert b'qrPlaceholder' in html and emitted[0][:2] == ('qr_ready', tv_id)
+    emitted.clear()
+
+    asyncio.run(asgi.on_join('late-sid', {'tv_id': tv_id}))
+    assert emitted == [('qr_ready', 'late-sid', {'tv_id': tv_id, 'qr_code': app_module.tv_sessions[tv_id]['qr_code']})]
+    app_module.frame_outbox.forget('late-sid')
+
+    # Once a match is linked, the scoreboard page's socket gets no QR
+    app_module.tv_sessions[tv_id]['linked_match_id'] = 'ABC123'
+    emitted.clear()
+    asyncio.run(asgi.on_join('board-sid', {'tv_id': tv_id}))
+    assert emitted == []
+    app_module.frame_outbox.forget('board-sid')
@@ -0,0 +1,125 @@
+import asyncio
+
+from async_cloud_api import AsyncPadelCastCloudAPI
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_async_client_round_trip(app_module, live_server, tv_id):
+    async def scenario():
+        async with AsyncPadelCastCloudAPI(live_server, max_concurrency=4) as api:
+            assert (await api.get_server_info())['status'] == 'online'
+            linked = await api.link_tv(tv_id, {'team1_name': 'Lions'})
+            assert linked['success']
+            results = await asyncio.gather(*(api.update_match(None, {'tv_id': tv_id, 'team1_game_score': n})
+                                             for n in range(8)))
+            assert all(result['success'] for result in results)
+            status = await api.get_match_status(tv_id)
+            assert status['data']['match']['team1_name'] == 'Lions'
+            reset = await api.reset_tv(tv_id)
+            return reset['data']['new_tv_id']
+
+    assert run(scenario()) in app_module.tv_sessions
+
+
+def test_updates_are_batched_in_order(app_module, live_server, client, tv_id, monkeypatch):
+    client.post('/api/link-tv', json={'tv_id': tv_id, 'match_data': {}})
+    applied = []
+    original = app_module.apply_match_update
+
+    def record(data, received_ms):
+        applied.append(data.get('team1_game_score'))
+        return original(data, received_ms)
+
+    monkeypatch.setattr(app_module, 'apply_match_update', record)
+
+    async def scenario():
+        async with AsyncPadelCastCloudAPI(live_server, batch_window=0.05, max_batch=4) as api:
+            results = await asyncio.gather(*(api.update_match(None, {'tv_id': tv_id, 'team1_game_score': n})
+                                             for n in range(10)))
+            # A failed update inside a batch fails on its own
+            batch = await asyncio.gather(api.update_match(None, {'tv_id': tv_id}), api.update_match(None, {'tv_id': 'nope'}))
+            return results, batch[1]
+
+    results, bad = run(scenario())
+    assert all(result['success'] for result in results)
+    assert not bad['success'] and bad['error'] == 'Invalid TV ID'
+    assert applied[:10] == list(range(10))
+
+
+def test_batching_falls_back_without_batch_endpoint(live_server, client, tv_id):
+    client.post('/api/link-tv', json={'tv_id': tv_id, 'match_data': {}})
+
+    async def scenario():
+        async with AsyncPadelCastCloudAPI(live_server, batch_window=0.01) as api:
+            original = api._request
+
+            async def no_batch_endpoint(method, path, body=None, failure='Server error', base_url=None):
+                if path == '/api/update-match/batch':
+                    return {'success': False, 'error': f'{failure}: 404', 'status': 404}
+                return await original(method, path, body, failure, base_url)
+
+            api._request = no_batch_endpoint
+            results = await asyncio.gather(*(api.update_match(None, {'tv_id': tv_id}) for _ in range(3)))
+            return api.batch_supported, results
+
+    supported, results = run(scenario())
+    assert not supported
+    assert all(result['success'] for result in results)
+
+
+def test_batched_updates_for_another_node_are_resent_there(app_module, live_server, client, monkeypatch):
+    tv_ids = []
+    for _ in range(2):
+        client.get('/tv')
+        tv_ids.append(next(reversed(app_module.tv_sessions)))
+        client.post('/api/link-tv', json={'tv_id': tv_ids[-1], 'match_data': {}})
+    moved, original = {tv_ids[1]}, app_module.apply_match_update
+
+    def first_node(data, received_ms):
+        # The node the batch went to no longer serves the second TV; live_server stands in for its owner
+        if data.get('tv_id') in moved:
+            moved.discard(data['tv_id'])
+            return {'success': False, 'error': 'TV is served by another node', 'node': live_server}, 421
+        return original(data, received_ms)
+
+    monkeypatch.setattr(app_module, 'apply_match_update', first_node)
+
+    async def scenario():
+        async with AsyncPadelCastCloudAPI(live_server, batch_window=0.05) as api:
+            return await asyncio.gather(*(api.update_match(None, {'tv_id': tv_id, 'team1_game_score': 1})
+                                          for tv_id in tv_ids))
+
+    results = run(scenario())
+    assert all(result['success'] for result in results)
+    assert 'node' not in results[1]
+    for tv_id in tv_ids:
+        assert client.get(f'/api/match-status/{tv_id}').get_json()['match']['team1_game_score'] == '15'
+
+
+def test_unreachable_server_reports_network_error():
+    async def scenario():
+        async with AsyncPadelCastCloudAPI('http://127.0.0.1:9', connect_timeout=0.5) as api:
+            return await api.update_match('ABC123', {'tv_id': 'x'})
+
+    assert run(scenario())['error'].startswith('Network error')
+
+
+def test_batched_updates_fail_when_the_send_raises(live_server, client, tv_id):
+    client.post('/api/link-tv', json={'tv_id': tv_id, 'match_data': {}})
+
+    async def scenario():
+        async with AsyncPadelCastCloudAPI(live_server, batch_window=0.01) as api:
+            async def broken(payloads, base_url=None):
+                raise ValueError('bad batch response')
+
+            api._post_batch = broken
+            results = await asyncio.wait_for(asyncio.gather(
+                *(api.update_match(None, {'tv_id': tv_id}) for _ in range(3)), return_exceptions=True), 5)
+            return results, api.batch_supported
+
+    results, supported = run(scenario())
+    assert [type(result) for result in results] == [ValueError] * 3
+    assert supported  # an error is not a missing batch endpoint
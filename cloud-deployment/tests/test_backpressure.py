@@ -0,0 +1,104 @@
+from collections import Counter
+
+from backpressure import FrameOutbox
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_outbox(**kwargs):
+    emits = []
+    drops = Counter()
+    outbox = FrameOutbox(lambda event, data, to, skip: emits.append((to, list(skip), data)),
+                         on_drop=lambda reason: drops.update([reason]), **kwargs)
+    return outbox, emits, drops
+
+
+def received(emits, sid, room_sids):
+    """Frames a sid got, from room emits and ones sent to it alone"""
+    return [data for to, skip, data in emits if to == sid or (to in room_sids and sid in room_sids[to] and sid not in skip)]
+
+
+def test_stalled_socket_keeps_only_latest_frame_per_room():
+    outbox, emits, drops = make_outbox(max_in_flight=1)
+    rooms = {'court-1': ['fast', 'slow']}
+    for score in range(5):
+        outbox.publish('match_update', score, 'court-1', rooms['court-1'])
+        outbox.ack('fast')
+
+    assert received(emits, 'fast', rooms) == [0, 1, 2, 3, 4]
+    assert received(emits, 'slow', rooms) == [0]
+    assert outbox.pending == 1 and outbox.stalled == 1
+    assert drops == {'superseded': 3}
+
+    outbox.ack('slow')
+    assert emits[-1] == ('slow', [], 4)
+    assert outbox.pending == 0
+
+
+def test_frame_is_emitted_once_per_room_while_nobody_is_behind():
+    outbox, emits, _ = make_outbox(max_in_flight=2)
+    outbox.publish('match_update', 1, 'court-1', ['a', 'b', 'c'])
+    outbox.publish('match_update', 2, 'court-1', ['a', 'b', 'c'])
+    assert emits == [('court-1', [], 1), ('court-1', [], 2)]
+
+    for sid in ('a', 'b'):
+        outbox.ack(sid)
+    outbox.publish('match_update', 3, 'court-1', ['a', 'b', 'c'])
+    assert emits[-1] == ('court-1', ['c'], 3)
+
+
+def test_credits_expire_for_sockets_that_never_acknowledge():
+    clock = FakeClock()
+    outbox, emits, _ = make_outbox(max_in_flight=2, ack_timeout=5.0, clock=clock)
+    rooms = {'court-1': ['tv']}
+    for score in range(4):
+        outbox.publish('match_update', score, 'court-1', ['tv'])
+    assert received(emits, 'tv', rooms) == [0, 1]
+    assert outbox.expire() == 0
+
+    # The held frame goes out once the timeout passes, without a new publish
+    clock.now = 5.0
+    assert outbox.expire() == 1
+    assert received(emits, 'tv', rooms) == [0, 1, 3]
+
+    clock.now = 10.0
+    outbox.publish('match_update', 4, 'court-1', ['tv'])
+    assert received(emits, 'tv', rooms)[-1] == 4
+
+
+def test_pending_rooms_are_bounded_and_dropped_on_disconnect():
+    outbox, emits, drops = make_outbox(max_in_flight=1, max_pending=2)
+    for room in ('a', 'b', 'c', 'd'):
+        outbox.publish('match_update', room, room, ['tv'])
+    assert outbox.pending == 2
+    assert drops == {'overflow': 1}
+
+    outbox.forget('tv')
+    assert outbox.pending == 0
+    assert drops == {'overflow': 1, 'disconnected': 2}
+    outbox.ack('tv')  # late ack for a forgotten socket
+    assert emits == [('a', [], 'a')]
+
+
+def test_socket_in_many_rooms_keeps_the_latest_frame_of_each():
+    # A venue relay follows every court of its venue on one connection
+    outbox, emits, drops = make_outbox(max_in_flight=1, max_pending=2)
+    rooms = [f'court-{n}' for n in range(6)]
+    for room in rooms:
+        outbox.joined('relay', room)
+    for score in range(2):
+        for room in rooms:
+            outbox.publish('match_update', (room, score), room, ['relay'])
+    assert outbox.pending == 6 and 'overflow' not in drops
+
+    outbox.left('relay', 'court-5')
+    while outbox.pending:
+        outbox.ack('relay')
+    assert [data for _, _, data in emits] == [('court-0', 0)] + [(room, 1) for room in rooms[:5]]
+    assert drops['left'] == 1
@@ -0,0 +1,50 @@
+from cloud_api import PadelCastCloudAPI
+
+
+def test_session_is_pooled_and_retries_only_idempotent_calls():
+    with PadelCastCloudAPI('http://example.invalid', pool_size=4, connect_timeout=1, read_timeout=2) as api:
+        adapter = api.session.get_adapter('https://example.invalid')
+        assert adapter._pool_maxsize == 4
+        assert api.timeout == (1, 2)
+        retry = adapter.max_retries
+        assert retry.is_retry('GET', 503) and not retry.is_retry('POST', 503)
+
+
+def test_unreachable_server_reports_offline():
+    with PadelCastCloudAPI('http://127.0.0.1:9', retries=0, connect_timeout=0.5) as api:
+        info = api.get_server_info()
+        assert not info['success'] and info['status'] == 'offline'
+        assert not api.update_match('ABC123', {'tv_id': 'x'})['success']
+
+
+def test_client_round_trip(app_module, live_server, tv_id):
+    with PadelCastCloudAPI(live_server) as api:
+        assert api.get_server_info()['status'] == 'online'
+        assert api.link_tv(tv_id, {'team1_name': 'Lions'})['success']
+        result = api.update_match(None, {'tv_id': tv_id, 'team1_game_score': 1})
+        assert result['success'] and result['data']['applied']
+        assert api._next_seq() > result['data']['seq']
+        assert api.get_match_status(tv_id)['data']['match']['team1_game_score'] == '15'
+
+        # A reused dict is not changed and gets a new seq each time
+        update = {'tv_id': tv_id, 'team1_game_score': 2}
+        assert api.update_match(None, update)['data']['applied']
+        assert api.update_match(None, update)['data']['applied']
+        assert update == {'tv_id': tv_id, 'team1_game_score': 2}
+        assert api.reset_tv(tv_id)['data']['new_tv_id'] in app_module.tv_sessions
+
+
+def test_update_refused_with_421_follows_the_node(app_module, live_server, linked_tv, monkeypatch):
+    original = app_module.apply_match_update
+    calls = []
+
+    def moved_once(data, received_ms):
+        calls.append(data['tv_id'])
+        if len(calls) == 1:
+            return {'success': False, 'error': 'TV is served by another node', 'node': live_server}, 421
+        return original(data, received_ms)
+
+    monkeypatch.setattr(app_module, 'apply_match_update', moved_once)
+    with PadelCastCloudAPI(live_server) as api:
+        assert api.update_match(None, {'tv_id': linked_tv, 'team1_game_score': 1})['success']
+    assert calls == [linked_tv, linked_tv]
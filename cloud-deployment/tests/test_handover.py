@@ -0,0 +1,88 @@
+import re
+import threading
+
+import requests
+import socketio
+
+from servers import free_port, start, stop, wait_for
+
+
+def test_hot_restart_keeps_state_and_loses_no_updates(tmp_path):
+    port = free_port()
+    env = {'PADELCAST_HANDOVER_SOCKET': str(tmp_path / 'handover.sock'), 'RATE_LIMITING': 'off',
+           'HANDOVER_DRAIN_SECONDS': '0.2'}
+    old, url = start(['app.py'], port, env=env)
+    new = None
+    screen = socketio.Client(reconnection_delay=0.1, reconnection_delay_max=0.5)
+    stop_writing = threading.Event()
+    acknowledged = []
+    try:
+        tv_id = re.search(r"let tvId = '([0-9a-f-]+)'", requests.get(url + '/tv').text).group(1)
+        requests.post(url + '/api/link-tv', json={'tv_id': tv_id, 'match_data': {'team1_name': 'Lions'}})
+
+        received = []
+        screen.on('connect', lambda: screen.emit('join', {'tv_id': tv_id}))
+
+        def on_update(data):
+            received.append(data['team1_set1_games'])
+            screen.emit('render_ack', {'tv_id': tv_id})
+
+        screen.on('match_update', on_update)
+        screen.connect(url)
+
+        def score():
+            # A scoring phone: each game is retried until the server confirms it
+            http = requests.Session()
+            games = 0
+            while not stop_writing.is_set():
+                games += 1
+                while True:
+                    try:
+                        response = http.post(url + '/api/update-match', timeout=5, json={
+                            'tv_id': tv_id, 'seq': games, 'set1_games': [games, 0]})
+                        if response.status_code == 200:
+                            break
+                        assert response.status_code == 503
+                    except requests.ConnectionError:
+                        pass
+                acknowledged.append(games)
+
+        writer = threading.Thread(target=score)
+        writer.start()
+        assert wait_for(lambda: len(acknowledged) >= 20)
+
+        new, _ = start(['app.py', '--takeover'], port, env=env)
+        old.wait(timeout=15)
+        takeover = requests.get(url + '/readyz').json()['takeover']
+        assert takeover['tvs'] == 1 and takeover['from_pid'] == old.pid
+        assert 0 < takeover['requests_paused_ms'] < takeover['total_ms'] + 1000
+
+        # The TV reconnected to the new process and keeps getting scores
+        handed_over_at = len(acknowledged)
+        assert wait_for(lambda: received and received[-1] > handed_over_at + 10)
+        stop_writing.set()
+        writer.join()
+
+        match = requests.get(f'{url}/api/match-status/{tv_id}').json()['match']
+        assert match['team1_name'] == 'Lions'
+        assert match['team1_set1_games'] == acknowledged[-1] == len(acknowledged)
+    finally:
+        stop_writing.set()
+        screen.disconnect()
+        stop(*[process for process in (old, new) if process and process.poll() is None])
+
+
+def test_imported_match_codes_are_not_issued_again(app_module, client, linked_tv):
+    state = app_module.export_state()
+    imported_code = next(iter(state['match_codes']))
+    app_module.active_matches.clear()
+    app_module.match_codes.clear()
+    app_module.tv_sessions.clear()
+    app_module.code_allocator.clear()  # a fresh process
+
+    assert app_module.import_state(state) == 1
+    client.get('/tv')
+    new_tv = next(reversed(app_module.tv_sessions))
+    code = client.post('/api/link-tv', json={'tv_id': new_tv}).get_json()['code']
+    assert code != imported_code
+    assert app_module.match_codes[imported_code] == app_module.tv_sessions[linked_tv]['linked_match_id']
@@ -0,0 +1,98 @@
+import time
+
+from cloud_api import PadelCastCloudAPI
+from outbox import Outbox
+
+
+def test_latest_update_per_key_wins_and_persists(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    outbox = Outbox(path)
+    outbox.put('court-1', {'score': 1})
+    outbox.put('court-2', {'score': 1})
+    outbox.put('court-1', {'score': 2})
+    outbox.close()
+
+    outbox = Outbox(path)
+    entries = outbox.pending()
+    assert [(key, payload) for _, key, payload in entries] == [('court-2', {'score': 1}), ('court-1', {'score': 2})]
+
+    # Acking a payload that has since been replaced keeps the newer one
+    outbox.put('court-2', {'score': 3})
+    outbox.ack(entries[0][0])
+    assert [payload for _, _, payload in outbox.pending()] == [{'score': 2}, {'score': 3}]
+
+
+def test_outage_replays_one_request_per_court(app_module, live_server, client, tmp_path, monkeypatch):
+    tv_ids = []
+    for _ in range(3):
+        client.get('/tv')
+        tv_id = next(reversed(app_module.tv_sessions))
+        client.post('/api/link-tv', json={'tv_id': tv_id, 'match_data': {}})
+        tv_ids.append(tv_id)
+
+    applied = []
+    original = app_module.apply_match_update
+    monkeypatch.setattr(app_module, 'apply_match_update',
+                        lambda data, received_ms: applied.append(data['tv_id']) or original(data, received_ms))
+
+    api = PadelCastCloudAPI('http://127.0.0.1:9', retries=0, connect_timeout=0.5,
+                            outbox_path=str(tmp_path / 'outbox.db'))
+    for point in range(60):
+        result = api.update_match(None, {'tv_id': tv_ids[point % 3], 'team1_game_score': point // 3 % 4})
+        assert result['queued'] and not result['success']
+    assert len(api.outbox) == 3
+
+    api.base_url = live_server  # connectivity is back
+    assert api.flush_outbox() == 3
+    assert sorted(applied) == sorted(tv_ids)
+    assert len(api.outbox) == 0
+    status = client.get(f'/api/match-status/{tv_ids[2]}').get_json()
+    assert status['match']['team1_game_score'] == '40'  # the last queued point: 59 // 3 % 4 == 3
+
+    assert api.update_match(None, {'tv_id': tv_ids[0]})['success']
+    api.close()
+
+
+def test_queued_updates_are_not_overtaken(app_module, live_server, linked_tv, tmp_path):
+    api = PadelCastCloudAPI(live_server, outbox_path=str(tmp_path / 'outbox.db'))
+    api.outbox.put(linked_tv, {'tv_id': linked_tv, 'team1_game_score': 1})
+    result = api.update_match(None, {'tv_id': linked_tv, 'team1_game_score': 2})
+    assert result['success'] and len(api.outbox) == 0
+    match = app_module.active_matches[app_module.tv_sessions[linked_tv]['linked_match_id']]
+    assert match.team1_game_score == 2
+    api.close()
+
+
+def test_rate_limited_updates_are_queued_until_retry_after(app_module, live_server, linked_tv, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'tv_update_limiter', app_module.TokenBucketLimiter(rate=0.5, burst=1))
+    api = PadelCastCloudAPI(live_server, outbox_path=str(tmp_path / 'outbox.db'))
+    assert api.update_match(None, {'tv_id': linked_tv, 'team1_game_score': 1})['success']
+    result = api.update_match(None, {'tv_id': linked_tv, 'team1_game_score': 2})
+    assert result['queued'] and result['retry_after'] == 2
+    assert len(api.outbox) == 1
+
+    # Nothing is sent before Retry-After has passed
+    assert api.flush_outbox() == 0 and len(api.outbox) == 1
+    api._retry_at = 0.0
+    app_module.tv_update_limiter.clear()
+    assert api.flush_outbox() == 1
+    match = app_module.active_matches[app_module.tv_sessions[linked_tv]['linked_match_id']]
+    assert match.team1_game_score == 2
+    api.close()
+
+
+def test_queued_update_is_flushed_in_the_background(app_module, live_server, linked_tv, tmp_path):
+    api = PadelCastCloudAPI('http://127.0.0.1:9', retries=0, connect_timeout=0.5,
+                            outbox_path=str(tmp_path / 'outbox.db'), flush_interval=0.05)
+    assert api.update_match(None, {'tv_id': linked_tv, 'team1_game_score': 3})['queued']
+
+    api.base_url = live_server  # connectivity is back; no further update is sent
+    deadline = time.monotonic() + 10
+    while len(api.outbox) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert len(api.outbox) == 0
+    match = app_module.active_matches[app_module.tv_sessions[linked_tv]['linked_match_id']]
+    assert match.team1_game_score == 3
+
+    api.close()
+    assert not api._flusher.is_alive()
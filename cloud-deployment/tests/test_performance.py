@@ -0,0 +1,65 @@
+"""
+Micro-benchmarks with generous thresholds; they catch order-of-magnitude
+regressions (an accidental O(n) scan or a QR render on the update path),
+not small drifts. Use benchmark.py for detailed numbers.
+"""
+
+import json
+import time
+
+# Mean per-call budgets in milliseconds
+UPDATE_BUDGET_MS = 5.0
+SNAPSHOT_BUDGET_MS = 0.25
+WIN_PROBABILITY_BUDGET_MS = 0.05
+HEALTH_CHECK_BUDGET_MS = 2.0  # one /healthz plus one /readyz
+
+
+def mean_ms(func, iterations):
+    func()  # warm caches
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) * 1000.0 / iterations
+
+
+def test_update_match_cost(app_module, client, linked_tv, tv_socket, monkeypatch, capsys):
+    monkeypatch.setattr(app_module, 'rate_limiting', False)
+    # Many other matches in memory must not slow down a single update
+    for i in range(500):
+        app_module.active_matches[f'filler-{i}'] = app_module.Match(f'filler-{i}', 'A', 'B', 3)
+    payload = {'tv_id': linked_tv, 'team1_game_score': 2, 'set1_games': [3, 2]}
+
+    def update():
+        assert client.post('/api/update-match', json=payload).status_code == 200
+
+    elapsed = mean_ms(update, 200)
+    tv_socket.get_received()
+    assert elapsed < UPDATE_BUDGET_MS, f'update_match took {elapsed:.3f}ms'
+
+
+def test_snapshot_serialization_cost(app_module, linked_tv):
+    match = app_module.active_matches[app_module.tv_sessions[linked_tv]['linked_match_id']]
+    elapsed = mean_ms(lambda: json.dumps(app_module.build_match_snapshot(match)), 2000)
+    assert elapsed < SNAPSHOT_BUDGET_MS, f'snapshot took {elapsed:.4f}ms'
+
+
+def test_win_probability_cost(app_module):
+    from win_probability import win_probability
+
+    match = app_module.Match('m', 'A', 'B', 3)
+    match.team1_set_games[1] = 4
+    match.team1_game_score = 2
+    elapsed = mean_ms(lambda: win_probability(match), 5000)
+    assert elapsed < WIN_PROBABILITY_BUDGET_MS, f'win probability took {elapsed:.4f}ms'
+
+
+def test_health_check_traffic_is_cheap_and_stateless(app_module, client, linked_tv):
+    sessions = len(app_module.tv_sessions)
+
+    def check():
+        assert client.get('/healthz').status_code == 200
+        assert client.get('/readyz').status_code == 200
+
+    elapsed = mean_ms(check, 1000)
+    assert len(app_module.tv_sessions) == sessions
+    assert elapsed < HEALTH_CHECK_BUDGET_MS, f'health checks took {elapsed:.3f}ms'
@@ -0,0 +1,121 @@
+import base64
+import json
+import time
+
+import pytest
+
+from qr_render import QRQueueFull, QRRenderPool, render_qr_png, render_qr_png_base64, render_qr_svg
+
+
+def test_render_returns_base64_png():
+    png = base64.b64decode(render_qr_png_base64('{"tv_id": "abc"}'))
+    assert png.startswith(b'\x89PNG\r\n\x1a\n')
+
+
+def test_svg_is_a_single_path_without_pillow():
+    svg = render_qr_svg('{"tv_id": "abc"}').decode()
+    assert svg.startswith('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 ')
+    assert svg.count('<path ') == 1
+    assert len(svg) < len(render_qr_png_base64('{"tv_id": "abc"}')) * 4
+
+
+def test_pool_renders_caches_and_reports_duration():
+    durations = []
+    pool = QRRenderPool(max_workers=1, max_pending=2, on_render=lambda seconds, fmt: durations.append(fmt))
+    assert pool.render('hello') == render_qr_png('hello')
+    assert pool.render('hello') == render_qr_png('hello')
+    assert pool.render('hello', 'svg') == render_qr_svg('hello')
+    assert durations == ['png', 'svg']
+    assert pool.pending == 0
+    assert len(pool.cache) == 2
+
+
+def test_full_pool_raises_instead_of_queueing():
+    pool = QRRenderPool(max_workers=1, max_pending=1)
+    pool._slots.acquire()  # one render already in flight
+    with pytest.raises(QRQueueFull):
+        pool.render('hello')
+    pool._slots.release()
+    assert pool.render('hello')
+    pool._slots.acquire()
+    assert pool.render('hello')  # cache hits need no slot
+
+
+def test_saturated_pool_serves_placeholder_then_pushes_qr(app_module, client, monkeypatch):
+    pool = QRRenderPool(max_workers=1, max_pending=1)
+    pool._slots.acquire()
+    background = []
+    monkeypatch.setattr(app_module, 'qr_pool', pool)
+    monkeypatch.setattr(app_module, 'start_background_task', lambda target, *args: background.append((target, args)))
+
+    response = client.get('/tv')
+    tv_id = next(reversed(app_module.tv_sessions))
+    assert b'qrPlaceholder' in response.data
+    assert app_module.tv_sessions[tv_id]['qr_pending']
+
+    socket = app_module.socketio.test_client(app_module.app)
+    socket.emit('join', {'tv_id': tv_id})
+    pool._slots.release()
+    target, args = background.pop()
+    target(*args)
+
+    tv_session = app_module.tv_sessions[tv_id]
+    assert not tv_session['qr_pending']
+    assert tv_session['qr_code'] == render_qr_png_base64(json.dumps(tv_session['qr_data']))
+    events = [packet for packet in socket.get_received() if packet['name'] == 'qr_ready']
+    assert events[0]['args'][0] == {'tv_id': tv_id, 'qr_code': tv_session['qr_code']}
+    assert b'qrPlaceholder' not in client.get(f'/tv/{tv_id}').data
+    socket.disconnect()
+
+
+def test_qr_endpoint_serves_cached_svg_with_etag(client, tv_id):
+    response = client.get(f'/qr/{tv_id}.svg')
+    assert response.status_code == 200
+    assert response.content_type == 'image/svg+xml'
+    assert response.headers['Cache-Control'] == 'private, max-age=86400'
+    assert client.get(f'/qr/{tv_id}.svg', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    png = client.get(f'/qr/{tv_id}.png')
+    assert png.content_type == 'image/png' and png.data.startswith(b'\x89PNG')
+    assert client.get('/qr/nope.svg').status_code == 404
+    assert client.get(f'/qr/{tv_id}.gif').status_code == 404
+
+
+def test_qr_endpoint_does_not_wait_for_a_render_when_views_must_not_block(app_module, client, tv_id, monkeypatch):
+    tasks = []
+    monkeypatch.setattr(app_module, 'qr_wait_inline', False)
+    monkeypatch.setattr(app_module, 'start_background_task', lambda target, *args: tasks.append((target, args)))
+    response = client.get(f'/qr/{tv_id}.svg')
+    assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+
+    for target, args in tasks:
+        target(*args)
+    assert client.get(f'/qr/{tv_id}.svg').status_code == 200
+
+
+def test_svg_mode_links_image_instead_of_embedding(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, 'qr_image_format', 'svg')
+    response = client.get('/tv')
+    tv_id = next(reversed(app_module.tv_sessions))
+    assert f'src="/qr/{tv_id}.svg"'.encode() in response.data
+    assert b'base64' not in response.data
+    assert app_module.tv_sessions[tv_id]['qr_code'] is None
+
+
+def test_server_render_leaves_unpatched_eventlet_hub_free(app_module, monkeypatch):
+    # `python app.py` serves on eventlet without monkey patching threading
+    import eventlet
+    import qr_render
+
+    monkeypatch.setitem(qr_render.RENDERERS, 'png', lambda text: time.sleep(0.3) or b'png')
+    render = eventlet.spawn(app_module.qr_pool.render, 'slow', 'png', True)
+    ticks = []
+
+    def ticker():
+        for _ in range(5):
+            ticks.append(render.dead)
+            eventlet.sleep(0.01)
+
+    eventlet.spawn(ticker).wait()
+    assert ticks == [False] * 5  # other greenlets ran while the render was in flight
+    assert render.wait() == b'png'
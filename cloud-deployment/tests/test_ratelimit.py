@@ -0,0 +1,42 @@
+from ratelimit import LoopLagMonitor, TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_refills_at_rate():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=2, burst=3, clock=clock)
+    assert [limiter.take('tv') for _ in range(3)] == [0, 0, 0]
+    assert limiter.take('tv') == 0.5
+    assert limiter.take('other') == 0
+
+    clock.now = 0.5
+    assert limiter.take('tv') == 0
+    assert limiter.take('tv') > 0
+
+
+def test_state_is_bounded_to_recent_keys():
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2, clock=FakeClock())
+    limiter.take('a')
+    limiter.take('b')
+    limiter.take('a')  # refreshes 'a', so 'b' is the one forgotten
+    limiter.take('c')
+    assert len(limiter) == 2
+    assert limiter.take('a') > 0
+    assert limiter.take('b') == 0
+
+
+def test_lag_rises_at_once_and_decays():
+    monitor = LoopLagMonitor(decay=0.5)
+    monitor.record(0.0)
+    assert monitor.lag == 0
+    monitor.record(1.0)
+    assert monitor.lag == 1.0
+    monitor.record(0.0)
+    assert monitor.lag == 0.5
@@ -0,0 +1,138 @@
+import re
+import threading
+
+import pytest
+import requests
+import socketio
+
+from servers import free_port, start, stop, wait_for
+
+
+def start_cloud(port):
+    return start(['app.py'], port)
+
+
+def test_relay_fans_out_and_survives_cloud_restart():
+    cloud_port = free_port()
+    cloud, cloud_url = start_cloud(cloud_port)
+    relay, relay_url = start(['relay.py', '--upstream', cloud_url], free_port())
+    screens = []
+    try:
+        assert wait_for(lambda: requests.get(relay_url + '/readyz').status_code == 200)
+
+        # TV setup goes through the relay; the phone links on the cloud
+        tv_id = re.search(r"let tvId = '([0-9a-f-]+)'", requests.get(relay_url + '/tv').text).group(1)
+        requests.post(cloud_url + '/api/link-tv', json={'tv_id': tv_id, 'match_data': {'team1_name': 'Lions'}})
+        assert 'Lions' in requests.get(f'{relay_url}/tv/{tv_id}').text
+
+        received = []
+        lock = threading.Lock()
+        for _ in range(3):
+            screen = socketio.Client()
+
+            def on_update(data, screen=screen):
+                with lock:
+                    received.append(data['team1_game_score'])
+                screen.emit('render_ack', {'tv_id': tv_id})
+
+            screen.on('match_update', on_update)
+            screen.connect(relay_url)
+            screen.emit('join', {'tv_id': tv_id})
+            screens.append(screen)
+
+        requests.post(cloud_url + '/api/update-match', json={'tv_id': tv_id, 'team1_game_score': 1})
+        assert wait_for(lambda: received.count('15') == 3)
+        match = requests.get(f'{relay_url}/api/match-status/{tv_id}').json()['match']
+        assert match['team1_game_score'] == '15' and match['team1_name'] == 'Lions'
+        # Three screens, one socket on the cloud
+        assert 'padelcast_connected_sockets 1' in requests.get(cloud_url + '/metrics').text
+
+        # Cloud down: screens keep the cached scoreboard and page
+        stop(cloud)
+        assert wait_for(lambda: requests.get(relay_url + '/readyz').status_code == 503)
+        assert requests.get(f'{relay_url}/api/match-status/{tv_id}').json()['match']['team1_game_score'] == '15'
+        assert 'Lions' in requests.get(f'{relay_url}/tv/{tv_id}').text
+        assert requests.get(relay_url + '/tv').status_code == 502
+
+        # Cloud back (with fresh state): the relay reconnects and resyncs its TVs
+        cloud, _ = start_cloud(cloud_port)
+        assert wait_for(lambda: requests.get(relay_url + '/readyz').status_code == 200)
+        assert wait_for(lambda: requests.get(f'{relay_url}/api/match-status/{tv_id}').status_code == 400)
+    finally:
+        for screen in screens:
+            screen.disconnect()
+        stop(relay, cloud)
+
+
+class FakeUpstream:
+    """Stands in for a socketio.Client connected to a cloud node"""
+
+    def __init__(self, **kwargs):
+        self.handlers = {}
+        self.emitted = []
+        self.connected = True
+        self.url = None
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def emit(self, event, data):
+        self.emitted.append((event, data))
+
+    def connect(self, url, wait_timeout=None):
+        self.url = url
+        self.handlers['connect']()
+
+    def disconnect(self):
+        self.connected = False
+
+    def start_background_task(self, target, *args):
+        pass
+
+
+@pytest.fixture
+def relay_module(monkeypatch):
+    import relay
+    monkeypatch.setattr(relay.socketio_client, 'Client', FakeUpstream)
+    return relay
+
+
+def test_relay_follows_a_tv_redirected_to_another_node(relay_module):
+    relay = relay_module.Relay('http://cloud-a', lambda tv_id, snapshot: None, lambda tv_id: False)
+    relay.subscribe('tv-1')
+    relay.subscribe('tv-2')
+    upstream = relay.client
+    assert upstream.emitted == [('join', {'tv_id': 'tv-1'}), ('join', {'tv_id': 'tv-2'})]
+
+    upstream.handlers['redirect']({'tv_id': 'tv-1', 'url': 'http://cloud-b/tv/tv-1'})
+    assert wait_for(lambda: 'http://cloud-b' in relay._node_clients
+                    and relay._node_clients['http://cloud-b'].emitted == [('join', {'tv_id': 'tv-1'})])
+    node = relay._node_clients['http://cloud-b']
+    assert node.url == 'http://cloud-b' and upstream.emitted[-1] == ('leave', {'tv_id': 'tv-1'})
+
+    # Frames are acknowledged on the connection they came in on
+    node.handlers['match_update']({'tv_id': 'tv-1'})
+    assert node.emitted[-1] == ('render_ack', {'tv_id': 'tv-1'})
+
+    # The node's connection is closed once it serves no followed TV
+    relay._subscriptions['tv-1'] = 0
+    assert relay.prune(max_idle=1) == 1
+    assert not node.connected and relay._node_clients == {}
+
+
+def test_relay_forwards_qr_ready_to_local_screens(relay_module, monkeypatch):
+    forwarded = []
+    relay = relay_module.Relay('http://cloud-a', lambda tv_id, snapshot: None, lambda tv_id: False,
+                               forward=lambda event, data, tv_id: forwarded.append((event, data, tv_id)))
+    relay.subscribe('tv-1')
+    qr_ready = {'tv_id': 'tv-1', 'qr_code': 'iVBOR'}
+    relay.client.handlers['qr_ready'](qr_ready)
+    relay.client.handlers['qr_ready']({'tv_id': 'tv-9', 'qr_code': 'iVBOR'})  # not followed here
+    assert forwarded == [('qr_ready', qr_ready, 'tv-1')]
+
+    # A screen that joins after the push still gets the QR code
+    monkeypatch.setattr(relay_module, 'relay', relay)
+    screen = relay_module.socketio.test_client(relay_module.app)
+    screen.emit('join', {'tv_id': 'tv-1'})
+    assert [(message['name'], message['args'][0]) for message in screen.get_received()] == [('qr_ready', qr_ready)]
+    screen.disconnect()
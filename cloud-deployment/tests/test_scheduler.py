@@ -0,0 +1,74 @@
+import pytest
+
+from scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(**kwargs):
+    clock = FakeClock()
+    events = []
+    scheduler = Scheduler(clock=clock, on_run=lambda seconds, name: events.append(('run', name)),
+                          on_overrun=lambda name: events.append(('overrun', name)),
+                          on_failure=lambda name: events.append(('failure', name)), **kwargs)
+    return scheduler, clock, events
+
+
+def test_periodic_and_one_shot_jobs_run_when_due():
+    scheduler, clock, events = make_scheduler()
+    scheduler.every('sweep', 10, lambda: None, jitter=0)
+    scheduler.after('once', 5, lambda: None)
+    assert scheduler.run_pending() == 0.1  # sleeps at most one tick
+
+    clock.now = 5
+    scheduler.run_pending()
+    clock.now = 10
+    scheduler.run_pending()
+    clock.now = 20
+    scheduler.run_pending()
+    assert events == [('run', 'once'), ('run', 'sweep'), ('run', 'sweep')]
+    assert 'once' not in scheduler.jobs
+    assert scheduler.status()['sweep']['runs'] == 2
+
+
+def test_overruns_skip_missed_runs_and_failures_are_contained():
+    scheduler, clock, events = make_scheduler()
+
+    def slow():
+        clock.now += 25
+
+    scheduler.every('slow', 10, slow, jitter=0)
+    scheduler.every('broken', 10, lambda: 1 / 0, jitter=0)
+    clock.now = 10
+    scheduler.run_pending()
+    # 'broken' was starved by 'slow' past its next run, which also counts as an overrun
+    assert events == [('run', 'slow'), ('overrun', 'slow'),
+                      ('failure', 'broken'), ('run', 'broken'), ('overrun', 'broken')]
+    assert scheduler.jobs['slow'].next_run == 45
+
+
+def test_jitter_delays_within_fraction_of_interval():
+    scheduler, clock, _ = make_scheduler()
+    scheduler.every('sweep', 100, lambda: None, jitter=0.1)
+    clock.now = 100
+    scheduler.run_pending()
+    assert 200 <= scheduler.jobs['sweep'].next_run <= 210
+
+
+def test_lag_reported_and_stall_detected():
+    lags = []
+    scheduler, clock, _ = make_scheduler(on_lag=lags.append, stall_after=30)
+    assert not scheduler.alive()
+    scheduler.started_at = 0
+    scheduler.woke(0.1, 0.35)
+    assert lags == [pytest.approx(0.25)]
+    clock.now = 29
+    assert scheduler.alive()
+    clock.now = 31
+    assert not scheduler.alive()
@@ -0,0 +1,206 @@
+import random
+import re
+import uuid
+from collections import Counter
+
+import pytest
+import requests
+import socketio
+
+from servers import free_port, start, stop, wait_for
+from sharding import HashRing, tv_key, venue_key
+
+NODES = ['http://node-a', 'http://node-b', 'http://node-c', 'http://node-d']
+_rng = random.Random(0)
+KEYS = [tv_key(str(uuid.UUID(int=_rng.getrandbits(128)))) for _ in range(20000)]
+
+
+def test_ring_spreads_keys_evenly():
+    ring = HashRing(NODES)
+    counts = Counter(ring.owner(key) for key in KEYS)
+    assert set(counts) == set(NODES)
+    assert max(counts.values()) < 1.25 * len(KEYS) / len(NODES)
+    assert HashRing(reversed(NODES)).owner(KEYS[0]) == ring.owner(KEYS[0])
+    assert HashRing().owner(KEYS[0]) is None
+
+
+def test_adding_or_removing_a_node_moves_only_its_share():
+    ring = HashRing(NODES)
+    grown = HashRing(NODES + ['http://node-e'])
+    moved = [key for key in KEYS if ring.owner(key) != grown.owner(key)]
+    # Only keys taken over by the new node move, about a fifth of them
+    assert {grown.owner(key) for key in moved} == {'http://node-e'}
+    assert 0.15 < len(moved) / len(KEYS) < 0.25
+
+    shrunk = HashRing(NODES[1:])
+    moved = [key for key in KEYS if ring.owner(key) != shrunk.owner(key)]
+    assert {ring.owner(key) for key in moved} == {NODES[0]}
+
+
+def test_minted_tv_ids_route_to_their_node_or_venue():
+    ring = HashRing(NODES)
+    for node in NODES:
+        assert ring.owner(tv_key(ring.mint_tv_id(node))) == node
+    courts = [ring.mint_tv_id(NODES[0], venue_key('Club')) for _ in range(5)]
+    assert len(set(courts)) == 5
+    assert {ring.owner(tv_key(tv_id)) for tv_id in courts} == {ring.owner(venue_key('Club'))}
+    uuid.UUID(courts[0])
+
+
+@pytest.fixture
+def two_nodes(app_module, monkeypatch):
+    """This node and one other on the ring"""
+    monkeypatch.setattr(app_module, 'node_url', 'http://here')
+    monkeypatch.setattr(app_module, 'hash_ring', HashRing(['http://here', 'http://there']))
+    return app_module
+
+
+def foreign_tv_id(ring):
+    return ring.mint_tv_id('http://there')
+
+
+def test_requests_for_another_nodes_tv_are_redirected(two_nodes, client):
+    tv_id = foreign_tv_id(two_nodes.hash_ring)
+    response = client.post('/api/update-match?x=1', json={'tv_id': tv_id, 'team1_game_score': 1})
+    assert response.status_code == 307
+    assert response.headers['Location'] == 'http://there/api/update-match?x=1'
+    assert client.get(f'/tv/{tv_id}').headers['Location'] == f'http://there/tv/{tv_id}'
+    assert client.get(f'/api/match-status/{tv_id}').headers['Access-Control-Allow-Origin'] == '*'
+
+    # New TVs are created with an ID this node owns
+    client.get('/tv')
+    local_tv = next(reversed(two_nodes.tv_sessions))
+    assert two_nodes.hash_ring.owner(tv_key(local_tv)) == 'http://here'
+
+
+def test_tv_held_here_is_served_until_handed_over(two_nodes, client, linked_tv):
+    two_nodes.hash_ring = HashRing(['http://there'])
+    assert client.post('/api/update-match', json={'tv_id': linked_tv, 'team1_game_score': 1}).status_code == 200
+
+    two_nodes.moving_tvs.add(linked_tv)
+    try:
+        response = client.post('/api/update-match', json={'tv_id': linked_tv, 'team1_game_score': 2})
+        assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+    finally:
+        two_nodes.moving_tvs.clear()
+
+
+def test_batch_spanning_nodes_is_split(two_nodes, client, linked_tv):
+    foreign = foreign_tv_id(two_nodes.hash_ring)
+    results = client.post('/api/update-match/batch', json={'updates': [
+        {'tv_id': linked_tv, 'team1_game_score': 1},
+        {'tv_id': foreign, 'team1_game_score': 1},
+    ]}).get_json()['results']
+    assert [result['status'] for result in results] == [200, 421]
+    assert results[1]['node'] == 'http://there'
+
+
+def test_socket_for_another_nodes_tv_is_redirected(two_nodes):
+    tv_id = foreign_tv_id(two_nodes.hash_ring)
+    socket = two_nodes.socketio.test_client(two_nodes.app)
+    socket.emit('join', {'tv_id': tv_id})
+    received = socket.get_received()
+    assert received[0]['name'] == 'redirect'
+    assert received[0]['args'][0]['url'] == f'http://there/tv/{tv_id}'
+    assert (tv_id,) not in two_nodes._room_socket_counts()
+
+
+def test_exported_tvs_import_with_score_and_code(app_module, client, linked_tv):
+    client.post('/api/update-match', json={'tv_id': linked_tv, 'seq': 5, 'team1_game_score': 2, 'set1_games': [3, 1]})
+    code = next(iter(app_module.match_codes))
+    state = app_module.export_tvs([linked_tv])
+    app_module.drop_tvs([linked_tv])
+    assert not app_module.tv_sessions and not app_module.active_matches and not app_module.match_codes
+    assert len(app_module.code_allocator) == 0
+
+    assert app_module.import_tvs(state) == 1
+    assert app_module.match_codes[code] in app_module.active_matches
+    assert len(app_module.code_allocator) == 1
+    match = client.get(f'/api/match-status/{linked_tv}').get_json()['match']
+    assert match['team1_game_score'] == '30' and match['team1_set1_games'] == 3 and match['seq'] == 5
+
+
+def test_imported_code_clashing_with_a_local_one_is_rekeyed(app_module, client, linked_tv):
+    state = app_module.export_tvs([linked_tv])
+    app_module.drop_tvs([linked_tv])
+    clashing_code = next(iter(state['match_codes']))
+    # A match of this node that got the same code from an overlapping worker range
+    app_module.match_codes[clashing_code] = 'local-match'
+
+    assert app_module.import_tvs(state) == 1
+    assert app_module.match_codes[clashing_code] == 'local-match'
+    imported_match = app_module.tv_sessions[linked_tv]['linked_match_id']
+    codes = [code for code, match_id in app_module.match_codes.items() if match_id == imported_match]
+    assert len(codes) == 1 and codes[0] != clashing_code
+
+
+def test_cluster_of_local_processes_rebalances_on_join():
+    token = 'test-token'
+    admin = {'X-Admin-Token': token}
+    ports = [free_port() for _ in range(3)]
+    urls = [f'http://127.0.0.1:{port}' for port in ports]
+
+    def start_node(index, nodes):
+        return start(['app.py'], ports[index], env={
+            'PADELCAST_NODE_URL': urls[index], 'PADELCAST_CLUSTER': ','.join(nodes),
+            'PADELCAST_ADMIN_TOKEN': token, 'PADELCAST_WORKER_ID': str(index),
+            'PADELCAST_WORKER_COUNT': '3', 'RATE_LIMITING': 'off'})[0]
+
+    processes = [start_node(0, urls[:2]), start_node(1, urls[:2])]
+    screen = socketio.Client()
+    try:
+        # TVs are set up on either node; phones may post to either node
+        tv_ids = []
+        for n in range(12):
+            page = requests.get(urls[n % 2] + '/tv').text
+            tv_ids.append(re.search(r"let tvId = '([0-9a-f-]+)'", page).group(1))
+        for n, tv_id in enumerate(tv_ids):
+            linked = requests.post(urls[(n + 1) % 2] + '/api/link-tv', json={'tv_id': tv_id})
+            assert linked.status_code == 200
+            assert requests.post(urls[n % 2] + '/api/update-match',
+                                 json={'tv_id': tv_id, 'team1_game_score': 1}).json()['success']
+
+        redirects = []
+        screen.on('redirect', redirects.append)
+        screen.connect(urls[1])
+        screen.emit('join', {'tv_id': tv_ids[0]})
+        assert wait_for(lambda: redirects)
+        assert redirects[0]['url'] == f'{urls[0]}/tv/{tv_ids[0]}'
+
+        # A third node joins: only the TVs it now owns move to it, with their scores
+        processes.append(start_node(2, urls))
+        before = {url: requests.get(url + '/admin/cluster', headers=admin).json()['tv_sessions'] for url in urls[:2]}
+        moved = 0
+        for url in urls[:2]:
+            response = requests.post(url + '/admin/cluster', json={'nodes': urls, 'version': 1}, headers=admin).json()
+            moved += sum(response['moving'].values())
+            assert set(response['moving']) <= {urls[2]}
+        ring = HashRing(urls)
+        owned_by_new_node = [tv_id for tv_id in tv_ids if ring.owner(tv_key(tv_id)) == urls[2]]
+        assert moved == len(owned_by_new_node)
+        # Handovers run in the background
+        cluster_state = lambda url: requests.get(url + '/admin/cluster', headers=admin).json()
+        assert wait_for(lambda: cluster_state(urls[2])['tv_sessions'] == moved)
+        assert wait_for(lambda: all(cluster_state(url)['moving_tvs'] == 0 for url in urls[:2]))
+        assert cluster_state(urls[2])['version'] == 1
+        assert sum(before.values()) == len(tv_ids)
+        assert sum(cluster_state(url)['tv_sessions'] for url in urls) == len(tv_ids)
+
+        for tv_id in tv_ids:
+            status = requests.get(f'{urls[0]}/api/match-status/{tv_id}')
+            assert status.json()['match']['team1_game_score'] == '15'
+            assert status.url.startswith(urls[2]) == (tv_id in owned_by_new_node)
+    finally:
+        screen.disconnect()
+        stop(*processes)
+
+
+def test_stats_endpoints_say_they_cover_one_node(two_nodes, client):
+    for path in ('/api/latency', '/api/stats/leaderboard', '/api/stats/player/Nobody'):
+        body = client.get(path).get_json()
+        assert body['node'] == 'http://here' and body['partial'] is True
+
+
+def test_stats_are_complete_on_a_single_node(client):
+    body = client.get('/api/stats/leaderboard').get_json()
+    assert body['node'] is None and body['partial'] is False
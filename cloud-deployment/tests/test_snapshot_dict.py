@@ -0,0 +1,25 @@
+from snapshot_dict import SnapshotDict
+
+
+def test_reads_see_a_consistent_snapshot_while_writers_change_it():
+    state = SnapshotDict({'a': 1, 'b': 2})
+    snapshot = state.snapshot()
+    seen = []
+    for key, value in state.items():
+        seen.append(key)
+        state[f'{key}-copy'] = value  # would raise on a plain dict
+        state.pop('b', None)
+    assert seen == ['a', 'b']
+    assert dict(snapshot) == {'a': 1, 'b': 2}
+    assert state == {'a': 1, 'a-copy': 1, 'b-copy': 2}
+
+
+def test_bulk_writes_and_dict_protocol():
+    state = SnapshotDict()
+    state.update({'a': 1, 'b': None, 'c': 3})
+    assert state.remove_many(['b', 'c', 'missing']) == 2
+    assert list(state) == ['a'] and next(reversed(state)) == 'a'
+    assert state.pop('a') == 1 and state.pop('a', 'gone') == 'gone'
+    state['x'] = 1
+    state.clear()
+    assert len(state) == 0 and not state
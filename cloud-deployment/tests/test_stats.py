@@ -0,0 +1,52 @@
+from app import Match
+from stats import StatsBook, summarize_match
+
+
+def finished_match(match_id, team1, team2, players, sets, winner):
+    match = Match(match_id, team1, team2, best_of_sets=3, team1_player1=players[0], team1_player2=players[1],
+                  team2_player1=players[2], team2_player2=players[3])
+    for set_num, (g1, g2) in enumerate(sets, start=1):
+        match.team1_set_games[set_num] = g1
+        match.team2_set_games[set_num] = g2
+    match.is_match_finished = True
+    match.winning_team = winner
+    return match
+
+
+def test_summarize_counts_tiebreaks():
+    match = finished_match('m', 'A', 'B', 'abcd', [(7, 6), (3, 6), (7, 5)], 1)
+    totals = summarize_match(match)
+    assert totals[1] == {'sets': 2, 'games': 17, 'tiebreaks': 1}
+    assert totals[2] == {'sets': 1, 'games': 17, 'tiebreaks': 0}
+
+
+def test_record_match_once_and_leaderboard_order():
+    book = StatsBook()
+    first = finished_match('m1', 'Lions', 'Tigers', ['Ana', 'Bea', 'Cy', 'Di'], [(6, 2), (6, 2)], 1)
+    assert book.record_match(first)
+    assert not book.record_match(first)
+    book.record_match(finished_match('m2', 'Lions', 'Bears', ['Ana', 'Eve', 'Fo', 'Gi'], [(6, 0), (6, 0)], 1))
+
+    assert [r['name'] for r in book.leaderboard('player', 'wins', 1)] == ['Ana']
+    assert [r['name'] for r in book.leaderboard('team', 'wins', 3)][0] == 'Lions'
+    assert book.get_record('team', 'Lions')['games_won'] == 24
+    assert book.get_record('player', 'Cy')['win_rate'] == 0.0
+
+
+def test_default_names_and_unfinished_matches_are_skipped():
+    book = StatsBook()
+    match = finished_match('m', 'Team 1', 'Team 2', ['Player 1', 'Player 2', 'Player 3', 'Player 4'], [(6, 0)], 2)
+    assert book.record_match(match)
+    assert book.leaderboard('player') == []
+    match.is_match_finished = False
+    match.match_id = 'other'
+    assert not book.record_match(match)
+
+
+def test_recorded_matches_are_forgotten_once_gone():
+    book = StatsBook()
+    for match_id in ('m1', 'm2'):
+        book.record_match(finished_match(match_id, 'Lions', 'Tigers', ['Ana', 'Bea', 'Cy', 'Di'], [(6, 2)], 1))
+    assert book.retain_matches({'m2': object()}) == 1
+    assert not book.record_match(finished_match('m2', 'Lions', 'Tigers', ['Ana', 'Bea', 'Cy', 'Di'], [(6, 2)], 1))
+    assert book.get_record('team', 'Lions')['wins'] == 2
@@ -0,0 +1,57 @@
+import pytest
+
+from app import Match
+from win_probability import game_win_probability, match_state, tiebreak_win_probability, win_probabilities, win_probability
+
+
+def make_match(**fields):
+    match = Match('m', 'A', 'B', best_of_sets=fields.pop('best_of_sets', 3),
+                  match_format=fields.pop('match_format', 'Best of 3 Sets'))
+    for set_num, (g1, g2) in fields.pop('sets', {}).items():
+        match.team1_set_games[set_num] = g1
+        match.team2_set_games[set_num] = g2
+    for name, value in fields.items():
+        setattr(match, name, value)
+    return match
+
+
+def test_even_start_is_fifty_fifty():
+    assert win_probability(make_match()) == pytest.approx(0.5)
+
+
+def test_game_probabilities():
+    assert game_win_probability(0, 0) == pytest.approx(0.5)
+    assert game_win_probability(3, 3) == pytest.approx(0.5)
+    assert game_win_probability(4, 3) == pytest.approx(0.75)
+    # Long deuce battles collapse onto the same state
+    assert game_win_probability(9, 8) == game_win_probability(4, 3)
+    assert game_win_probability(3, 0) > game_win_probability(2, 0)
+
+
+def test_tiebreak_and_finished_states():
+    assert tiebreak_win_probability(6, 6) == pytest.approx(0.5)
+    assert tiebreak_win_probability(9, 2, target=10) > 0.99
+    assert win_probability(make_match(is_match_finished=True, winning_team=2)) == 0.0
+
+
+def test_leading_team_is_favoured():
+    leading = make_match(sets={1: (6, 3), 2: (5, 0)}, current_set=2, team1_game_score=3)
+    assert win_probability(leading) > 0.99
+    trailing = make_match(sets={1: (3, 6)}, current_set=2)
+    assert win_probability(trailing) < 0.5
+
+
+def test_tennis_display_scores_are_accepted():
+    assert match_state(make_match(team1_game_score='40', team2_game_score='15')) == \
+        match_state(make_match(team1_game_score=3, team2_game_score=1))
+
+
+def test_super_tiebreak_state():
+    match = make_match(sets={1: (6, 4), 2: (4, 6)}, current_set=3, is_super_tiebreak=True,
+                       super_tiebreak_score1=5, super_tiebreak_score2=5)
+    assert win_probability(match) == pytest.approx(0.5)
+
+
+def test_batch_matches_single_calls():
+    matches = [make_match(team1_game_score=i % 4, sets={1: (i % 6, 2)}) for i in range(50)]
+    assert win_probabilities(matches) == [win_probability(m) for m in matches]
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Synthetic tournament traffic for capacity planning and benchmarks.
+
+Simulates whole tournaments point by point: several courts, a mix of match
+formats, realistic point rates with changeovers and set breaks, super
+tie-breaks, TV page reloads and QR relinks between matches. The event
+stream is deterministic for a given seed and can be replayed against an
+in-process test client or a live server at any speed.
+
+Usage:
+    python tournament_traffic.py --courts 8 --seed 1 --dump events.jsonl
+    RATE_LIMITING=off python app.py &
+    python tournament_traffic.py --courts 8 --seed 1 --url http://localhost:8080 --speed 20
+
+A replay sends every court's traffic from one address, which the server's
+per-client limits throttle at high speeds, so start it with RATE_LIMITING=off
+as above. Requests refused with 429 anyway are counted as `rate_limited`,
+not as errors.
+"""
+
+import argparse
+import heapq
+import json
+import random
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from win_probability import set_format
+
+# (match_format, best_of_sets, weight)
+MATCH_FORMATS = (
+    ('Best of 3 Sets', 3, 0.60),
+    ('Best of 3 Sets - Super Tie-break', 3, 0.25),
+    ('Pro Set', 1, 0.10),
+    ('Best of 5 Sets', 5, 0.05),
+)
+
+# Timings in seconds
+POINT_INTERVAL_MEAN = 35.0
+POINT_INTERVAL_STDDEV = 8.0
+CHANGEOVER = 90.0
+SET_BREAK = 120.0
+WARMUP_RANGE = (300.0, 600.0)
+TV_RELOADS_PER_HOUR = 3.0
+
+TV_ID_PATTERN = re.compile(r"let tvId = '([0-9a-fA-F-]+)'")
+
+
+class MatchSimulator:
+    """Point-by-point padel match with advantage scoring"""
+
+    def __init__(self, rng, match_format, best_of_sets, point_probability=0.5):
+        self.rng = rng
+        self.match_format = match_format
+        self.best_of_sets = best_of_sets
+        self.sets_to_win = best_of_sets // 2 + 1
+        self.games_to_win, self.tiebreak_at = set_format(match_format)
+        self.super_decider = 'super' in match_format.lower()
+        self.point_probability = point_probability
+
+        self.points = [0, 0]
+        self.set_games = {i: [0, 0] for i in range(1, best_of_sets + 1)}
+        self.current_set = 1
+        self.sets_won = [0, 0]
+        self.is_super_tiebreak = False
+        self.super_tiebreak_score = [0, 0]
+        self.is_match_finished = False
+        self.winning_team = None
+
+    def _in_tiebreak(self):
+        games = self.set_games[self.current_set]
+        return games[0] == self.tiebreak_at and games[1] == self.tiebreak_at
+
+    def play_point(self):
+        """Play one point; returns 'point', 'game', 'set' or 'match'"""
+        side = 0 if self.rng.random() < self.point_probability else 1
+        other = 1 - side
+
+        if self.is_super_tiebreak:
+            self.super_tiebreak_score[side] += 1
+            score = self.super_tiebreak_score
+            if score[side] >= 10 and score[side] - score[other] >= 2:
+                return self._win_match(side)
+            return 'point'
+
+        self.points[side] += 1
+        target = 7 if self._in_tiebreak() else 4
+        if self.points[side] < target or self.points[side] - self.points[other] < 2:
+            return 'point'
+
+        # Game (or tie-break) won
+        self.points = [0, 0]
+        games = self.set_games[self.current_set]
+        games[side] += 1
+        set_won = ((games[side] >= self.games_to_win and games[side] - games[other] >= 2)
+                   or (games[side] == self.tiebreak_at + 1 and games[other] == self.tiebreak_at))
+        if not set_won:
+            return 'game'
+
+        self.sets_won[side] += 1
+        if self.sets_won[side] >= self.sets_to_win:
+            return self._win_match(side)
+        self.current_set += 1
+        if self.super_decider and self.sets_won[0] == self.sets_won[1] == self.sets_to_win - 1:
+            self.is_super_tiebreak = True
+        return 'set'
+
+    def _win_match(self, side):
+        self.is_match_finished = True
+        self.winning_team = side + 1
+        return 'match'
+
+    def games_played_in_set(self):
+        return sum(self.set_games[self.current_set])
+
+    def payload(self):
+        """Update body as the iPhone app sends it (without tv_id)"""
+        data = {
+            'team1_game_score': self.points[0],
+            'team2_game_score': self.points[1],
+            'current_set': self.current_set,
+            'is_match_finished': self.is_match_finished,
+            'winning_team': self.winning_team
+        }
+        for i, games in self.set_games.items():
+            data[f'set{i}_games'] = list(games)
+        if self.is_super_tiebreak:
+            data['super_tiebreak_score'] = list(self.super_tiebreak_score)
+        return data
+
+
+def _court_events(rng, court, matches_per_court):
+    """All events for one court, in time order"""
+    t = rng.uniform(0.0, 60.0)
+    events = [{'t': t, 'type': 'tv_setup', 'court': court}]
+    reload_probability_per_second = TV_RELOADS_PER_HOUR / 3600.0
+
+    for match_number in range(matches_per_court):
+        labels, sets, weights = zip(*MATCH_FORMATS)
+        index = rng.choices(range(len(MATCH_FORMATS)), weights=weights)[0]
+        match_format, best_of_sets = labels[index], sets[index]
+        simulator = MatchSimulator(rng, match_format, best_of_sets, rng.uniform(0.45, 0.55))
+
+        t += 5.0
+        events.append({'t': t, 'type': 'link_tv', 'court': court, 'match_data': {
+            'team1_name': f'Court {court + 1} Team {2 * match_number + 1}',
+            'team2_name': f'Court {court + 1} Team {2 * match_number + 2}',
+            'best_of_sets': best_of_sets,
+            'match_format': match_format,
+            'court_number': str(court + 1),
+            'championship_name': 'SYNTHETIC OPEN'
+        }})
+        t += rng.uniform(*WARMUP_RANGE)
+
+        while not simulator.is_match_finished:
+            interval = min(max(rng.gauss(POINT_INTERVAL_MEAN, POINT_INTERVAL_STDDEV), 15.0), 90.0)
+            t += interval
+            outcome = simulator.play_point()
+            events.append({'t': t, 'type': 'update', 'court': court, 'payload': simulator.payload()})
+
+            if rng.random() < reload_probability_per_second * interval:
+                events.append({'t': t + rng.uniform(0.5, 5.0), 'type': 'tv_reload', 'court': court})
+            if outcome == 'set':
+                t += SET_BREAK
+            elif outcome == 'game' and simulator.games_played_in_set() % 2 == 1:
+                t += CHANGEOVER
+
+        # Winner screen, then the TV is reset to a fresh QR for the next match
+        t += rng.uniform(60.0, 180.0)
+        events.append({'t': t, 'type': 'reset_tv', 'court': court})
+
+    events.sort(key=lambda event: event['t'])
+    return events
+
+
+def generate_tournament(courts=8, matches_per_court=4, seed=0):
+    """Deterministic, time-ordered event stream for a whole tournament"""
+    streams = []
+    for court in range(courts):
+        # Per-court generators keep a court's events stable when --courts changes
+        rng = random.Random(f'{seed}:{court}')
+        streams.append(_court_events(rng, court, matches_per_court))
+    for event in heapq.merge(*streams, key=lambda event: (event['t'], event['court'])):
+        event['t'] = round(event['t'], 3)
+        yield event
+
+
+def update_workload(events):
+    """(court, payload) pairs for the update events, as benchmark.run() expects"""
+    return ((event['court'], event['payload']) for event in events if event['type'] == 'update')
+
+
+class FlaskClientTransport:
+    """Send requests through a Flask test client"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class HttpTransport:
+    """Send requests to a live server with the standard library"""
+
+    def __init__(self, base_url, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, response.read().decode()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode()
+
+
+def replay(events, transport, speed=1.0):
+    """Replay an event stream; speed=0 means as fast as possible. Returns stats."""
+    tv_ids = {}
+    stats = {'events': 0, 'errors': 0, 'rate_limited': 0, 'by_type': {}, 'latency_ms': {}}
+    start = time.perf_counter()
+
+    for event in events:
+        if speed:
+            delay = event['t'] / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+        court = event['court']
+        kind = event['type']
+        tv_id = tv_ids.get(court)
+        request_start = time.perf_counter()
+        ok = True
+        status = None
+
+        if kind == 'tv_setup':
+            status, text = transport.request('GET', '/tv')
+            match = TV_ID_PATTERN.search(text)
+            ok = status == 200 and match is not None
+            if ok:
+                tv_ids[court] = match.group(1)
+        elif tv_id is None:
+            ok = False
+        elif kind == 'link_tv':
+            status, _ = transport.request('POST', '/api/link-tv', {'tv_id': tv_id, 'match_data': event['match_data']})
+            ok = status == 200
+        elif kind == 'update':
+            body = dict(event['payload'], tv_id=tv_id, client_timestamp=time.time() * 1000)
+            status, _ = transport.request('POST', '/api/update-match', body)
+            ok = status == 200
+        elif kind == 'tv_reload':
+            status, _ = transport.request('GET', f'/tv/{tv_id}')
+            status_check, _ = transport.request('GET', f'/api/match-status/{tv_id}')
+            ok = status == 200 and status_check in (200, 400)
+        elif kind == 'reset_tv':
+            status, text = transport.request('POST', f'/api/reset-tv/{tv_id}')
+            ok = status == 200
+            if ok:
+                tv_ids[court] = json.loads(text)['new_tv_id']
+
+        elapsed_ms = (time.perf_counter() - request_start) * 1000.0
+        stats['events'] += 1
+        stats['by_type'][kind] = stats['by_type'].get(kind, 0) + 1
+        stats['latency_ms'].setdefault(kind, []).append(elapsed_ms)
+        if status == 429:
+            stats['rate_limited'] += 1
+        elif not ok:
+            stats['errors'] += 1
+
+    stats['wall_s'] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic PadelCast tournament traffic')
+    parser.add_argument('--courts', type=int, default=8)
+    parser.add_argument('--matches-per-court', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dump', help='write the event stream as JSON lines to this file ("-" for stdout)')
+    parser.add_argument('--url', help='replay against a live server at this base URL')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed multiplier (0 = no delays)')
+    args = parser.parse_args()
+
+    events = list(generate_tournament(args.courts, args.matches_per_court, args.seed))
+    duration_h = events[-1]['t'] / 3600.0 if events else 0.0
+    updates = sum(1 for event in events if event['type'] == 'update')
+    print(f"🎾 {len(events)} events ({updates} updates) over {duration_h:.1f}h of play", file=sys.stderr)
+
+    if args.dump:
+        out = sys.stdout if args.dump == '-' else open(args.dump, 'w')
+        for event in events:
+            out.write(json.dumps(event) + '\n')
+        if out is not sys.stdout:
+            out.close()
+
+    if args.url:
+        print(f"📡 Replaying against {args.url} at {args.speed}x...", file=sys.stderr)
+        stats = replay(events, HttpTransport(args.url), args.speed)
+        latency = {kind: round(sum(values) / len(values), 2) for kind, values in stats.pop('latency_ms').items()}
+        stats['avg_latency_ms'] = latency
+        print(json.dumps(stats, indent=2))
+        if stats['rate_limited']:
+            print(f"⚠️ {stats['rate_limited']} requests were rate limited; start the server with RATE_LIMITING=off",
+                  file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Win probability engine for the live TV scoreboard.
+
+Uses an exact Markov chain over the padel scoring state (points, games,
+sets, super tie-break) instead of simulation. Every level of the chain is
+memoized, and so is the full state, so evaluating hundreds of live matches
+is mostly dictionary lookups.
+"""
+
+from functools import lru_cache
+
+# Probability that team 1 wins any single point. Without serve or player
+# ratings both teams are assumed equal, so only the score matters.
+DEFAULT_POINT_PROBABILITY = 0.5
+
+# Display values older clients may still send instead of point counts
+TENNIS_POINTS = {'0': 0, '15': 1, '30': 2, '40': 3, 'AD': 4}
+
+TIEBREAK_POINTS = 7
+SUPER_TIEBREAK_POINTS = 10
+
+
+def _points_value(points):
+    """Convert a game score (count or tennis display value) to a point count"""
+    if points is None:
+        return 0
+    text = str(points).strip().upper()
+    if text in TENNIS_POINTS:
+        return TENNIS_POINTS[text]
+    try:
+        return max(int(text), 0)
+    except ValueError:
+        return 0
+
+
+def _games_value(games):
+    """Convert a set game count to an int, treating junk as zero"""
+    try:
+        return max(int(games), 0)
+    except (ValueError, TypeError):
+        return 0
+
+
+def _normalize_race(a, b, target):
+    """Collapse a win-by-two race so deuce-like states share one cache entry"""
+    if a >= target - 1 and b >= target - 1:
+        lead = max(min(a - b, 2), -2)
+        return target - 1 + max(lead, 0), target - 1 + max(-lead, 0)
+    return a, b
+
+
+@lru_cache(maxsize=None)
+def _race_win(a, b, target, p):
+    """Probability team 1 wins a first-to-`target`, win-by-two race"""
+    if a >= target and a - b >= 2:
+        return 1.0
+    if b >= target and b - a >= 2:
+        return 0.0
+    if a >= target - 1 and b >= target - 1 and a == b:
+        # Deuce: closed form of the infinite advantage chain
+        q = 1.0 - p
+        return p * p / (p * p + q * q)
+    return p * _race_win(a + 1, b, target, p) + (1.0 - p) * _race_win(a, b + 1, target, p)
+
+
+def game_win_probability(a, b, p=DEFAULT_POINT_PROBABILITY):
+    """Probability team 1 wins the current game from points (a, b)"""
+    a, b = _normalize_race(a, b, 4)
+    return _race_win(a, b, 4, p)
+
+
+def tiebreak_win_probability(a, b, target=TIEBREAK_POINTS, p=DEFAULT_POINT_PROBABILITY):
+    """Probability team 1 wins a tie-break (or super tie-break) from (a, b)"""
+    a, b = _normalize_race(a, b, target)
+    return _race_win(a, b, target, p)
+
+
+def set_format(match_format):
+    """Return (games_to_win, tiebreak_at) for a match format label"""
+    if match_format and 'pro set' in str(match_format).lower():
+        return 9, 8
+    return 6, 6
+
+
+def _set_result(g1, g2, games_to_win, tiebreak_at):
+    """Return 1 or 2 if the set is decided at (g1, g2), else None"""
+    if (g1 >= games_to_win and g1 - g2 >= 2) or (g1 == tiebreak_at + 1 and g2 == tiebreak_at):
+        return 1
+    if (g2 >= games_to_win and g2 - g1 >= 2) or (g2 == tiebreak_at + 1 and g1 == tiebreak_at):
+        return 2
+    return None
+
+
+@lru_cache(maxsize=None)
+def _set_win(g1, g2, games_to_win, tiebreak_at, p):
+    """Probability team 1 wins a set from games (g1, g2) at the start of a game"""
+    result = _set_result(g1, g2, games_to_win, tiebreak_at)
+    if result is not None:
+        return 1.0 if result == 1 else 0.0
+    if g1 == tiebreak_at and g2 == tiebreak_at:
+        return tiebreak_win_probability(0, 0, TIEBREAK_POINTS, p)
+    pg = game_win_probability(0, 0, p)
+    return (pg * _set_win(g1 + 1, g2, games_to_win, tiebreak_at, p)
+            + (1.0 - pg) * _set_win(g1, g2 + 1, games_to_win, tiebreak_at, p))
+
+
+def _live_set_win(g1, g2, a, b, games_to_win, tiebreak_at, p):
+    """Probability team 1 wins the current set from games (g1, g2) and points (a, b)"""
+    result = _set_result(g1, g2, games_to_win, tiebreak_at)
+    if result is not None:
+        return 1.0 if result == 1 else 0.0
+    if g1 == tiebreak_at and g2 == tiebreak_at:
+        return tiebreak_win_probability(a, b, TIEBREAK_POINTS, p)
+    pg = game_win_probability(a, b, p)
+    return (pg * _set_win(g1 + 1, g2, games_to_win, tiebreak_at, p)
+            + (1.0 - pg) * _set_win(g1, g2 + 1, games_to_win, tiebreak_at, p))
+
+
+@lru_cache(maxsize=None)
+def _match_win(s1, s2, sets_to_win, games_to_win, tiebreak_at, super_decider, p):
+    """Probability team 1 wins the match from sets (s1, s2) at the start of a set"""
+    if s1 >= sets_to_win:
+        return 1.0
+    if s2 >= sets_to_win:
+        return 0.0
+    if super_decider and s1 == s2 == sets_to_win - 1:
+        return tiebreak_win_probability(0, 0, SUPER_TIEBREAK_POINTS, p)
+    ps = _set_win(0, 0, games_to_win, tiebreak_at, p)
+    return (ps * _match_win(s1 + 1, s2, sets_to_win, games_to_win, tiebreak_at, super_decider, p)
+            + (1.0 - ps) * _match_win(s1, s2 + 1, sets_to_win, games_to_win, tiebreak_at, super_decider, p))
+
+
+def match_state(match):
+    """Reduce a Match to the hashable state the engine needs"""
+    if match.is_match_finished and match.winning_team in (1, 2):
+        return ('finished', match.winning_team)
+
+    best_of_sets = max(_games_value(match.best_of_sets), 1)
+    sets_to_win = best_of_sets // 2 + 1
+    games_to_win, tiebreak_at = set_format(match.match_format)
+    super_decider = 'super' in str(match.match_format or '').lower()
+
+    current_set = min(max(_games_value(match.current_set), 1), best_of_sets)
+    s1 = s2 = 0
+    for i in range(1, current_set):
+        g1 = _games_value(match.team1_set_games.get(i, 0))
+        g2 = _games_value(match.team2_set_games.get(i, 0))
+        if g1 > g2:
+            s1 += 1
+        elif g2 > g1:
+            s2 += 1
+    s1 = min(s1, sets_to_win)
+    s2 = min(s2, sets_to_win)
+
+    if match.is_super_tiebreak:
+        a, b = _normalize_race(_games_value(match.super_tiebreak_score1),
+                               _games_value(match.super_tiebreak_score2),
+                               SUPER_TIEBREAK_POINTS)
+        return ('super_tiebreak', a, b)
+
+    g1 = min(_games_value(match.team1_set_games.get(current_set, 0)), tiebreak_at + 1)
+    g2 = min(_games_value(match.team2_set_games.get(current_set, 0)), tiebreak_at + 1)
+    if g1 == tiebreak_at and g2 == tiebreak_at:
+        a, b = _normalize_race(_points_value(match.team1_game_score),
+                               _points_value(match.team2_game_score),
+                               TIEBREAK_POINTS)
+    else:
+        a, b = _normalize_race(_points_value(match.team1_game_score),
+                               _points_value(match.team2_game_score), 4)
+    return ('live', s1, s2, sets_to_win, g1, g2, a, b, games_to_win, tiebreak_at, super_decider)
+
+
+@lru_cache(maxsize=65536)
+def state_win_probability(state, p=DEFAULT_POINT_PROBABILITY):
+    """Probability team 1 wins the match from a state built by match_state()"""
+    kind = state[0]
+    if kind == 'finished':
+        return 1.0 if state[1] == 1 else 0.0
+    if kind == 'super_tiebreak':
+        return tiebreak_win_probability(state[1], state[2], SUPER_TIEBREAK_POINTS, p)
+
+    _, s1, s2, sets_to_win, g1, g2, a, b, games_to_win, tiebreak_at, super_decider = state
+    if s1 >= sets_to_win:
+        return 1.0
+    if s2 >= sets_to_win:
+        return 0.0
+    ps = _live_set_win(g1, g2, a, b, games_to_win, tiebreak_at, p)
+    return (ps * _match_win(s1 + 1, s2, sets_to_win, games_to_win, tiebreak_at, super_decider, p)
+            + (1.0 - ps) * _match_win(s1, s2 + 1, sets_to_win, games_to_win, tiebreak_at, super_decider, p))
+
+
+def win_probability(match, p=DEFAULT_POINT_PROBABILITY):
+    """Probability that team 1 wins the given Match"""
+    return state_win_probability(match_state(match), p)
+
+
+def win_probabilities(matches, p=DEFAULT_POINT_PROBABILITY):
+    """Evaluate many matches in one call, computing each distinct state once"""
+    states = [match_state(match) for match in matches]
+    results = {state: state_win_probability(state, p) for state in set(states)}
+    return [results[state] for state in states]
@@ -7,7 +7,7 @@ import requests
 import json
 import time
 
-BASE_URL = "shttp://localhost:8080"
+BASE_URL = "http://localhost:8080"
 
 def test_generate_code():
     """Test generating a match code"""